@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Аудит планов горячих запросов к postopus_posts (EXPLAIN ANALYZE до и после миграций)
+
+Примеры:
+    python benchmark_post_queries.py --label before
+    python benchmark_post_queries.py --apply-migrations
+    python benchmark_post_queries.py --compare explain_before.json explain_after.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+# Добавляем путь к src для импортов
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from sqlalchemy import text
+
+from src.web.database import engine
+from src.web.migrations import run_migrations
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Горячие запросы приложения (параметры подставляются из реальных данных)
+HOT_QUERIES = {
+    "region_feed": (
+        "SELECT id, title, created_at FROM postopus_posts "
+        "WHERE region = :region ORDER BY created_at DESC LIMIT 20"
+    ),
+    "region_today_count": (
+        "SELECT count(*) FROM postopus_posts WHERE region = :region AND created_at >= :today"
+    ),
+    "posts_by_status": (
+        "SELECT id, title, created_at FROM postopus_posts "
+        "WHERE status = :status ORDER BY created_at DESC LIMIT 10"
+    ),
+    "scheduled_due": (
+        "SELECT id FROM postopus_posts WHERE status = 'scheduled' AND scheduled_at <= :now"
+    ),
+    "keyset_page": (
+        "SELECT id, title, created_at FROM postopus_posts "
+        "WHERE (created_at, id) < (:now, 2147483647) ORDER BY created_at DESC, id DESC LIMIT 20"
+    ),
+    "vk_post_lookup": (
+        "SELECT id FROM postopus_posts WHERE post_metadata->>'vk_post_id' = :vk_post_id"
+    ),
+}
+
+
+def _sample_params(connection) -> dict:
+    """Берет параметры запросов из данных, чтобы планы отражали реальную селективность."""
+    region = connection.execute(text(
+        "SELECT region FROM postopus_posts WHERE region IS NOT NULL "
+        "GROUP BY region ORDER BY count(*) DESC LIMIT 1"
+    )).scalar()
+    vk_post_id = connection.execute(text(
+        "SELECT post_metadata->>'vk_post_id' FROM postopus_posts "
+        "WHERE post_metadata->>'vk_post_id' IS NOT NULL LIMIT 1"
+    )).scalar()
+    now = datetime.utcnow()
+    return {
+        "region": region or "mi",
+        "status": "published",
+        "today": now.replace(hour=0, minute=0, second=0, microsecond=0),
+        "now": now,
+        "vk_post_id": vk_post_id or "0_0",
+    }
+
+
+def _walk(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _walk(child)
+
+
+def collect_plans() -> dict:
+    """Выполняет EXPLAIN (ANALYZE, BUFFERS) для всех горячих запросов."""
+    results = {}
+    with engine.connect() as connection:
+        params = _sample_params(connection)
+        for name, sql in HOT_QUERIES.items():
+            explain = connection.execute(
+                text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params
+            ).scalar()
+            plan = explain[0] if isinstance(explain, list) else json.loads(explain)[0]
+            nodes = list(_walk(plan["Plan"]))
+            results[name] = {
+                "execution_ms": plan.get("Execution Time"),
+                "planning_ms": plan.get("Planning Time"),
+                "nodes": sorted({node["Node Type"] for node in nodes}),
+                "indexes": sorted({node["Index Name"] for node in nodes if node.get("Index Name")}),
+                "seq_scans": sum(1 for node in nodes if node["Node Type"] == "Seq Scan"),
+                "plan": plan,
+            }
+            logger.info(
+                f"{name}: {results[name]['execution_ms']} ms, "
+                f"indexes={results[name]['indexes'] or '-'}, seq_scans={results[name]['seq_scans']}"
+            )
+    return results
+
+
+def save_plans(label: str, plans: dict) -> str:
+    filename = f"explain_{label}.json"
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump({"label": label, "created_at": datetime.utcnow().isoformat(), "queries": plans},
+                  f, ensure_ascii=False, indent=2, default=str)
+    logger.info(f"Plans saved to {filename}")
+    return filename
+
+
+def compare(before: dict, after: dict) -> None:
+    """Печатает сравнение времени выполнения и использованных индексов."""
+    print(f"{'query':<20} {'before ms':>10} {'after ms':>10}  indexes after")
+    for name in HOT_QUERIES:
+        b = before.get(name, {})
+        a = after.get(name, {})
+        print(f"{name:<20} {b.get('execution_ms', '-'):>10} {a.get('execution_ms', '-'):>10}  "
+              f"{', '.join(a.get('indexes', [])) or 'seq scan'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE audit for postopus_posts hot queries")
+    parser.add_argument("--label", help="Save plans to explain_<label>.json")
+    parser.add_argument("--apply-migrations", action="store_true",
+                        help="Record plans, run pending migrations, record plans again and compare")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two saved plan files")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            before = json.load(f)["queries"]
+        with open(args.compare[1], encoding="utf-8") as f:
+            after = json.load(f)["queries"]
+        compare(before, after)
+        return
+
+    if args.apply_migrations:
+        before = collect_plans()
+        save_plans("before", before)
+        logger.info(f"Migrations: {run_migrations(engine)}")
+        after = collect_plans()
+        save_plans("after", after)
+        compare(before, after)
+        return
+
+    save_plans(args.label or datetime.utcnow().strftime("%Y%m%d_%H%M%S"), collect_plans())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Daily rollup of posts for charts and analytics.
+
+``postopus_daily_stats`` keeps one row per (day, region, theme, status) with
+post, view and like totals. Rows of a day are recomputed from the posts of
+that day only, so writes refresh the days they touch and the periodic task
+re-aggregates the last few days (views and likes keep changing after a post
+is created). Readers get O(days) rows instead of scanning the posts table.
+
+Buckets are written with ``INSERT ... ON CONFLICT (day, region, theme, status)
+DO UPDATE``, so concurrent writers refreshing the same day never collide on
+``uq_daily_stats_bucket``; buckets left without posts are removed afterwards.
+"""
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Iterable, Dict, Any, Optional
+
+from sqlalchemy import func, select, or_, and_
+from sqlalchemy.dialects.postgresql import insert
+
+from ..web.models import Post, DailyStats
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних дней пересчитывает периодическая задача
+DAILY_STATS_REFRESH_DAYS = int(os.getenv("DAILY_STATS_REFRESH_DAYS", "3"))
+
+_ROLLUP_COLUMNS = ['day', 'region', 'theme', 'status', 'posts_count', 'views_count', 'likes_count', 'updated_at']
+_BUCKET_COLUMNS = ['day', 'region', 'theme', 'status']
+
+
+def _day_of(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value).date()
+    return None
+
+
+def _day_range(day: date):
+    start = datetime.combine(day, datetime.min.time())
+    return and_(Post.created_at >= start, Post.created_at < start + timedelta(days=1))
+
+
+def _rollup_select(created_filter):
+    """SELECT aggregating posts matching ``created_filter`` into daily buckets."""
+    day = func.date(Post.created_at)
+    region = func.coalesce(Post.region, '')
+    theme = func.coalesce(Post.theme, '')
+    status = func.coalesce(Post.status, '')
+    views = func.greatest(
+        func.coalesce(Post.view_count, 0),
+        func.coalesce(Post.post_metadata[('views', 'count')].as_integer(), 0)
+    )
+    return select(
+        day,
+        region,
+        theme,
+        status,
+        func.count(Post.id),
+        func.coalesce(func.sum(views), 0),
+        func.coalesce(func.sum(func.coalesce(Post.like_count, 0)), 0),
+        func.now()
+    ).where(created_filter).group_by(day, region, theme, status)
+
+
+def _upsert_rollup(session, created_filter, stale_filter) -> None:
+    """
+    Upsert buckets aggregated from posts matching ``created_filter``.
+
+    Buckets matching ``stale_filter`` that the upsert did not touch (their
+    posts changed status or were deleted) are removed. ``now()`` is the
+    transaction start time, so touched rows have exactly that ``updated_at``.
+    """
+    stmt = insert(DailyStats).from_select(_ROLLUP_COLUMNS, _rollup_select(created_filter))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[getattr(DailyStats, column) for column in _BUCKET_COLUMNS],
+        set_={column: stmt.excluded[column] for column in _ROLLUP_COLUMNS if column not in _BUCKET_COLUMNS}
+    )
+    session.execute(stmt)
+    session.query(DailyStats).filter(
+        stale_filter, DailyStats.updated_at < func.now()
+    ).delete(synchronize_session=False)
+
+
+def refresh_days(session, days: Iterable[Any]) -> int:
+    """
+    Recompute rollup rows for the given days (dates, datetimes or timestamps).
+
+    The caller commits. Returns the number of refreshed days.
+    """
+    days = sorted({d for d in (_day_of(value) for value in days) if d})
+    if not days:
+        return 0
+
+    _upsert_rollup(session, or_(*(_day_range(d) for d in days)), DailyStats.day.in_(days))
+    return len(days)
+
+
+def rebuild_since(session, since: Optional[date] = None) -> None:
+    """Recompute every rollup row from ``since`` (or the whole table if None). The caller commits."""
+    if since is not None:
+        created_filter = Post.created_at >= datetime.combine(since, datetime.min.time())
+        stale_filter = DailyStats.day >= since
+    else:
+        created_filter = Post.created_at.isnot(None)
+        stale_filter = DailyStats.day.isnot(None)
+
+    _upsert_rollup(session, created_filter, stale_filter)
+
+
+def touch_days(session, *values: Any) -> None:
+    """
+    Refresh rollup rows after a post write and commit.
+
+    Ошибки только логируются: сбой сводки не должен ломать запись поста,
+    периодическая задача все равно пересчитает последние дни.
+    """
+    try:
+        if refresh_days(session, values):
+            session.commit()
+    except Exception as e:
+        logger.warning(f"Error refreshing daily stats: {e}")
+        session.rollback()
+
+
+def get_summary(session, since: Optional[date] = None, region: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Totals for a period read from the rollup.
+
+    Returns:
+        Словарь с общими суммами и разбивками по дням, регионам, статусам и темам
+    """
+    filters = []
+    if since is not None:
+        filters.append(DailyStats.day >= since)
+    if region:
+        filters.append(DailyStats.region == region)
+
+    def grouped(column):
+        return session.query(
+            column,
+            func.sum(DailyStats.posts_count),
+            func.sum(DailyStats.views_count),
+            func.sum(DailyStats.likes_count)
+        ).filter(*filters).group_by(column).order_by(column).all()
+
+    def as_dict(rows):
+        return {
+            key: {"posts": int(posts or 0), "views": int(views or 0), "likes": int(likes or 0)}
+            for key, posts, views, likes in rows
+        }
+
+    by_day = as_dict(grouped(DailyStats.day))
+    return {
+        "total_posts": sum(item["posts"] for item in by_day.values()),
+        "total_views": sum(item["views"] for item in by_day.values()),
+        "total_likes": sum(item["likes"] for item in by_day.values()),
+        "by_day": by_day,
+        "by_region": as_dict(grouped(DailyStats.region)),
+        "by_status": as_dict(grouped(DailyStats.status)),
+        "by_theme": as_dict(grouped(DailyStats.theme))
+    }
+
+
+def refresh_recent(session, days: int = DAILY_STATS_REFRESH_DAYS) -> Dict[str, Any]:
+    """Periodic refresh: full rebuild on an empty table, otherwise the last ``days`` days."""
+    if session.query(DailyStats.id).first() is None:
+        rebuild_since(session)
+        mode = "full"
+    else:
+        rebuild_since(session, datetime.utcnow().date() - timedelta(days=days - 1))
+        mode = "recent"
+    session.commit()
+    return {"mode": mode, "days": days, "rows": session.query(func.count(DailyStats.id)).scalar() or 0}
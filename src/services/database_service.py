@@ -12,6 +12,13 @@ from pathlib import Path
 # Добавляем путь к модулям
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+try:
+    from src.utils.blacklist_matcher import invalidate_blacklist_matchers
+except ImportError:
+    # Без общего кеша автоматов сбрасывать нечего
+    def invalidate_blacklist_matchers() -> None:
+        pass
+
 try:
     from src.models.config import AppConfig
 except ImportError:
@@ -135,12 +142,19 @@ class DatabaseService:
         """Обновляет конфигурацию данными из базы данных."""
         try:
             # Обновляем настройки фильтров
+            blacklists_changed = False
             if 'delete_msg_blacklist' in config_doc:
+                blacklists_changed |= self.config.filters.delete_msg_blacklist != config_doc['delete_msg_blacklist']
                 self.config.filters.delete_msg_blacklist = config_doc['delete_msg_blacklist']
             
             if 'clear_text_blacklist' in config_doc:
+                blacklists_changed |= self.config.filters.clear_text_blacklist != config_doc['clear_text_blacklist']
                 self.config.filters.clear_text_blacklist = config_doc['clear_text_blacklist']
             
+            if blacklists_changed:
+                # Автоматы поиска пересоберутся при следующей проверке
+                invalidate_blacklist_matchers()
+            
             if 'black_id' in config_doc:
                 self.config.filters.black_id = config_doc['black_id']
             
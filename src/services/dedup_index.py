@@ -0,0 +1,198 @@
+"""
+Persistent duplicate index of processed VK posts.
+
+Keys are ``owner_id_postid`` strings stored in a Redis sorted set scored by
+the time they were seen, so every worker shares one index and it survives
+restarts. The index is backfilled from PostgreSQL once and then updated
+incrementally. Without Redis an in-process index is used.
+
+Redis calls and the backfill are blocking; async code uses the ``*_async``
+methods, which run them in the default thread pool.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Set, Optional
+
+try:
+    import redis
+except ImportError:
+    # Graceful degradation if redis is not available
+    redis = None
+
+from ..web.models import Post as DBPost
+from ..web.database import get_database
+
+logger = logging.getLogger(__name__)
+
+DEDUP_REDIS_URL = os.getenv("DEDUP_REDIS_URL", os.getenv("REDIS_URL", ""))
+DEDUP_TTL_DAYS = int(os.getenv("DEDUP_TTL_DAYS", "7"))
+DEDUP_KEY = "postopus:dedup:posts"
+DEDUP_LOADED_KEY = "postopus:dedup:posts:loaded"
+DEDUP_LOADING_KEY = "postopus:dedup:posts:loading"
+# Сколько держится блокировка backfill, если загружающий воркер упал (секунды)
+DEDUP_LOADING_TIMEOUT = int(os.getenv("DEDUP_LOADING_TIMEOUT", "300"))
+
+
+class PostDedupIndex:
+    """Set of recently processed post ids with a sliding TTL window."""
+
+    def __init__(self, redis_url: Optional[str] = DEDUP_REDIS_URL, ttl_days: int = DEDUP_TTL_DAYS):
+        self.ttl = ttl_days * 86400
+        self.db = get_database()
+        self.redis = None
+        self._local: dict = {}  # key -> seen timestamp
+        self._local_loaded = False
+        self._last_trim = 0.0
+
+        if redis_url and redis:
+            try:
+                self.redis = redis.Redis.from_url(redis_url)
+                self.redis.ping()
+            except Exception as e:
+                logger.warning(f"Redis dedup index unavailable, using in-memory index: {e}")
+                self.redis = None
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self.redis is not None else "memory"
+
+    def ensure_loaded(self):
+        """
+        Backfill the index from the database once (per Redis TTL or per process).
+
+        With Redis one worker takes the "loading" lock and sets the "loaded"
+        marker only after the backfill succeeds; the others skip the backfill
+        and check the marker again on their next call.
+        """
+        try:
+            if self.redis is not None:
+                self._ensure_loaded_shared()
+            elif not self._local_loaded:
+                self._backfill_from_db()
+                self._local_loaded = True
+        except Exception as e:
+            logger.error(f"Error loading dedup index: {e}")
+
+    def _ensure_loaded_shared(self):
+        if self.redis.exists(DEDUP_LOADED_KEY):
+            return
+        # SET NX: backfill делает только один воркер
+        if not self.redis.set(DEDUP_LOADING_KEY, int(time.time()), nx=True, ex=DEDUP_LOADING_TIMEOUT):
+            return
+        try:
+            self._backfill_from_db()
+            self.redis.set(DEDUP_LOADED_KEY, int(time.time()), ex=self.ttl)
+        finally:
+            # После сбоя следующий вызов повторит backfill
+            self.redis.delete(DEDUP_LOADING_KEY)
+
+    def _backfill_from_db(self):
+        """Load keys of posts created within the TTL window."""
+        since = datetime.utcnow() - timedelta(seconds=self.ttl)
+        keys = {}
+        with self.db.get_session() as session:
+            rows = session.query(DBPost.vk_group_id, DBPost.vk_post_id, DBPost.created_at).filter(
+                DBPost.created_at > since,
+                DBPost.vk_group_id.isnot(None),
+                DBPost.vk_post_id.isnot(None)
+            ).yield_per(1000)
+            for vk_group_id, vk_post_id, created_at in rows:
+                # Ключ как в EnhancedPostProcessor: "<owner_id>_<post_id>"
+                keys[f"{vk_group_id}_{vk_post_id}"] = created_at.timestamp() if created_at else time.time()
+
+        self._add(keys)
+        logger.info(f"Dedup index backfilled with {len(keys)} posts ({self.backend})")
+
+    def contains_many(self, keys: Iterable[str]) -> Set[str]:
+        """Return the subset of ``keys`` already present in the index."""
+        keys = [str(k) for k in keys]
+        if not keys:
+            return set()
+
+        cutoff = time.time() - self.ttl
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key in keys:
+                    pipe.zscore(DEDUP_KEY, key)
+                scores = pipe.execute()
+                return {key for key, score in zip(keys, scores) if score is not None and score > cutoff}
+            except Exception as e:
+                logger.warning(f"Redis dedup lookup failed, using in-memory index: {e}")
+
+        return {key for key in keys if self._local.get(key, 0) > cutoff}
+
+    def contains(self, key: str) -> bool:
+        return bool(self.contains_many([key]))
+
+    def add_many(self, keys: Iterable[str]):
+        now = time.time()
+        self._add({str(k): now for k in keys})
+
+    def add(self, key: str):
+        self.add_many([key])
+
+    async def ensure_loaded_async(self):
+        await asyncio.to_thread(self.ensure_loaded)
+
+    async def contains_many_async(self, keys: Iterable[str]) -> Set[str]:
+        return await asyncio.to_thread(self.contains_many, list(keys))
+
+    async def add_many_async(self, keys: Iterable[str]):
+        await asyncio.to_thread(self.add_many, list(keys))
+
+    def _add(self, keys: dict):
+        if not keys:
+            return
+
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.zadd(DEDUP_KEY, keys)
+                pipe.expire(DEDUP_KEY, self.ttl)
+                pipe.execute()
+                self._trim()
+                return
+            except Exception as e:
+                logger.warning(f"Redis dedup update failed, using in-memory index: {e}")
+
+        self._local.update(keys)
+        self._trim()
+
+    def _trim(self):
+        """Drop entries older than the TTL window (at most once a minute)."""
+        now = time.time()
+        if now - self._last_trim < 60:
+            return
+        self._last_trim = now
+        cutoff = now - self.ttl
+
+        if self.redis is not None:
+            try:
+                self.redis.zremrangebyscore(DEDUP_KEY, '-inf', cutoff)
+            except Exception as e:
+                logger.warning(f"Error trimming dedup index: {e}")
+        self._local = {k: ts for k, ts in self._local.items() if ts > cutoff}
+
+    def __len__(self) -> int:
+        if self.redis is not None:
+            try:
+                return int(self.redis.zcard(DEDUP_KEY))
+            except Exception:
+                pass
+        return len(self._local)
+
+
+# Глобальный экземпляр индекса
+_dedup_index: Optional[PostDedupIndex] = None
+
+
+def get_dedup_index() -> PostDedupIndex:
+    """Возвращает экземпляр общего индекса дубликатов."""
+    global _dedup_index
+    if _dedup_index is None:
+        _dedup_index = PostDedupIndex()
+    return _dedup_index
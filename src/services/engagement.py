@@ -0,0 +1,159 @@
+"""
+Bulk refresh of post engagement counters.
+
+Published posts are read back from the walls they were posted to (the
+``post_metadata['published']`` copies saved by the publish task) with
+``wall.getById`` in batches of up to 100 posts per call, and all counters
+are written with one ``UPDATE ... FROM (VALUES ...)``. Thousands of tracked
+posts cost tens of API calls and a single statement.
+Counters of a post published to several groups are summed. Views and likes
+go to ``view_count``/``like_count``; reposts and comments, which have no
+columns, go to ``post_metadata['engagement']``.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, case, cast, column, func, literal, update, values
+from sqlalchemy.dialects.postgresql import JSON, JSONB
+
+from ..web.models import Post
+from .daily_stats import touch_days as touch_daily_stats
+from ..web.response_cache import invalidate_response_cache
+
+logger = logging.getLogger(__name__)
+
+# За сколько последних дней отслеживаются просмотры и лайки постов
+ENGAGEMENT_REFRESH_DAYS = int(os.getenv("ENGAGEMENT_REFRESH_DAYS", "7"))
+# wall.getById принимает не более 100 постов за вызов
+VK_GET_BY_ID_MAX_POSTS = 100
+
+
+def _wall_id(owner_id: Any, post_id: Any) -> Optional[str]:
+    """"<owner_id>_<post_id>" for wall.getById, None if the ids are not numeric."""
+    try:
+        return f"{int(owner_id)}_{int(post_id)}"
+    except (TypeError, ValueError):
+        return None
+
+
+def select_tracked_posts(session, days: int = ENGAGEMENT_REFRESH_DAYS,
+                         post_ids: Optional[List[int]] = None) -> Dict[str, Tuple[int, datetime]]:
+    """
+    Копии опубликованных постов на стенах VK за последние ``days`` дней.
+
+    Returns:
+        wall id ("<owner>_<post>") -> (id поста, created_at)
+    """
+    query = session.query(Post.id, Post.post_metadata, Post.created_at).filter(Post.status == 'published')
+    if post_ids:
+        query = query.filter(Post.id.in_(post_ids))
+    else:
+        since = datetime.utcnow() - timedelta(days=days)
+        query = query.filter(func.coalesce(Post.published_at, Post.created_at) >= since)
+
+    tracked = {}
+    for post_id, metadata, created_at in query.all():
+        published = metadata.get('published') if isinstance(metadata, dict) else None
+        for copy in published or []:
+            wall_id = _wall_id(copy.get('owner_id'), copy.get('post_id'))
+            if wall_id:
+                tracked[wall_id] = (post_id, created_at)
+    return tracked
+
+
+def parse_counters(item: Dict[str, Any]) -> Dict[str, int]:
+    """Counters of one wall.getById item."""
+    return {
+        key: int((item.get(key) or {}).get('count') or 0)
+        for key in ('views', 'likes', 'reposts', 'comments')
+    }
+
+
+def apply_counters(session, counters: Dict[int, Dict[str, int]]) -> int:
+    """
+    Записывает счетчики одним UPDATE ... FROM (VALUES ...). Коммит делает вызывающий.
+
+    Args:
+        counters: id поста -> {"views", "likes", "reposts", "comments"}
+    """
+    if not counters:
+        return 0
+
+    engagement = values(
+        column('id', Integer), column('views', Integer), column('likes', Integer),
+        column('reposts', Integer), column('comments', Integer),
+        name='engagement'
+    ).data([
+        (post_id, c['views'], c['likes'], c['reposts'], c['comments'])
+        for post_id, c in counters.items()
+    ])
+    metadata = case(
+        (func.json_typeof(Post.post_metadata) == 'object', cast(Post.post_metadata, JSONB)),
+        else_=cast(literal('{}'), JSONB)
+    )
+    stmt = update(Post).where(Post.id == engagement.c.id).values(
+        view_count=engagement.c.views,
+        like_count=engagement.c.likes,
+        post_metadata=cast(metadata.op('||')(func.jsonb_build_object(
+            'engagement', func.jsonb_build_object(
+                'reposts', engagement.c.reposts,
+                'comments', engagement.c.comments,
+                'updated_at', func.now()
+            )
+        )), JSON),
+        # Обновление счетчиков не считается изменением поста
+        updated_at=Post.updated_at
+    ).execution_options(synchronize_session=False)
+    return session.execute(stmt).rowcount
+
+
+async def refresh_engagement(session, get_by_id: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+                             days: int = ENGAGEMENT_REFRESH_DAYS,
+                             post_ids: Optional[List[int]] = None) -> Dict[str, int]:
+    """
+    Обновляет просмотры, лайки, репосты и комментарии отслеживаемых постов.
+
+    Args:
+        session: Сессия SQLAlchemy
+        get_by_id: Корутина wall.getById для пачки wall id (до 100)
+        days: Окно отслеживания в днях
+        post_ids: Обновить только эти посты
+
+    Returns:
+        {"tracked": ..., "api_calls": ..., "updated": ...}
+    """
+    tracked = select_tracked_posts(session, days, post_ids)
+    wall_ids = list(tracked)
+    batches = [wall_ids[i:i + VK_GET_BY_ID_MAX_POSTS] for i in range(0, len(wall_ids), VK_GET_BY_ID_MAX_POSTS)]
+
+    results = await asyncio.gather(*[get_by_id(batch) for batch in batches], return_exceptions=True)
+
+    counters = {}
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            logger.error(f"wall.getById failed for {len(batch)} posts: {result}")
+            continue
+        for item in result:
+            wall_id = _wall_id(item.get('owner_id'), item.get('id'))
+            if wall_id in tracked:
+                # Копии поста в разных группах суммируются
+                total = counters.setdefault(tracked[wall_id][0], {})
+                for key, value in parse_counters(item).items():
+                    total[key] = total.get(key, 0) + value
+
+    try:
+        updated = apply_counters(session, counters)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    if updated:
+        touch_daily_stats(session, *{created_at for post_id, created_at in tracked.values() if post_id in counters})
+        invalidate_response_cache("posts", "stats")
+
+    logger.info(f"Engagement refreshed for {updated}/{len(tracked)} posts with {len(batches)} wall.getById calls")
+    return {"tracked": len(tracked), "api_calls": len(batches), "updated": updated}
@@ -0,0 +1,103 @@
+"""
+Publisher of dashboard live events.
+
+Celery tasks and services publish small JSON events (new posts, status
+transitions, task completions, token health) to one Redis pub/sub channel.
+Every web process keeps a single subscription and fans events out to its
+SSE clients (see web/events.py). Without Redis events are delivered only to
+listeners in the publishing process.
+
+``publish_event`` is called from async code paths, so it never talks to Redis
+itself: events are queued and published by a background thread of the
+process. A slow or missing Redis delays events, not writes.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+try:
+    import redis
+except ImportError:
+    # Graceful degradation if redis is not available
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", os.getenv("REDIS_URL", ""))
+EVENTS_CHANNEL = "postopus:events"
+# Сколько событий может ждать публикации; при переполнении новые события отбрасываются
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "1000"))
+
+_client = None
+_client_lock = threading.Lock()
+_queue: "queue.Queue[Dict[str, Any]]" = None
+_publisher_pid = None
+_local_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def _get_client():
+    global _client
+    if not (EVENTS_REDIS_URL and redis):
+        return None
+    with _client_lock:
+        if _client is None:
+            _client = redis.Redis.from_url(EVENTS_REDIS_URL, socket_timeout=2)
+    return _client
+
+
+def add_local_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    """Подписывает обработчик на события этого процесса (режим без Redis)."""
+    _local_listeners.append(listener)
+
+
+def remove_local_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    if listener in _local_listeners:
+        _local_listeners.remove(listener)
+
+
+def _get_queue() -> "queue.Queue[Dict[str, Any]]":
+    """Очередь фонового публикатора (после fork поток создается заново)."""
+    global _queue, _publisher_pid
+    with _client_lock:
+        if _queue is None or _publisher_pid != os.getpid():
+            _queue = queue.Queue(maxsize=EVENTS_QUEUE_SIZE)
+            _publisher_pid = os.getpid()
+            threading.Thread(target=_publish_loop, args=(_queue,), name="postopus-events", daemon=True).start()
+    return _queue
+
+
+def _publish_loop(events: "queue.Queue[Dict[str, Any]]") -> None:
+    while True:
+        event = events.get()
+        try:
+            _get_client().publish(EVENTS_CHANNEL, json.dumps(event, default=str))
+        except Exception as e:
+            logger.warning(f"Failed to publish event {event['type']}: {e}")
+            _notify_local(event)
+
+
+def _notify_local(event: Dict[str, Any]) -> None:
+    for listener in list(_local_listeners):
+        try:
+            listener(event)
+        except Exception as e:
+            logger.warning(f"Local event listener failed: {e}")
+
+
+def publish_event(event_type: str, **data: Any) -> None:
+    """
+    Публикует событие для дашбордов, не дожидаясь Redis. Ошибки только
+    логируются: live-обновления не должны ломать запись данных.
+    """
+    event = {"type": event_type, "data": data, "ts": time.time()}
+    if _get_client() is None:
+        _notify_local(event)
+        return
+    try:
+        _get_queue().put_nowait(event)
+    except queue.Full:
+        logger.warning(f"Event queue is full, dropping event {event_type}")
@@ -15,6 +15,7 @@ from config import Config
 from utils.text_utils import TextProcessor
 from utils.date_utils import DateProcessor
 from utils.image_utils import ImageProcessor
+from utils.minhash import MinHashLSHIndex
 from .vk_service import VKService
 from .database_service import DatabaseService
 
@@ -146,24 +147,36 @@ class LegacyParser:
         try:
             processed_posts = []
             
-            # Создаем текст из старых постов для проверки дубликатов
-            old_posts_text = self._create_old_posts_text(old_posts_data)
+            # Индекс шинглов старых постов для проверки дубликатов по тексту
+            text_index = self._get_text_index(theme)
+            self._add_old_posts_to_index(text_index, old_posts_data)
             
+            posts = []
             for post_data in posts_data:
                 try:
-                    post = self._create_post_from_data(post_data)
-                    
+                    posts.append(self._create_post_from_data(post_data))
+                except Exception as e:
+                    logger.error(f"Error processing post {post_data.get('id', 'unknown')}: {e}")
+            
+            # Хеши всех фото скачиваются параллельно один раз (с дисковым кешем)
+            image_hashes = await self.image_processor.get_image_hashes(self._get_photo_urls(posts))
+            
+            for post in posts:
+                try:
                     # Проверяем, нужно ли обрабатывать пост
-                    if await self._should_process_post(post, theme, old_posts_text):
+                    if await self._should_process_post(post, theme, text_index, image_hashes):
                         processed_posts.append(post)
                         
                         # Добавляем пост в список обработанных
-                        self._add_post_to_processed(post, theme)
+                        self._add_post_to_processed(post, theme, image_hashes)
+                        text_index.add(post.get_unique_id(), self.text_processor.text_to_rafinad(post.text))
                         
                 except Exception as e:
-                    logger.error(f"Error processing post {post_data.get('id', 'unknown')}: {e}")
+                    logger.error(f"Error processing post {post.get_unique_id()}: {e}")
                     continue
             
+            self._save_text_index(theme, text_index)
+            
             # Сортируем по количеству просмотров
             processed_posts.sort(
                 key=lambda x: x.views.get('count', 0) if x.views else 0, 
@@ -176,20 +189,47 @@ class LegacyParser:
             logger.error(f"Error processing posts: {e}")
             return []
     
-    def _create_old_posts_text(self, old_posts_data: List[Dict[str, Any]]) -> str:
-        """Создает текст из старых постов для проверки дубликатов."""
+    def _get_text_index(self, theme: str) -> MinHashLSHIndex:
+        """Загружает индекс шинглов темы из рабочих данных сессии."""
         try:
-            old_text = ""
+            return MinHashLSHIndex.from_dict(self.config.work.get(theme, {}).get('text_index'))
+        except Exception as e:
+            logger.error(f"Error loading text index: {e}")
+            return MinHashLSHIndex()
+    
+    def _save_text_index(self, theme: str, text_index: MinHashLSHIndex) -> None:
+        """Сохраняет индекс шинглов в рабочие данные (попадает в save_session_data)."""
+        try:
+            if theme not in self.config.work:
+                self.config.work[theme] = {'lip': [], 'hash': []}
+            self.config.work[theme]['text_index'] = text_index.to_dict()
+        except Exception as e:
+            logger.error(f"Error saving text index: {e}")
+    
+    def _add_old_posts_to_index(self, text_index: MinHashLSHIndex, old_posts_data: List[Dict[str, Any]]) -> None:
+        """Добавляет в индекс старые посты, которых в нем еще нет."""
+        try:
+            reklama = self.config.heshteg.get('reklama', '')
             for post_data in old_posts_data:
-                if 'text' in post_data and post_data['text']:
-                    # Очищаем текст от копирования истории
-                    text = self._clear_copy_history(post_data['text'])
-                    if not self.text_processor.search_text([self.config.heshteg.get('reklama', '')], text):
-                        old_text += self.text_processor.text_to_rafinad(text)
-            return old_text
+                if not post_data.get('text'):
+                    continue
+                key = f"{post_data.get('owner_id')}_{post_data.get('id')}"
+                if key in text_index:
+                    continue
+                # Очищаем текст от копирования истории
+                text = self._clear_copy_history(post_data['text'])
+                if not self.text_processor.search_text([reklama], text):
+                    text_index.add(key, self.text_processor.text_to_rafinad(text))
         except Exception as e:
-            logger.error(f"Error creating old posts text: {e}")
-            return ""
+            logger.error(f"Error indexing old posts: {e}")
+    
+    def _get_photo_urls(self, posts: List[Post]) -> List[str]:
+        """Возвращает URL всех фото из вложений постов."""
+        return [
+            att.url
+            for post in posts if post.attachments
+            for att in post.attachments if att.type == 'photo' and att.url
+        ]
     
     def _clear_copy_history(self, text: str) -> str:
         """Очищает текст от копирования истории."""
@@ -250,7 +290,13 @@ class LegacyParser:
             logger.error(f"Error getting best photo URL: {e}")
             return ""
     
-    async def _should_process_post(self, post: Post, theme: str, old_posts_text: str) -> bool:
+    async def _should_process_post(
+        self, 
+        post: Post, 
+        theme: str, 
+        text_index: MinHashLSHIndex, 
+        image_hashes: Optional[Dict[str, str]] = None
+    ) -> bool:
         """Определяет, нужно ли обрабатывать пост."""
         try:
             # Проверка на возраст поста
@@ -278,8 +324,11 @@ class LegacyParser:
                 return False
             
             # Проверка на дубликаты по тексту
-            if self._is_text_duplicate(post, old_posts_text):
-                logger.debug(f"Post {post.get_unique_id()} is text duplicate")
+            if self._is_text_duplicate(post, text_index):
+                return False
+            
+            # Проверка на дубликаты по изображениям
+            if image_hashes and self._is_image_duplicate(post, theme, image_hashes):
                 return False
             
             return True
@@ -303,23 +352,43 @@ class LegacyParser:
             logger.error(f"Error checking duplicate: {e}")
             return False
     
-    def _is_text_duplicate(self, post: Post, old_posts_text: str) -> bool:
-        """Проверяет, является ли пост дубликатом по тексту."""
+    def _is_text_duplicate(self, post: Post, text_index: MinHashLSHIndex) -> bool:
+        """Проверяет, является ли пост почти дубликатом уже опубликованного текста."""
         try:
-            if not old_posts_text:
+            if not len(text_index):
                 return False
             
-            # Преобразуем текст поста в рафинад
-            post_rafinad = self.text_processor.text_to_rafinad(post.text)
+            # Преобразуем текст поста в рафинад и ищем похожие по MinHash
+            match = text_index.best_match(self.text_processor.text_to_rafinad(post.text))
+            if not match:
+                return False
             
-            # Проверяем, есть ли часть текста в старых постах
-            text_part = post_rafinad[int(len(post_rafinad) * 0.2):int(len(post_rafinad) * 0.7)]
-            return self.text_processor.search_text([text_part], old_posts_text)
+            key, similarity = match
+            logger.debug(f"Post {post.get_unique_id()} is text duplicate of {key} (similarity {similarity:.2f})")
+            return True
             
         except Exception as e:
             logger.error(f"Error checking text duplicate: {e}")
             return False
     
+    def _is_image_duplicate(self, post: Post, theme: str, image_hashes: Dict[str, str]) -> bool:
+        """Проверяет, публиковались ли уже похожие фото (по расстоянию Хэмминга)."""
+        try:
+            known_hashes = self.config.work.get(theme, {}).get('hash', [])
+            if not known_hashes or not post.attachments:
+                return False
+            
+            for att in post.attachments:
+                image_hash = image_hashes.get(att.url) if att.type == 'photo' and att.url else None
+                if image_hash and self.image_processor.find_similar_hash(image_hash, known_hashes):
+                    logger.debug(f"Post {post.get_unique_id()} has duplicate image {att.url}")
+                    return True
+            
+            return False
+        except Exception as e:
+            logger.error(f"Error checking image duplicate: {e}")
+            return False
+    
     def _check_theme_specific_rules(self, post: Post, theme: str) -> bool:
         """Проверяет правила, специфичные для темы."""
         try:
@@ -343,7 +412,12 @@ class LegacyParser:
             logger.error(f"Error checking theme specific rules: {e}")
             return False
     
-    def _add_post_to_processed(self, post: Post, theme: str) -> None:
+    def _add_post_to_processed(
+        self, 
+        post: Post, 
+        theme: str, 
+        image_hashes: Optional[Dict[str, str]] = None
+    ) -> None:
         """Добавляет пост в список обработанных."""
         try:
             if theme not in self.config.work:
@@ -361,7 +435,10 @@ class LegacyParser:
             if post.attachments:
                 for att in post.attachments:
                     if att.type == 'photo' and att.url:
-                        image_hash = self.image_processor.get_image_hash(att.url)
+                        if image_hashes is not None:
+                            image_hash = image_hashes.get(att.url)
+                        else:
+                            image_hash = self.image_processor.get_image_hash(att.url)
                         if image_hash:
                             if 'hash' not in self.config.work[theme]:
                                 self.config.work[theme]['hash'] = []
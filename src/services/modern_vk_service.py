@@ -4,27 +4,55 @@ Enhanced with PostgreSQL integration and regional support.
 """
 import logging
 import asyncio
+import os
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import httpx
 import json
 
 from ..web.database import get_database
 from ..web.models import Group, Post, VKToken
+from .vk_execute import VKExecuteBatcher, VK_EXECUTE_BATCHING
+from .rate_limiter import get_rate_limiter
+from .vk_publish import VKPublishError, VK_PUBLISH_CONCURRENCY, publish_guid, publish_to_all
+from .token_scheduler import VKTokenScheduler
+from .token_health import get_token_health, probe_token
+from .wall_sync import get_sync_state, plan_page_size, select_new_posts, update_sync_state, VK_SYNC_MAX_POSTS
+from .daily_stats import touch_days as touch_daily_stats
+from .post_ingest import upsert_posts
+from .engagement import VK_GET_BY_ID_MAX_POSTS
+from ..web.response_cache import invalidate_response_cache
+from .event_bus import publish_event
 
 logger = logging.getLogger(__name__)
 
+# Настройки пула соединений к api.vk.com
+VK_HTTP2_ENABLED = os.getenv("VK_HTTP2_ENABLED", "true").lower() == "true"
+VK_HTTP_MAX_CONNECTIONS = int(os.getenv("VK_HTTP_MAX_CONNECTIONS", "20"))
+VK_HTTP_MAX_KEEPALIVE = int(os.getenv("VK_HTTP_MAX_KEEPALIVE", "10"))
+VK_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("VK_HTTP_KEEPALIVE_EXPIRY", "60"))
+VK_HTTP_TIMEOUT = float(os.getenv("VK_HTTP_TIMEOUT", "10"))
+
+# Сколько запросов wall.get одновременно выполняется на одном токене
+VK_FETCH_CONCURRENCY = int(os.getenv("VK_FETCH_CONCURRENCY", "3"))
+
 
 class ModernVKService:
     """Modern VK API service using httpx with regional and database support."""
     
     def __init__(self):
-        self.base_url = "https://api.vk.com/method"
+        self.base_url = os.getenv("VK_API_BASE_URL", "https://api.vk.com/method")
         self.api_version = "5.131"
         self.db = get_database()
         self.tokens: Dict[str, VKToken] = {}
-        self.rate_limits: Dict[str, float] = {}  # token -> last_request_time
+        self.rate_limiter = get_rate_limiter()  # token bucket shared across workers
+        self.token_scheduler = VKTokenScheduler(self.rate_limiter)  # pool of read tokens
+        self.token_health = get_token_health()  # cached probe results shared by processes
+        self.client: Optional[httpx.AsyncClient] = None  # shared keep-alive client
+        self._token_semaphores: Dict[tuple, asyncio.Semaphore] = {}
+        # wall.get calls are packed into execute requests (up to 25 per request)
+        self.batcher: Optional[VKExecuteBatcher] = VKExecuteBatcher(self._execute) if VK_EXECUTE_BATCHING else None
         
         # Regional mapping for 15 regions
         self.regions = {
@@ -49,6 +77,9 @@ class ModernVKService:
     async def initialize(self) -> bool:
         """Initialize VK service with tokens from database."""
         try:
+            # Open shared HTTP client
+            self._open_client()
+            
             # Load tokens from database
             await self._load_tokens_from_db()
             
@@ -56,12 +87,14 @@ class ModernVKService:
                 logger.warning("No VK tokens found in database")
                 return False
             
-            # Test connections
+            # Cached health is reused; only expired tokens are probed, concurrently
+            health = await self.token_health.revalidate(
+                [token.token for token in self.tokens.values()], self._probe_token
+            )
             working_tokens = 0
             for region, token in self.tokens.items():
-                if await self._test_token(token.token):
+                if health[token.token] and health[token.token]['healthy']:
                     working_tokens += 1
-                    logger.info(f"Token for region {region} is working")
                 else:
                     logger.warning(f"Token for region {region} is not working")
             
@@ -72,6 +105,45 @@ class ModernVKService:
             logger.error(f"Error initializing VK service: {e}")
             return False
     
+    def _open_client(self) -> httpx.AsyncClient:
+        """Open the shared httpx client (HTTP/2, keep-alive) if not opened yet."""
+        if self.client is not None and not self.client.is_closed:
+            return self.client
+        
+        limits = httpx.Limits(
+            max_connections=VK_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=VK_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=VK_HTTP_KEEPALIVE_EXPIRY
+        )
+        try:
+            self.client = httpx.AsyncClient(
+                http2=VK_HTTP2_ENABLED,
+                limits=limits,
+                timeout=VK_HTTP_TIMEOUT
+            )
+        except ImportError:
+            # Пакет h2 не установлен - работаем по HTTP/1.1 с keep-alive
+            logger.warning("HTTP/2 support not available (install httpx[http2]), falling back to HTTP/1.1")
+            self.client = httpx.AsyncClient(limits=limits, timeout=VK_HTTP_TIMEOUT)
+        return self.client
+    
+    async def close(self):
+        """Close the shared HTTP client."""
+        if self.client is not None:
+            try:
+                await self.client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing VK HTTP client: {e}")
+            finally:
+                self.client = None
+    
+    async def __aenter__(self):
+        self._open_client()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
     async def _load_tokens_from_db(self):
         """Load VK tokens from database."""
         try:
@@ -79,117 +151,178 @@ class ModernVKService:
             session = SessionLocal()
             try:
                 tokens = session.query(VKToken).filter(VKToken.is_active == True).all()
-                for token in tokens:
-                    self.tokens[token.region] = token
+                # Replace the dict so deactivated tokens leave a long-lived service
+                self.tokens = {token.region: token for token in tokens}
+                # Все активные токены читают из общего пула
+                self.token_scheduler.set_tokens({region: token.token for region, token in self.tokens.items()})
                 logger.info(f"Loaded {len(tokens)} VK tokens from database")
             finally:
                 session.close()
         except Exception as e:
             logger.error(f"Error loading tokens from database: {e}")
     
+    async def _probe_token(self, token: str) -> Dict[str, Any]:
+        """Probe a token with users.get over the shared client."""
+        return await probe_token(token, self._open_client(), self.base_url, self.api_version)
+    
     async def _test_token(self, token: str) -> bool:
-        """Test if VK token is working."""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/users.get",
-                    params={
-                        "access_token": token,
-                        "v": self.api_version
-                    },
-                    timeout=10.0
-                )
-                data = response.json()
-                return "error" not in data
-        except Exception as e:
-            logger.error(f"Error testing token: {e}")
-            return False
+        """Test if VK token is working (live, the result is cached in the health registry)."""
+        entry = (await self.token_health.revalidate([token], self._probe_token, force=True))[token]
+        return bool(entry and entry['healthy'])
     
-    async def get_posts_by_region(self, region: str, count: int = 20) -> List[Dict[str, Any]]:
-        """Get posts from VK groups for a specific region."""
+    async def get_posts_by_region(self, region: str, count: int = 20,
+                                  concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get new posts from VK groups for a specific region.
+        
+        Groups' high-water marks are not moved; use ``fetch_region_posts``
+        together with ``save_posts_to_db`` to store posts and marks.
+        """
+        posts, _ = await self.fetch_region_posts(region, count, concurrency)
+        return posts
+    
+    async def fetch_region_posts(self, region: str, count: int = 20,
+                                 concurrency: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+        """
+        Get posts from VK groups for a specific region.
+        
+        Groups are fetched in parallel (at most ``concurrency`` requests in
+        flight per token) while each token's 3 rps budget is preserved.
+        Every group is read with the pool token that has the most budget left.
+        Only posts above each group's high-water mark are returned; ``count``
+        is the page size for groups that were never synced.
+        Posts are returned in the order of the groups list.
+        
+        Returns:
+            (посты, новые состояния синхронизации по id группы). Состояния
+            сохраняются вместе с постами в ``save_posts_to_db``; группы, которые
+            не удалось прочитать, в них не попадают и отметку не сдвигают.
+        """
         try:
             # Get groups for the region from database
             groups = await self._get_groups_by_region(region)
             if not groups:
                 logger.warning(f"No groups found for region: {region}")
-                return []
+                return [], {}
             
-            # Get token for this region
-            token = self.tokens.get(region)
-            if not token:
-                logger.warning(f"No token found for region: {region}")
-                return []
+            # Reads are spread over the whole token pool, not only the region's token
+            if not self.token_scheduler.has_tokens():
+                logger.warning(f"No tokens available for region: {region}")
+                return [], {}
             
-            all_posts = []
+            results = await asyncio.gather(
+                *[self._fetch_group_posts(group, count, region, concurrency) for group in groups],
+                return_exceptions=True
+            )
             
-            for group in groups:
-                try:
-                    group_posts = await self._fetch_posts_from_group(token.token, group.group_id, count)
-                    # Add region info to posts
-                    for post in group_posts:
-                        post['region'] = region
-                        post['source_group'] = group.name
-                        post['source_group_id'] = group.group_id
-                    all_posts.extend(group_posts)
-                    
-                    # Rate limiting
-                    await self._rate_limit(token.token)
-                    
-                except Exception as e:
-                    logger.error(f"Error fetching posts from group {group.name}: {e}")
+            all_posts = []
+            sync_states = {}
+            for group, result in zip(groups, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error fetching posts from group {group.name}: {result}")
                     continue
+                group_posts, sync_states[group.id] = result
+                all_posts.extend(group_posts)
             
-            logger.info(f"Fetched {len(all_posts)} posts from {len(groups)} groups in region {region}")
-            return all_posts
+            logger.info(f"Fetched {len(all_posts)} new posts from {len(sync_states)}/{len(groups)} groups in region {region}")
+            return all_posts, sync_states
             
         except Exception as e:
             logger.error(f"Error getting posts by region {region}: {e}")
-            return []
+            return [], {}
+    
+    async def _fetch_group_posts(self, group: Group, count: int, region: str,
+                                 concurrency: Optional[int] = None) -> tuple:
+        """
+        Fetch one group's new posts within the chosen token's budget.
+        
+        Pages are requested until the group's high-water mark is reached.
+        The first page size follows the group's posting rate.
+        
+        Returns:
+            (новые посты, обновленное состояние синхронизации группы)
+        """
+        state = get_sync_state(group.stats)
+        page_size = plan_page_size(state, count)
+        
+        token = self.token_scheduler.acquire()
+        group_posts = []
+        try:
+            offset = 0
+            while True:
+                items = await self._fetch_page(token, group.group_id, page_size, offset, concurrency)
+                new_posts, reached = select_new_posts(items, state)
+                group_posts.extend(new_posts)
+                offset += len(items)
+                
+                # Без отметки (первая синхронизация) берем только одну страницу
+                if reached or not state.get('last_post_id') or len(items) < page_size or offset >= VK_SYNC_MAX_POSTS:
+                    break
+                page_size = min(100, VK_SYNC_MAX_POSTS - offset)
+        finally:
+            self.token_scheduler.release(token)
+        
+        # Add region info to posts
+        for post in group_posts:
+            post['region'] = region
+            post['source_group'] = group.name
+            post['source_group_id'] = group.group_id
+        return group_posts, update_sync_state(state, group_posts)
+    
+    async def _fetch_page(self, token: str, group_id: str, count: int, offset: int,
+                          concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Fetch one wall page, charging the token's budget."""
+        if self.batcher:
+            # Budget is spent per execute request inside _execute
+            return await self._fetch_posts_from_group(token, group_id, count, offset)
+        async with self._get_token_semaphore(token, concurrency):
+            await self._rate_limit(token)
+            return await self._fetch_posts_from_group(token, group_id, count, offset)
+    
+    def _get_token_semaphore(self, token: str, concurrency: Optional[int] = None) -> asyncio.Semaphore:
+        """Get (or create) the per-token semaphore bounding in-flight requests."""
+        key = (token, max(1, concurrency or VK_FETCH_CONCURRENCY))
+        if key not in self._token_semaphores:
+            self._token_semaphores[key] = asyncio.Semaphore(key[1])
+        return self._token_semaphores[key]
+    
+    def get_token_utilisation(self) -> List[Dict[str, Any]]:
+        """Get per-token utilisation of the read pool."""
+        return self.token_scheduler.get_utilisation()
     
     async def publish_to_groups(self, post_data: Dict[str, Any], target_groups: List[str], region: str = None) -> Dict[str, Any]:
-        """Publish a post to multiple VK groups."""
-        results = {'success': [], 'failed': [], 'total': len(target_groups)}
+        """
+        Publish a post to multiple VK groups.
         
+        Groups are posted to concurrently (at most ``VK_PUBLISH_CONCURRENCY``
+        requests in flight) within the region token's 3 rps budget.
+        Each wall.post carries an idempotency ``guid``, so retries never
+        double-post.
+        """
         # Get token for this region
-        token = self.tokens.get(region) if region else list(self.tokens.values())[0]
+        token = self.tokens.get(region) if region else next(iter(self.tokens.values()), None)
         if not token:
             logger.error("No token available for publishing")
-            return results
+            return {'success': [], 'failed': [], 'total': len(target_groups)}
         
-        for group_id in target_groups:
-            try:
-                # Format the post
-                formatted_text = self._format_post_text(post_data, region)
-                attachments = self._format_attachments(post_data.get('attachments', []))
-                
-                # Post to VK
-                response = await self._post_to_vk(token.token, group_id, formatted_text, attachments)
-                
-                if response and "error" not in response:
-                    results['success'].append({
-                        'group_id': group_id,
-                        'post_id': response.get('post_id'),
-                        'url': f"https://vk.com/wall{group_id}_{response.get('post_id')}"
-                    })
-                    logger.info(f"Successfully posted to group {group_id}")
-                else:
-                    results['failed'].append({
-                        'group_id': group_id,
-                        'error': response.get('error', 'Unknown error') if response else 'No response'
-                    })
-                
-                # Rate limiting
+        # Text and attachments are the same for every group
+        formatted_text = self._format_post_text(post_data, region)
+        attachments = self._format_attachments(post_data.get('attachments', []))
+        
+        async def publish_one(group_id: str):
+            async with self._get_token_semaphore(token.token, VK_PUBLISH_CONCURRENCY):
                 await self._rate_limit(token.token)
-                
-            except Exception as e:
-                logger.error(f"Failed to post to group {group_id}: {e}")
-                results['failed'].append({
-                    'group_id': group_id,
-                    'error': str(e)
-                })
+                response = await self._post_to_vk(
+                    token.token, group_id, formatted_text, attachments,
+                    guid=publish_guid(post_data, group_id)
+                )
+            if not response:
+                raise VKPublishError("No response")
+            if "error" in response:
+                raise VKPublishError(response['error'].get('error_msg', response['error']))
+            return response.get('response', {}).get('post_id')
         
-        logger.info(f"Published to {len(results['success'])}/{len(target_groups)} groups")
-        return results
+        return await publish_to_all(target_groups, publish_one)
     
     async def _get_groups_by_region(self, region: str) -> List[Group]:
         """Get groups from database by region."""
@@ -205,52 +338,105 @@ class ModernVKService:
             logger.error(f"Error getting groups for region {region}: {e}")
             return []
     
-    async def _fetch_posts_from_group(self, token: str, group_id: str, count: int = 20) -> List[Dict[str, Any]]:
-        """Fetch posts from a specific VK group."""
+    async def _fetch_posts_from_group(self, token: str, group_id: str, count: int = 20,
+                                      offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Fetch posts from a specific VK group.
+        
+        Errors are raised, not returned as an empty page: an empty page
+        means "no new posts" and would move the group's sync state.
+        """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/wall.get",
-                    params={
-                        "access_token": token,
-                        "owner_id": group_id,
-                        "count": min(count, 100),  # VK API limit
-                        "offset": 0,
-                        "v": self.api_version
-                    },
-                    timeout=10.0
-                )
-                data = response.json()
-                
-                if "error" in data:
-                    logger.error(f"VK API error: {data['error']}")
-                    return []
-                
-                return data.get('response', {}).get('items', [])
-                
+            if self.batcher:
+                return await self.batcher.wall_get(token, group_id, count, offset)
+            
+            response = await self._open_client().get(
+                f"{self.base_url}/wall.get",
+                params={
+                    "access_token": token,
+                    "owner_id": group_id,
+                    "count": min(count, 100),  # VK API limit
+                    "offset": offset,
+                    "v": self.api_version
+                }
+            )
+            data = response.json()
+            
+            if "error" in data:
+                self.token_scheduler.report_response(token, data)
+                raise Exception(f"VK API error: {data['error']}")
+            
+            return data.get('response', {}).get('items', [])
+            
         except Exception as e:
             logger.error(f"Error fetching from group {group_id}: {e}")
-            return []
+            raise
     
-    async def _post_to_vk(self, token: str, group_id: str, text: str, attachments: str = "") -> Optional[Dict[str, Any]]:
-        """Post to VK group."""
+    async def get_posts_by_id(self, wall_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Read up to 100 wall posts ("<owner_id>_<post_id>") with one wall.getById call.
+        
+        The request uses the pool token with the most budget left.
+        """
+        token = self.token_scheduler.acquire()
+        if not token:
+            raise Exception("No tokens available for wall.getById")
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/wall.post",
-                    params={
+            async with self._get_token_semaphore(token):
+                await self._rate_limit(token)
+                response = await self._open_client().post(
+                    f"{self.base_url}/wall.getById",
+                    data={
                         "access_token": token,
-                        "owner_id": group_id,
-                        "message": text,
-                        "attachments": attachments,
-                        "from_group": 1,
+                        "posts": ",".join(wall_ids[:VK_GET_BY_ID_MAX_POSTS]),
                         "v": self.api_version
-                    },
-                    timeout=10.0
+                    }
                 )
-                data = response.json()
-                return data
-                
+            data = response.json()
+            self.token_scheduler.report_response(token, data)
+        finally:
+            self.token_scheduler.release(token)
+        
+        if "error" in data:
+            raise Exception(f"VK API error: {data['error']}")
+        items = data.get('response', [])
+        # Newer API versions wrap the list into {"items": [...]}
+        return items.get('items', []) if isinstance(items, dict) else items
+    
+    async def _execute(self, token: str, code: str) -> Dict[str, Any]:
+        """Run VKScript code via the execute method within the token's budget."""
+        async with self._get_token_semaphore(token):
+            await self._rate_limit(token)
+            response = await self._open_client().post(
+                f"{self.base_url}/execute",
+                data={
+                    "access_token": token,
+                    "code": code,
+                    "v": self.api_version
+                }
+            )
+        data = response.json()
+        self.token_scheduler.report_response(token, data)
+        return data
+    
+    async def _post_to_vk(self, token: str, group_id: str, text: str, attachments: str = "",
+                          guid: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Post to VK group (``guid`` makes repeated calls return the same post)."""
+        try:
+            params = {
+                "access_token": token,
+                "owner_id": group_id,
+                "message": text,
+                "attachments": attachments,
+                "from_group": 1,
+                "v": self.api_version
+            }
+            if guid:
+                params["guid"] = guid
+            response = await self._open_client().post(f"{self.base_url}/wall.post", params=params)
+            data = response.json()
+            return data
+            
         except Exception as e:
             logger.error(f"Error posting to group {group_id}: {e}")
             return None
@@ -291,44 +477,33 @@ class ModernVKService:
         return ",".join(formatted[:10])  # VK limit is 10 attachments
     
     async def _rate_limit(self, token: str):
-        """Implement rate limiting for VK API."""
-        now = time.time()
-        last_request = self.rate_limits.get(token, 0)
-        
-        # VK API allows 3 requests per second
-        if now - last_request < 0.34:  # ~3 requests per second
-            await asyncio.sleep(0.34 - (now - last_request))
-        
-        self.rate_limits[token] = time.time()
+        """Implement rate limiting for VK API (3 rps per token across all workers)."""
+        await self.rate_limiter.acquire(token)
     
-    async def test_connection(self) -> Dict[str, Any]:
-        """Test VK API connection with current tokens."""
-        results = {
-            'total_tokens': len(self.tokens),
-            'working_tokens': 0,
-            'details': []
-        }
+    def get_rate_limit_metrics(self) -> Dict[str, Any]:
+        """Get rate limiter wait-time metrics for this process."""
+        return self.rate_limiter.get_metrics()
+    
+    async def test_connection(self, revalidate: bool = False) -> Dict[str, Any]:
+        """
+        Report health of current tokens from the health registry.
         
-        for region, token in self.tokens.items():
-            try:
-                is_working = await self._test_token(token.token)
-                if is_working:
-                    results['working_tokens'] += 1
-                
-                results['details'].append({
-                    'region': region,
-                    'group_id': token.group_id,
-                    'status': 'working' if is_working else 'error',
-                    'last_used': token.last_used.isoformat() if token.last_used else None
-                })
-            except Exception as e:
-                results['details'].append({
-                    'region': region,
-                    'group_id': token.group_id,
-                    'status': 'error',
-                    'error': str(e)
-                })
+        Without ``revalidate`` the answer never waits for VK: expired
+        entries are re-probed in the background. With it, expired tokens
+        are probed concurrently before answering.
+        """
+        tokens = {region: token.token for region, token in self.tokens.items()}
+        if revalidate:
+            await self.token_health.revalidate(tokens.values(), self._probe_token)
+        else:
+            self.token_health.schedule_revalidation(tokens.values(), self._probe_token)
         
+        results = await self.token_health.summary_async(tokens)
+        for detail in results['details']:
+            token = self.tokens[detail['name']]
+            detail['region'] = detail.pop('name')
+            detail['group_id'] = token.group_id
+            detail['last_used'] = token.last_used.isoformat() if token.last_used else None
         return results
     
     async def get_group_info(self, group_id: str, token: str = None) -> Optional[Dict[str, Any]]:
@@ -337,26 +512,24 @@ class ModernVKService:
             token = list(self.tokens.values())[0].token
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/groups.getById",
-                    params={
-                        "access_token": token,
-                        "group_ids": group_id,
-                        "fields": "description,members_count,status",
-                        "v": self.api_version
-                    },
-                    timeout=10.0
-                )
-                data = response.json()
-                
-                if "error" in data:
-                    logger.error(f"VK API error: {data['error']}")
-                    return None
-                
-                groups = data.get('response', [])
-                return groups[0] if groups else None
-                
+            response = await self._open_client().get(
+                f"{self.base_url}/groups.getById",
+                params={
+                    "access_token": token,
+                    "group_ids": group_id,
+                    "fields": "description,members_count,status",
+                    "v": self.api_version
+                }
+            )
+            data = response.json()
+            
+            if "error" in data:
+                logger.error(f"VK API error: {data['error']}")
+                return None
+            
+            groups = data.get('response', [])
+            return groups[0] if groups else None
+            
         except Exception as e:
             logger.error(f"Error getting group info for {group_id}: {e}")
             return None
@@ -386,30 +559,61 @@ class ModernVKService:
                     region=post_data.get('region', ''),
                     theme=post_data.get('theme', ''),
                     status='pending',
-                    vk_post_id=post_data.get('id'),
-                    vk_group_id=post_data.get('source_group_id'),
+                    vk_post_id=str(post_data['id']) if post_data.get('id') is not None else None,
+                    vk_group_id=str(post_data['source_group_id']) if post_data.get('source_group_id') is not None else None,
                     created_at=datetime.utcnow()
                 )
                 session.add(post)
                 session.commit()
                 session.refresh(post)
+                touch_daily_stats(session, post.created_at)
+                invalidate_response_cache("posts")
+                publish_event("posts.created", count=1, regions=[post.region] if post.region else [])
                 return post.id
         except Exception as e:
             logger.error(f"Error saving post to database: {e}")
             return None
     
-    async def update_post_status(self, post_id: int, status: str, vk_post_id: str = None):
-        """Update post status in database."""
+    async def save_posts_to_db(self, posts: List[Dict[str, Any]],
+                               sync_states: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, int]:
+        """
+        Save a batch of posts in one transaction (insert or update by VK id).
+        
+        Groups' high-water marks from ``fetch_region_posts`` are committed in
+        the same transaction, so they never move past posts that were not saved.
+        """
+        try:
+            with self.db.get_session() as session:
+                return upsert_posts(session, posts, sync_states)
+        except Exception as e:
+            logger.error(f"Error saving posts batch to database: {e}")
+            return {"inserted": 0, "updated": 0}
+
+    async def update_post_status(self, post_id: int, status: str,
+                                 published: Optional[List[Dict[str, Any]]] = None):
+        """
+        Update post status in database.
+        
+        ``published`` lists the wall copies created by publishing
+        (``{"owner_id", "post_id"}``); they are kept in
+        ``post_metadata['published']`` for engagement refresh.
+        """
         try:
             with self.db.get_session() as session:
                 post = session.query(Post).filter(Post.id == post_id).first()
                 if post:
                     post.status = status
-                    if vk_post_id:
-                        post.vk_post_id = vk_post_id
+                    # vk_post_id остается id исходного поста, копии хранятся в метаданных
+                    if published:
+                        metadata = post.post_metadata if isinstance(post.post_metadata, dict) else {}
+                        # JSON колонку переприсваиваем целиком, иначе SQLAlchemy не увидит изменений
+                        post.post_metadata = {**metadata, 'published': published}
                     if status == 'published':
                         post.published_at = datetime.utcnow()
                     session.commit()
+                    touch_daily_stats(session, post.created_at)
+                    invalidate_response_cache("posts")
+                    publish_event("post.status", id=post.id, status=status, region=post.region)
         except Exception as e:
             logger.error(f"Error updating post status: {e}")
 
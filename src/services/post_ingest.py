@@ -0,0 +1,113 @@
+"""
+Bulk ingest of posts fetched from VK.
+
+A whole region batch is written with a single
+``INSERT ... ON CONFLICT (vk_group_id, vk_post_id) DO UPDATE`` statement in
+one transaction. The unique constraint ``uq_postopus_posts_vk_post`` makes
+re-fetching a post refresh its text and metadata instead of adding a copy.
+``RETURNING (xmax = 0)`` tells freshly inserted rows from updated ones.
+"""
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import insert
+
+from ..web.models import Post
+from .daily_stats import touch_days as touch_daily_stats
+from ..web.response_cache import invalidate_response_cache
+from .event_bus import publish_event
+from .wall_sync import apply_sync_states
+
+logger = logging.getLogger(__name__)
+
+# Колонки, которые обновляются при повторном получении поста (статус и дата создания сохраняются)
+_UPDATE_COLUMNS = ['title', 'content', 'region', 'theme', 'post_metadata', 'updated_at']
+
+
+def _post_row(post_data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    vk_post_id = post_data.get('id')
+    vk_group_id = post_data.get('source_group_id')
+    return {
+        'title': post_data.get('title', ''),
+        'content': post_data.get('text', ''),
+        'region': post_data.get('region', ''),
+        'theme': post_data.get('theme') or 'novost',
+        'status': 'pending',
+        'vk_post_id': str(vk_post_id) if vk_post_id is not None else None,
+        'vk_group_id': str(vk_group_id) if vk_group_id is not None else None,
+        'post_metadata': {
+            'vk_post_id': vk_post_id,
+            'source_group': post_data.get('source_group'),
+            'date': post_data.get('date'),
+            'views': post_data.get('views', {}),
+            'likes': post_data.get('likes', {}),
+        },
+        'created_at': now,
+        'updated_at': now,
+    }
+
+
+def upsert_posts(session, posts: List[Dict[str, Any]],
+                 sync_states: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, int]:
+    """
+    Сохраняет пачку постов одним запросом.
+
+    Args:
+        session: Сессия SQLAlchemy (коммит выполняется здесь)
+        posts: Посты в формате wall.get с полями region и source_group_id
+        sync_states: Новые состояния синхронизации групп (id группы -> состояние),
+            записываются в той же транзакции, что и посты
+
+    Returns:
+        {"inserted": ..., "updated": ...}
+    """
+    if not posts:
+        if sync_states:
+            _commit_sync_states(session, sync_states)
+        return {"inserted": 0, "updated": 0}
+
+    now = datetime.utcnow()
+    rows = {}
+    for post_data in posts:
+        row = _post_row(post_data, now)
+        # ON CONFLICT не может изменить одну строку дважды за запрос - оставляем последний вариант
+        key = (row['vk_group_id'], row['vk_post_id']) if row['vk_post_id'] else len(rows)
+        rows[key] = row
+
+    stmt = insert(Post).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Post.vk_group_id, Post.vk_post_id],
+        set_={column: stmt.excluded[column] for column in _UPDATE_COLUMNS}
+    ).returning(Post.id, literal_column('(xmax = 0)').label('inserted'))
+
+    try:
+        results = session.execute(stmt).all()
+        apply_sync_states(session, sync_states)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    inserted = sum(1 for row in results if row.inserted)
+    touch_daily_stats(session, now)
+    invalidate_response_cache("posts")
+    if sync_states:
+        invalidate_response_cache("groups")
+    if inserted:
+        regions = sorted({row['region'] for row in rows.values() if row['region']})
+        publish_event("posts.created", count=inserted, regions=regions)
+    logger.info(f"Upserted {len(results)} posts: {inserted} inserted, {len(results) - inserted} updated")
+    return {"inserted": inserted, "updated": len(results) - inserted}
+
+
+def _commit_sync_states(session, sync_states: Dict[int, Dict[str, Any]]):
+    """Новых постов нет - сохраняем только состояния синхронизации групп."""
+    try:
+        apply_sync_states(session, sync_states)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    invalidate_response_cache("groups")
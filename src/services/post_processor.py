@@ -15,6 +15,11 @@ except ImportError:
 from ..models.config import AppConfig
 from ..web.models import Post as DBPost, Group
 from ..web.database import get_database
+from .dedup_index import get_dedup_index
+from ..utils.blacklist_matcher import get_blacklist_matcher
+from .daily_stats import touch_days as touch_daily_stats
+from ..web.response_cache import invalidate_response_cache
+from .event_bus import publish_event
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +34,7 @@ class EnhancedPostProcessor:
         # Initialize filtering data
         self.blacklisted_words = []
         self.blacklisted_groups = []
-        self.processed_posts_cache = set()  # Cache for duplicate checking
+        self.dedup_index = get_dedup_index()  # Shared index for duplicate checking
         self.image_hashes = set()  # Cache for image duplicate checking
         
         # Regional configuration
@@ -96,34 +101,37 @@ class EnhancedPostProcessor:
             # Load blacklisted groups
             self.blacklisted_groups = self.config.filters.black_id or []
             
-            # Load processed posts from database for duplicate checking
-            with self.db.get_session() as session:
-                recent_posts = session.query(DBPost).filter(
-                    DBPost.created_at > datetime.utcnow() - timedelta(days=7)
-                ).all()
-                
-                for post in recent_posts:
-                    if post.post_metadata and 'vk_post_id' in post.post_metadata:
-                        self.processed_posts_cache.add(post.post_metadata['vk_post_id'])
+            # Processed posts live in the shared dedup index, backfilled only once
+            await self.dedup_index.ensure_loaded_async()
             
             logger.info(f"Loaded {len(self.blacklisted_words)} blacklisted words, "
                        f"{len(self.blacklisted_groups)} blacklisted groups, "
-                       f"{len(self.processed_posts_cache)} processed posts")
+                       f"dedup index: {self.dedup_index.backend}")
                        
         except Exception as e:
             logger.error(f"Error loading filtering data: {e}")
     
     async def process_posts_by_region(self, posts_data: List[Dict[str, Any]], 
                                     region: str, theme: str = 'novost') -> List[Dict[str, Any]]:
-        """Process posts for a specific region with filtering."""
+        """
+        Process posts for a specific region with filtering.
+        
+        Processed posts are not added to the dedup index here: the caller
+        adds them after the posts are saved, so a failed write can be retried.
+        """
         await self.load_filtering_data()
         
         processed_posts = []
         
+        # One index lookup for the whole batch
+        seen_posts = await self.dedup_index.contains_many_async(
+            f"{p['owner_id']}_{p['id']}" for p in posts_data if p.get('id') and 'owner_id' in p
+        )
+        
         for post_data in posts_data:
             try:
                 # Convert VK post data to internal format
-                processed_post = await self._process_single_post(post_data, region, theme)
+                processed_post = await self._process_single_post(post_data, region, theme, seen_posts)
                 
                 if processed_post:
                     processed_posts.append(processed_post)
@@ -142,7 +150,8 @@ class EnhancedPostProcessor:
         return processed_posts
     
     async def _process_single_post(self, post_data: Dict[str, Any], 
-                                  region: str, theme: str) -> Optional[Dict[str, Any]]:
+                                  region: str, theme: str,
+                                  seen_posts: Optional[set] = None) -> Optional[Dict[str, Any]]:
         """Process a single post with all filtering rules."""
         # Basic validation
         if not post_data.get('id') or not post_data.get('date'):
@@ -152,7 +161,9 @@ class EnhancedPostProcessor:
         post_id = f"{post_data['owner_id']}_{post_data['id']}"
         
         # Check if already processed
-        if post_id in self.processed_posts_cache:
+        if seen_posts is None:
+            seen_posts = await self.dedup_index.contains_many_async([post_id])
+        if post_id in seen_posts:
             logger.debug(f"Post {post_id} already processed")
             return None
         
@@ -204,8 +215,8 @@ class EnhancedPostProcessor:
             'source_url': f"https://vk.com/wall{post_data['owner_id']}_{post_data['id']}"
         }
         
-        # Add to processed cache
-        self.processed_posts_cache.add(post_id)
+        # Duplicates within the same batch
+        seen_posts.add(post_id)
         
         return processed_post
     
@@ -232,13 +243,7 @@ class EnhancedPostProcessor:
     
     def _contains_blacklisted_content(self, text: str) -> bool:
         """Check if text contains blacklisted words or phrases."""
-        text_lower = text.lower()
-        
-        for blacklisted_word in self.blacklisted_words:
-            if blacklisted_word.lower() in text_lower:
-                return True
-        
-        return False
+        return get_blacklist_matcher('post_processor:blacklisted_words', self.blacklisted_words).search(text)
     
     def _passes_theme_filter(self, post_data: Dict[str, Any], theme: str) -> bool:
         """Apply theme-specific filtering rules."""
@@ -347,13 +352,17 @@ class EnhancedPostProcessor:
                 logger.warning("SQLAlchemy not available, cannot save post")
                 return None
                 
+            # vk_group_id/vk_post_id - стена и id исходного поста, как при upsert_posts
+            # (owner_id репоста заменяется на владельца оригинала, поэтому берем из ключа)
+            source_owner_id, source_post_id = processed_post['vk_post_id'].rsplit('_', 1)
             with self.db.get_session() as session:
                 db_post = DBPost(
                     title=f"Post from {processed_post['region']}",
                     content=processed_post['text'],
                     region=processed_post['region'],
-                    source_collection=processed_post['theme'],
-                    vk_group_id=str(processed_post['owner_id']),
+                    theme=processed_post['theme'],
+                    vk_group_id=source_owner_id,
+                    vk_post_id=source_post_id,
                     status='published',
                     created_at=processed_post['date'],
                     post_metadata={
@@ -367,6 +376,11 @@ class EnhancedPostProcessor:
                 
                 session.add(db_post)
                 session.commit()
+                # В индекс дубликатов пост попадает только после успешной записи
+                await self.dedup_index.add_many_async([processed_post['vk_post_id']])
+                touch_daily_stats(session, db_post.created_at)
+                invalidate_response_cache("posts")
+                publish_event("posts.created", count=1, regions=[db_post.region])
                 
                 logger.info(f"Saved post {processed_post['vk_post_id']} to database")
                 return db_post.id
@@ -0,0 +1,195 @@
+"""
+Token-bucket rate limiter for VK API tokens shared across processes.
+
+Bucket state lives in Redis, so every Celery worker and web process spends
+the same per-token budget. Without Redis the limiter falls back to an
+in-process bucket.
+"""
+import logging
+import asyncio
+import hashlib
+import os
+import time
+import weakref
+from typing import Dict, Any, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    # Graceful degradation if redis is not available
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# VK API allows 3 requests per second per token
+VK_RATE_LIMIT_RPS = float(os.getenv("VK_RATE_LIMIT_RPS", "3"))
+VK_RATE_LIMIT_BURST = float(os.getenv("VK_RATE_LIMIT_BURST", "3"))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", os.getenv("REDIS_URL", ""))
+RATE_LIMIT_KEY_PREFIX = "postopus:ratelimit:"
+
+# Атомарно пополняет ведро и резервирует токены. Баланс может уйти в минус:
+# по остатку вызывающий вычисляет время ожидания своего слота и спит без опроса Redis.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - requested
+local wait = 0
+if tokens < 0 then
+    wait = -tokens / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(wait + capacity / rate) + 60)
+return tostring(tokens)
+"""
+
+
+class TokenBucketLimiter:
+    """Token bucket keyed by VK access token with wait-time metrics."""
+
+    def __init__(self, rate: float = VK_RATE_LIMIT_RPS, capacity: float = VK_RATE_LIMIT_BURST,
+                 redis_url: Optional[str] = RATE_LIMIT_REDIS_URL):
+        self.rate = rate
+        self.capacity = capacity
+        self.redis_url = redis_url if aioredis else None
+        # asyncio-клиент Redis привязан к циклу событий: свой клиент на каждый живой цикл,
+        # клиент завершившегося цикла удаляется вместе с ним
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+        self._buckets: Dict[str, tuple] = {}  # key -> (tokens, timestamp)
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+        if redis_url and not aioredis:
+            logger.warning("redis package not available, using in-memory rate limiter")
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self.redis_url else "memory"
+
+    def _get_script(self):
+        """Return the registered script for the running loop, (re)connecting if needed."""
+        if not self.redis_url:
+            return None
+
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(loop)
+        if entry is None:
+            try:
+                client = aioredis.from_url(self.redis_url)
+                entry = (client, client.register_script(TOKEN_BUCKET_SCRIPT))
+                self._clients[loop] = entry
+            except Exception as e:
+                logger.warning(f"Redis rate limiter unavailable, using in-memory buckets: {e}")
+                return None
+        return entry[1]
+
+    async def acquire(self, token: str, tokens: float = 1) -> float:
+        """
+        Reserve ``tokens`` from the token's bucket and wait for the slot.
+
+        Returns:
+            Время ожидания в секундах
+        """
+        key = self._bucket_key(token)
+        wait = None
+
+        script = self._get_script()
+        if script is not None:
+            try:
+                left = float(await script(keys=[key], args=[self.rate, self.capacity, tokens]))
+                # Локальная копия баланса нужна для remaining()
+                self._buckets[key] = (left, time.monotonic())
+                wait = -left / self.rate if left < 0 else 0.0
+            except Exception as e:
+                logger.warning(f"Redis rate limiter error, falling back to memory: {e}")
+
+        if wait is None:
+            wait = self._reserve_local(key, tokens)
+
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        self._record_wait(key, wait)
+        return wait
+
+    def _reserve_local(self, key: str, tokens: float) -> float:
+        """In-process variant of TOKEN_BUCKET_SCRIPT."""
+        now = time.monotonic()
+        available, ts = self._buckets.get(key, (self.capacity, now))
+        available = min(self.capacity, available + max(0.0, now - ts) * self.rate) - tokens
+        self._buckets[key] = (available, now)
+        return -available / self.rate if available < 0 else 0.0
+
+    def remaining(self, token: str) -> float:
+        """
+        Estimate the token's remaining budget from this process' view of the bucket.
+
+        Negative values mean requests are already queued for the token.
+        """
+        key = self._bucket_key(token)
+        now = time.monotonic()
+        available, ts = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, available + max(0.0, now - ts) * self.rate)
+
+    def _record_wait(self, key: str, wait: float):
+        stats = self.metrics.setdefault(key, {
+            "requests": 0,
+            "throttled": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0
+        })
+        stats["requests"] += 1
+        stats["total_wait"] += wait
+        if wait > 0:
+            stats["throttled"] += 1
+            stats["max_wait"] = max(stats["max_wait"], wait)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return wait-time metrics per bucket for this process."""
+        buckets = {}
+        for key, stats in self.metrics.items():
+            buckets[key[len(RATE_LIMIT_KEY_PREFIX):]] = {
+                **stats,
+                "avg_wait": round(stats["total_wait"] / stats["requests"], 4) if stats["requests"] else 0.0,
+                "total_wait": round(stats["total_wait"], 4),
+                "max_wait": round(stats["max_wait"], 4)
+            }
+        return {
+            "backend": self.backend,
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "buckets": buckets
+        }
+
+    def _bucket_key(self, token: str) -> str:
+        """Tokens are never stored in Redis keys, only their digest."""
+        return RATE_LIMIT_KEY_PREFIX + hashlib.sha1(token.encode()).hexdigest()[:16]
+
+    async def close(self):
+        """Close the Redis client of the running loop."""
+        entry = self._clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            try:
+                await entry[0].close()
+            except Exception as e:
+                logger.error(f"Error closing rate limiter Redis connection: {e}")
+
+
+# Глобальный экземпляр лимитера
+_limiter_instance: Optional[TokenBucketLimiter] = None
+
+
+def get_rate_limiter() -> TokenBucketLimiter:
+    """Возвращает экземпляр общего лимитера."""
+    global _limiter_instance
+    if _limiter_instance is None:
+        _limiter_instance = TokenBucketLimiter()
+    return _limiter_instance
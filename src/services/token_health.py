@@ -0,0 +1,255 @@
+"""
+Registry of VK token health.
+
+The registry stores the last probe (``users.get``) result and latency of
+every token for ``TOKEN_HEALTH_TTL`` seconds. Health endpoints read it
+without calling VK. Expired entries are re-probed concurrently in the
+background. Real API errors with authorization codes mark a token unhealthy
+right away (passive checks). With Redis the entries live in one hash shared
+by web processes and workers. Tokens appear in the hash only as digests.
+The Redis client is synchronous, so async code reads and writes entries in
+the default thread pool (``get_many_async``, ``summary_async``).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+
+import httpx
+
+try:
+    import redis
+except ImportError:
+    # Graceful degradation if redis is not available
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+TOKEN_HEALTH_TTL = float(os.getenv("TOKEN_HEALTH_TTL", "300"))
+TOKEN_HEALTH_CONCURRENCY = int(os.getenv("TOKEN_HEALTH_CONCURRENCY", "5"))
+TOKEN_HEALTH_REDIS_URL = os.getenv("TOKEN_HEALTH_REDIS_URL", os.getenv("REDIS_URL", ""))
+TOKEN_HEALTH_KEY = "postopus:token_health"
+VK_API_BASE_URL = os.getenv("VK_API_BASE_URL", "https://api.vk.com/method")
+VK_API_VERSION = "5.131"
+
+# Коды ошибок VK, после которых токен считается нерабочим:
+# 5 - авторизация не удалась, 17 - требуется валидация, 27 - ключ сообщества недействителен,
+# 28 - ключ приложения недействителен
+TOKEN_UNHEALTHY_ERROR_CODES = {5, 17, 27, 28}
+
+Probe = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+def token_digest(token: str) -> str:
+    """Токены не хранятся в Redis, только их хеш."""
+    return hashlib.sha1(token.encode()).hexdigest()[:16]
+
+
+async def probe_token(token: str, client: httpx.AsyncClient = None,
+                      base_url: str = VK_API_BASE_URL, api_version: str = VK_API_VERSION) -> Dict[str, Any]:
+    """
+    Проверяет токен вызовом users.get.
+
+    Returns:
+        {"healthy", "latency_ms", "error_code", "error"}
+    """
+    started = time.monotonic()
+    try:
+        if client is None:
+            async with httpx.AsyncClient(timeout=10) as own_client:
+                response = await own_client.get(f"{base_url}/users.get",
+                                                params={"access_token": token, "v": api_version})
+        else:
+            response = await client.get(f"{base_url}/users.get",
+                                        params={"access_token": token, "v": api_version})
+        data = response.json()
+        error = data.get("error") or {}
+        return {
+            "healthy": not error,
+            "latency_ms": round((time.monotonic() - started) * 1000, 1),
+            "error_code": error.get("error_code"),
+            "error": error.get("error_msg"),
+        }
+    except Exception as e:
+        logger.error(f"Error testing token: {e}")
+        return {
+            "healthy": False,
+            "latency_ms": round((time.monotonic() - started) * 1000, 1),
+            "error_code": None,
+            "error": str(e),
+        }
+
+
+class TokenHealthRegistry:
+    """Last known health of tokens with TTL, in memory or in a Redis hash."""
+
+    def __init__(self, ttl: float = TOKEN_HEALTH_TTL, redis_url: str = TOKEN_HEALTH_REDIS_URL):
+        self.ttl = ttl
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._redis = redis.Redis.from_url(redis_url, socket_timeout=2) if redis_url and redis else None
+        self._pending: Dict[str, asyncio.Task] = {}  # токен -> идущая проверка
+        self._tasks: Set[asyncio.Task] = set()  # фоновые перепроверки (ссылки держим до завершения)
+
+    def get_many(self, tokens: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Последние записи по токенам (None - токен еще не проверялся)."""
+        tokens = list(tokens)
+        digests = [token_digest(token) for token in tokens]
+        if self._redis is not None and digests:
+            try:
+                values = self._redis.hmget(TOKEN_HEALTH_KEY, digests)
+                return {token: json.loads(value) if value else None for token, value in zip(tokens, values)}
+            except Exception as e:
+                logger.warning(f"Redis token health unavailable, using local entries: {e}")
+        with self._lock:
+            return {token: self._entries.get(digest) for token, digest in zip(tokens, digests)}
+
+    def record(self, token: str, healthy: bool, latency_ms: Optional[float] = None,
+               error_code: Optional[int] = None, error: Optional[str] = None, source: str = "probe"):
+        entry = {
+            "healthy": healthy,
+            "latency_ms": latency_ms,
+            "error_code": error_code,
+            "error": error,
+            "source": source,
+            "checked_at": time.time(),
+        }
+        digest = token_digest(token)
+        with self._lock:
+            self._entries[digest] = entry
+        if self._redis is not None:
+            try:
+                self._redis.hset(TOKEN_HEALTH_KEY, digest, json.dumps(entry))
+            except Exception as e:
+                logger.warning(f"Failed to store token health in Redis: {e}")
+
+    async def get_many_async(self, tokens: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        return await asyncio.to_thread(self.get_many, list(tokens))
+
+    def report_error(self, token: str, error_code: Optional[int]):
+        """Пассивная проверка: реальная ошибка авторизации помечает токен нерабочим."""
+        if error_code not in TOKEN_UNHEALTHY_ERROR_CODES:
+            return
+        kwargs = {"error_code": error_code, "error": f"VK error {error_code}", "source": "passive"}
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.record(token, False, **kwargs)
+        else:
+            # Вызывается из обработки ответа VK внутри цикла событий - не блокируем его
+            loop.run_in_executor(None, lambda: self.record(token, False, **kwargs))
+
+    def is_stale(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return entry is None or time.time() - entry["checked_at"] >= self.ttl
+
+    async def revalidate(self, tokens: Iterable[str], probe: Probe = None,
+                         force: bool = False) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Параллельно перепроверяет устаревшие (или все при force) токены.
+
+        Токены, которые уже проверяются в этом цикле событий, не проверяются
+        повторно - дожидаемся идущей проверки.
+
+        Returns:
+            Актуальные записи по всем переданным токенам
+        """
+        tokens = list(dict.fromkeys(tokens))
+        entries = await self.get_many_async(tokens)
+        loop = asyncio.get_running_loop()
+        waiting = [
+            self._pending[token] for token in tokens
+            if token in self._pending and self._pending[token].get_loop() is loop
+        ]
+        stale = [
+            token for token in tokens
+            if (force or self.is_stale(entries[token])) and token not in self._pending
+        ]
+        if not stale and not waiting:
+            return entries
+
+        semaphore = asyncio.Semaphore(TOKEN_HEALTH_CONCURRENCY)
+        client = None if probe else httpx.AsyncClient(timeout=10)
+        probe = probe or (lambda token: probe_token(token, client))
+
+        async def check(token: str):
+            async with semaphore:
+                result = await probe(token)
+            await asyncio.to_thread(self.record, token, **result)
+
+        def forget(token: str, task: asyncio.Task):
+            if self._pending.get(token) is task:
+                del self._pending[token]
+
+        checks = []
+        for token in stale:
+            task = asyncio.create_task(check(token))
+            task.add_done_callback(lambda done, token=token: forget(token, done))
+            self._pending[token] = task
+            checks.append(task)
+
+        try:
+            results = await asyncio.gather(*checks, *waiting, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Token health check failed: {result}")
+        finally:
+            if client is not None:
+                await client.aclose()
+        return await self.get_many_async(tokens)
+
+    def schedule_revalidation(self, tokens: Iterable[str], probe: Probe = None):
+        """Запускает перепроверку устаревших токенов в фоне, не дожидаясь ее."""
+        # Даже чтение записей из Redis выполняется уже в фоновой задаче
+        task = asyncio.create_task(self.revalidate(list(tokens), probe))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def summary(self, tokens: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Сводка здоровья по последним записям, без обращений к VK.
+
+        Args:
+            tokens: Имя токена (регион) -> access token
+        """
+        entries = self.get_many(tokens.values())
+        details = []
+        for name, token in tokens.items():
+            entry = entries[token]
+            if entry is None:
+                details.append({"name": name, "status": "unknown", "stale": True})
+                continue
+            details.append({
+                "name": name,
+                "status": "working" if entry["healthy"] else "error",
+                "latency_ms": entry["latency_ms"],
+                "error_code": entry["error_code"],
+                "error": entry["error"],
+                "source": entry["source"],
+                "checked_at": datetime.utcfromtimestamp(entry["checked_at"]).isoformat(),
+                "stale": self.is_stale(entry),
+            })
+        return {
+            "total_tokens": len(tokens),
+            "working_tokens": sum(1 for d in details if d["status"] == "working"),
+            "unknown_tokens": sum(1 for d in details if d["status"] == "unknown"),
+            "details": details,
+        }
+
+    async def summary_async(self, tokens: Dict[str, str]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.summary, tokens)
+
+
+_registry: Optional[TokenHealthRegistry] = None
+
+
+def get_token_health() -> TokenHealthRegistry:
+    """Возвращает общий реестр здоровья токенов процесса."""
+    global _registry
+    if _registry is None:
+        _registry = TokenHealthRegistry()
+    return _registry
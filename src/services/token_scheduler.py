@@ -0,0 +1,141 @@
+"""
+Scheduler spreading VK read requests over a pool of access tokens.
+
+Every request goes to the healthy token with the most remaining rate
+budget. Tokens that hit VK rate-limit errors are demoted for a while.
+"""
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from .rate_limiter import TokenBucketLimiter, get_rate_limiter
+from .token_health import get_token_health
+
+logger = logging.getLogger(__name__)
+
+# Коды ошибок VK, после которых токен временно выводится из пула (секунды):
+# 6 - слишком много запросов в секунду, 9 - flood control, 29 - достигнут лимит метода
+TOKEN_DEMOTE_SECONDS = {
+    6: float(os.getenv("VK_TOKEN_DEMOTE_TOO_MANY_RPS", "2")),
+    9: float(os.getenv("VK_TOKEN_DEMOTE_FLOOD", "600")),
+    29: float(os.getenv("VK_TOKEN_DEMOTE_RATE_LIMIT", "3600"))
+}
+
+
+@dataclass
+class TokenState:
+    """Состояние токена в пуле."""
+    name: str
+    token: str
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    demoted_until: float = 0.0
+    last_error_code: Optional[int] = None
+    last_used: Optional[datetime] = None
+
+    @property
+    def is_demoted(self) -> bool:
+        return self.demoted_until > time.time()
+
+
+class VKTokenScheduler:
+    """Pool of VK read tokens with budget-aware selection."""
+
+    def __init__(self, limiter: TokenBucketLimiter = None):
+        self.limiter = limiter or get_rate_limiter()
+        self.states: Dict[str, TokenState] = {}  # token -> state
+
+    def set_tokens(self, tokens: Dict[str, str]):
+        """
+        Replace the pool, keeping counters of tokens that stay in it.
+
+        Args:
+            tokens: Имя токена (регион) -> access token
+        """
+        states = {}
+        for name, token in tokens.items():
+            if not token:
+                continue
+            states[token] = self.states.get(token) or TokenState(name=name, token=token)
+        self.states = states
+
+    def has_tokens(self) -> bool:
+        return bool(self.states)
+
+    def pick(self) -> Optional[str]:
+        """
+        Return the token with the most remaining budget.
+
+        Demoted tokens are used only if the whole pool is demoted; then the
+        one that recovers first is returned.
+        """
+        if not self.states:
+            return None
+
+        healthy = [s for s in self.states.values() if not s.is_demoted]
+        if not healthy:
+            return min(self.states.values(), key=lambda s: s.demoted_until).token
+
+        best = max(healthy, key=lambda s: (self.limiter.remaining(s.token) - s.in_flight, -s.requests))
+        return best.token
+
+    def acquire(self) -> Optional[str]:
+        """Pick a token and count the request as in flight until release()."""
+        token = self.pick()
+        if token:
+            state = self.states[token]
+            state.in_flight += 1
+            state.requests += 1
+            state.last_used = datetime.utcnow()
+        return token
+
+    def release(self, token: str):
+        state = self.states.get(token)
+        if state and state.in_flight > 0:
+            state.in_flight -= 1
+
+    def report_error(self, token: str, error_code: Optional[int]):
+        """Register a VK API error for the token, demoting it on rate-limit codes."""
+        get_token_health().report_error(token, error_code)
+        state = self.states.get(token)
+        if not state:
+            return
+
+        state.errors += 1
+        state.last_error_code = error_code
+        demote_for = TOKEN_DEMOTE_SECONDS.get(error_code)
+        if demote_for:
+            state.demoted_until = max(state.demoted_until, time.time() + demote_for)
+            logger.warning(f"Token {state.name} demoted for {demote_for:.0f}s after VK error {error_code}")
+
+    def report_response(self, token: str, data: Dict[str, Any]):
+        """Inspect a raw VK response (including execute_errors) for token errors."""
+        if not isinstance(data, dict):
+            return
+        if "error" in data:
+            self.report_error(token, data["error"].get("error_code"))
+        for error in data.get("execute_errors") or []:
+            self.report_error(token, error.get("error_code"))
+
+    def get_utilisation(self) -> List[Dict[str, Any]]:
+        """Per-token utilisation of the pool for this process."""
+        total_requests = sum(s.requests for s in self.states.values()) or 1
+        return [
+            {
+                "name": state.name,
+                "requests": state.requests,
+                "share": round(state.requests / total_requests, 3),
+                "errors": state.errors,
+                "in_flight": state.in_flight,
+                "remaining_budget": round(self.limiter.remaining(state.token), 2),
+                "status": "demoted" if state.is_demoted else "healthy",
+                "demoted_until": datetime.utcfromtimestamp(state.demoted_until).isoformat() if state.is_demoted else None,
+                "last_error_code": state.last_error_code,
+                "last_used": state.last_used.isoformat() if state.last_used else None
+            }
+            for state in self.states.values()
+        ]
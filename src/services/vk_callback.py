@@ -0,0 +1,91 @@
+"""
+VK Callback API intake.
+
+For groups we administer VK pushes ``wall_post_new`` events to
+``/api/vk/callback``; the endpoint validates them and queues a Celery task,
+which runs the post through ``EnhancedPostProcessor`` filters and stores it
+with the same idempotent upsert as polling. New posts arrive within seconds
+and cost no wall.get calls. VK redelivers events that were not answered with
+"ok", and a redelivered post is dropped by the dedup index or updated in place.
+
+The confirmation code and secret key are taken from
+``Group.settings["callback"]`` (``{"confirmation": ..., "secret": ...}``) or
+from ``VK_CALLBACK_CONFIRMATION`` / ``VK_CALLBACK_SECRET``.
+"""
+import hmac
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from .post_processor import EnhancedPostProcessor
+from .post_ingest import upsert_posts
+from ..web.database import get_database
+
+logger = logging.getLogger(__name__)
+
+VK_CALLBACK_CONFIRMATION = os.getenv("VK_CALLBACK_CONFIRMATION", "")
+VK_CALLBACK_SECRET = os.getenv("VK_CALLBACK_SECRET", "")
+
+# Предложенные и отложенные записи не являются опубликованными постами
+SKIPPED_POST_TYPES = {"suggest", "postpone"}
+
+
+def callback_settings(group_settings: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+    """Код подтверждения и секретный ключ группы (или значения по умолчанию из окружения)."""
+    callback = (group_settings or {}).get("callback") or {}
+    return (
+        callback.get("confirmation") or VK_CALLBACK_CONFIRMATION,
+        callback.get("secret") or VK_CALLBACK_SECRET,
+    )
+
+
+def verify_secret(expected: str, received: Optional[str]) -> bool:
+    """Сравнение секрета за постоянное время; без настроенного секрета события не принимаются."""
+    if not expected or not isinstance(received, str):
+        return False
+    return hmac.compare_digest(expected.encode(), received.encode())
+
+
+def should_ingest(post: Dict[str, Any]) -> bool:
+    return bool(post.get("id")) and post.get("post_type") not in SKIPPED_POST_TYPES
+
+
+async def ingest_wall_post(post: Dict[str, Any], source: Dict[str, Any],
+                           processor: EnhancedPostProcessor = None) -> Dict[str, int]:
+    """
+    Фильтрует пост из события wall_post_new и сохраняет его.
+
+    Args:
+        post: Объект события (запись стены в формате wall.get)
+        source: Группа-источник: group_id, name, region, theme
+        processor: Обработчик постов (по умолчанию создается новый)
+
+    Returns:
+        {"inserted": ..., "updated": ...}
+    """
+    processor = processor or EnhancedPostProcessor()
+    processed = await processor.process_posts_by_region([post], source["region"], source["theme"])
+    if not processed:
+        logger.info(f"Callback post {post.get('owner_id')}_{post.get('id')} filtered out")
+        return {"inserted": 0, "updated": 0}
+
+    rows = [
+        {
+            "id": item["id"],
+            "text": item["text"],
+            "region": source["region"],
+            "theme": source["theme"],
+            "source_group": source["name"],
+            "source_group_id": source["group_id"],
+            "date": post.get("date"),
+            "views": item.get("views", {}),
+            "likes": post.get("likes", {}),
+        }
+        for item in processed
+    ]
+    with get_database().get_session() as session:
+        saved = upsert_posts(session, rows)
+    # Ключи добавляются после коммита: при ошибке записи повтор задачи и повторная
+    # доставка события VK не будут отброшены индексом дубликатов
+    await processor.dedup_index.add_many_async(item["vk_post_id"] for item in processed)
+    return saved
@@ -0,0 +1,148 @@
+"""
+VK ``execute`` batching for Postopus.
+
+Pending ``wall.get`` calls are collected per token and packed into
+generated VKScript code, so up to 25 groups are read with one HTTP request.
+"""
+import logging
+import asyncio
+import json
+import os
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Hashable
+
+logger = logging.getLogger(__name__)
+
+# VK executes at most 25 API calls inside one execute request
+VK_EXECUTE_MAX_CALLS = 25
+VK_EXECUTE_BATCHING = os.getenv("VK_EXECUTE_BATCHING", "true").lower() == "true"
+# Сколько ждать попутные вызовы перед отправкой неполного пакета (секунды)
+VK_EXECUTE_WINDOW = float(os.getenv("VK_EXECUTE_WINDOW", "0.05"))
+
+
+class VKExecuteError(Exception):
+    """Error of a single call inside an execute batch or of the whole batch."""
+
+
+def build_wall_get_script(calls: List[Dict[str, Any]]) -> str:
+    """
+    Build VKScript code running ``wall.get`` for every call.
+
+    Args:
+        calls: Параметры wall.get (owner_id, count, offset) для каждого вызова
+
+    Returns:
+        Код для метода execute, возвращающий массив ответов в том же порядке
+    """
+    lines = ["var r = [];"]
+    for params in calls:
+        lines.append(f"r.push(API.wall.get({json.dumps(params)}));")
+    lines.append("return r;")
+    return "\n".join(lines)
+
+
+def split_execute_response(data: Dict[str, Any], calls_count: int) -> List[Any]:
+    """
+    Split an execute response back into per-call results.
+
+    Failed calls come back from VK as ``false``; they are replaced with
+    :class:`VKExecuteError` instances.
+    """
+    if "error" in data:
+        raise VKExecuteError(f"VK API error: {data['error']}")
+
+    response = data.get("response")
+    if not isinstance(response, list) or len(response) != calls_count:
+        raise VKExecuteError(f"Unexpected execute response: {str(response)[:200]}")
+
+    errors = data.get("execute_errors") or []
+    if errors:
+        logger.warning(f"VK execute returned {len(errors)} errors: {errors}")
+
+    results = []
+    for item in response:
+        if item is False or item is None:
+            results.append(VKExecuteError("wall.get failed inside execute"))
+        else:
+            results.append(item)
+    return results
+
+
+class VKExecuteBatcher:
+    """
+    Collects ``wall.get`` calls and sends them in ``execute`` batches.
+
+    ``send`` receives the batch key (token or session) and the generated
+    code and must return the raw VK JSON (``response``/``execute_errors``).
+    Rate limiting and transport are the caller's responsibility.
+    """
+
+    def __init__(self, send: Callable[[Hashable, str], Awaitable[Dict[str, Any]]],
+                 window: float = VK_EXECUTE_WINDOW, max_calls: int = VK_EXECUTE_MAX_CALLS):
+        self.send = send
+        self.window = window
+        self.max_calls = min(max_calls, VK_EXECUTE_MAX_CALLS)
+        self._pending: Dict[Hashable, List[tuple]] = {}  # key -> [(params, future)]
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self.requests_sent = 0
+        self.calls_sent = 0
+
+    async def wall_get(self, key: Hashable, owner_id: Any, count: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """Queue a wall.get call and wait for its items."""
+        params = {
+            "owner_id": self._normalize_owner_id(owner_id),
+            "count": min(count, 100),  # VK API limit
+            "offset": offset
+        }
+        result = await self.submit(key, params)
+        return result.get("items", [])
+
+    async def submit(self, key: Hashable, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue raw wall.get params and wait for the raw response."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((params, future))
+
+        if len(pending) >= self.max_calls:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: Hashable):
+        """Detach the pending calls for ``key`` and send them as one batch."""
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+
+        batch = self._pending.pop(key, [])
+        if batch:
+            asyncio.ensure_future(self._send_batch(key, batch))
+
+    async def _send_batch(self, key: Hashable, batch: List[tuple]):
+        """Send one execute request and resolve the callers' futures."""
+        calls = [params for params, _ in batch]
+        try:
+            data = await self.send(key, build_wall_get_script(calls))
+            self.requests_sent += 1
+            self.calls_sent += len(calls)
+            results = split_execute_response(data, len(calls))
+        except Exception as e:
+            logger.error(f"Error sending execute batch of {len(calls)} calls: {e}")
+            results = [e] * len(calls)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _normalize_owner_id(self, owner_id: Any) -> Any:
+        """VK expects numeric owner ids; keep anything else unchanged."""
+        try:
+            return int(owner_id)
+        except (TypeError, ValueError):
+            return owner_id
@@ -0,0 +1,72 @@
+"""
+Concurrent publishing of one post to many VK groups.
+
+All groups are posted to at once; the caller's ``publish_one`` bounds the
+requests in flight per token and charges the token's budget, so a batch takes
+about ``len(groups) / rps`` seconds instead of a sleep per group.
+Every ``wall.post`` carries a ``guid`` derived from the post and the group:
+VK does not create a second wall post with the same guid, so a retried
+Celery task returns the existing post instead of posting it twice.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Сколько wall.post одновременно выполняется на одном токене
+VK_PUBLISH_CONCURRENCY = int(os.getenv("VK_PUBLISH_CONCURRENCY", "3"))
+
+
+class VKPublishError(Exception):
+    """VK rejected a wall.post call."""
+
+
+def publish_guid(post_data: Dict[str, Any], group_id: str) -> str:
+    """
+    Ключ идемпотентности публикации поста в группу.
+
+    Для постов из БД строится из id поста, иначе из хеша текста,
+    поэтому повтор задачи отправляет тот же guid.
+    """
+    post_id = post_data.get('id')
+    if post_id is None:
+        post_id = hashlib.sha1(post_data.get('text', '').encode('utf-8')).hexdigest()[:16]
+    return f"postopus-{post_id}-{group_id}"
+
+
+async def publish_to_all(target_groups: List[str],
+                         publish_one: Callable[[str], Awaitable[Any]]) -> Dict[str, Any]:
+    """
+    Публикует во все группы параллельно.
+
+    Args:
+        target_groups: ID групп VK
+        publish_one: Корутина публикации в одну группу, возвращает post_id
+            или выбрасывает исключение
+
+    Returns:
+        {"success": [...], "failed": [...], "total": ...} в порядке target_groups
+    """
+    results = {'success': [], 'failed': [], 'total': len(target_groups)}
+    outcomes = await asyncio.gather(
+        *[publish_one(group_id) for group_id in target_groups],
+        return_exceptions=True
+    )
+
+    for group_id, outcome in zip(target_groups, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Failed to post to group {group_id}: {outcome}")
+            results['failed'].append({'group_id': group_id, 'error': str(outcome)})
+        else:
+            logger.info(f"Successfully posted to group {group_id}")
+            results['success'].append({
+                'group_id': group_id,
+                'post_id': outcome,
+                'url': f"https://vk.com/wall{group_id}_{outcome}"
+            })
+
+    logger.info(f"Published to {len(results['success'])}/{len(target_groups)} groups")
+    return results
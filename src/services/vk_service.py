@@ -24,6 +24,9 @@ except ImportError:
 from ..models.config import AppConfig
 from ..web.models import Group, Post
 from ..web.database import get_database
+from .vk_execute import VKExecuteBatcher, VK_EXECUTE_BATCHING
+from .token_scheduler import VKTokenScheduler
+from .vk_publish import VK_PUBLISH_CONCURRENCY, publish_guid, publish_to_all
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +38,11 @@ class EnhancedVKService:
         self.config = config or AppConfig.from_env()
         self.vk_sessions: Dict[str, VkApi] = {}  # Multiple VK sessions
         self.current_session: Optional[VkApi] = None
+        self.read_tokens: Dict[str, str] = {}  # access token -> session name
+        self.token_scheduler = VKTokenScheduler()  # pool of read tokens
         self.db = get_database()
+        # wall.get calls are packed into execute requests (up to 25 per request)
+        self.batcher: Optional[VKExecuteBatcher] = VKExecuteBatcher(self._execute) if VK_EXECUTE_BATCHING else None
         
         # Regional mapping for 15 regions
         self.regions = {
@@ -76,6 +83,7 @@ class EnhancedVKService:
                 session = VkApi(token=token)
                 session.get_api().users.get()  # Test connection
                 self.vk_sessions[f'read_{i}'] = session
+                self.read_tokens[token] = f'read_{i}'
                 success_count += 1
                 logger.info(f"Initialized read session {i}")
             except Exception as e:
@@ -92,6 +100,8 @@ class EnhancedVKService:
             except Exception as e:
                 logger.error(f"Failed to initialize post token {i}: {e}")
         
+        self.token_scheduler.set_tokens({name: token for token, name in self.read_tokens.items()})
+        
         if success_count > 0:
             self.current_session = list(self.vk_sessions.values())[0]
             logger.info(f"VK service initialized with {success_count} sessions")
@@ -116,21 +126,32 @@ class EnhancedVKService:
                 logger.error("No read session available")
                 return []
             
-            for group in groups:
-                try:
-                    group_posts = await self._fetch_posts_from_group(read_session, group.group_id, count)
-                    # Add region info to posts
+            if self.batcher:
+                # Все группы региона уходят одним или несколькими execute-запросами
+                results = await asyncio.gather(
+                    *[self._fetch_posts_from_pool(group.group_id, count) for group in groups]
+                )
+                for group, group_posts in zip(groups, results):
                     for post in group_posts:
                         post['region'] = region
                         post['source_group'] = group.name
                     all_posts.extend(group_posts)
-                    
-                    # Small delay between requests
-                    await asyncio.sleep(0.5)
-                    
-                except Exception as e:
-                    logger.error(f"Error fetching posts from group {group.name}: {e}")
-                    continue
+            else:
+                for group in groups:
+                    try:
+                        group_posts = await self._fetch_posts_from_group(read_session, group.group_id, count)
+                        # Add region info to posts
+                        for post in group_posts:
+                            post['region'] = region
+                            post['source_group'] = group.name
+                        all_posts.extend(group_posts)
+                        
+                        # Small delay between requests
+                        await asyncio.sleep(0.5)
+                        
+                    except Exception as e:
+                        logger.error(f"Error fetching posts from group {group.name}: {e}")
+                        continue
             
             logger.info(f"Fetched {len(all_posts)} posts from {len(groups)} groups in region {region}")
             return all_posts
@@ -140,59 +161,45 @@ class EnhancedVKService:
             return []
     
     async def publish_to_groups(self, post_data: Dict[str, Any], target_groups: List[str]) -> Dict[str, Any]:
-        """Publish a post to multiple VK groups."""
-        results = {'success': [], 'failed': [], 'total': len(target_groups)}
+        """
+        Publish a post to multiple VK groups concurrently.
         
+        Calls run in the thread pool, at most ``VK_PUBLISH_CONCURRENCY`` at a
+        time, each charging the post token's budget. An idempotency ``guid``
+        keeps retries from double-posting.
+        """
         post_session = self._get_post_session()
         if not post_session:
             logger.error("No post session available")
-            return results
+            return {'success': [], 'failed': [], 'total': len(target_groups)}
         
-        for group_id in target_groups:
-            try:
-                # Format the post
-                formatted_text = self._format_post_text(post_data)
-                attachments = self._format_attachments(post_data.get('attachments', []))
-                
-                # Post to VK
-                response = post_session.get_api().wall.post(
+        formatted_text = self._format_post_text(post_data)
+        attachments = self._format_attachments(post_data.get('attachments', []))
+        token = self._session_token(post_session)
+        semaphore = asyncio.Semaphore(VK_PUBLISH_CONCURRENCY)
+        loop = asyncio.get_running_loop()
+        
+        async def publish_one(group_id: str):
+            async with semaphore:
+                await self.token_scheduler.limiter.acquire(token)
+                response = await loop.run_in_executor(None, lambda: post_session.get_api().wall.post(
                     owner_id=int(group_id),
                     message=formatted_text,
                     attachments=attachments,
-                    from_group=1
-                )
-                
-                results['success'].append({
-                    'group_id': group_id,
-                    'post_id': response.get('post_id'),
-                    'url': f"https://vk.com/wall{group_id}_{response.get('post_id')}"
-                })
-                
-                logger.info(f"Successfully posted to group {group_id}")
-                
-                # Delay between posts to avoid rate limiting
-                await asyncio.sleep(random.uniform(2, 5))
-                
-            except Exception as e:
-                logger.error(f"Failed to post to group {group_id}: {e}")
-                results['failed'].append({
-                    'group_id': group_id,
-                    'error': str(e)
-                })
-                
-                # Shorter delay on error
-                await asyncio.sleep(1)
+                    from_group=1,
+                    guid=publish_guid(post_data, group_id)
+                ))
+            return response.get('post_id')
         
-        logger.info(f"Published to {len(results['success'])}/{len(target_groups)} groups")
-        return results
+        return await publish_to_all(target_groups, publish_one)
     
     def _get_read_session(self) -> Optional[VkApi]:
-        """Get a random read session."""
-        read_sessions = [s for k, s in self.vk_sessions.items() if k.startswith('read_')]
-        if not read_sessions:
+        """Get the read session whose token has the most remaining budget."""
+        token = self.token_scheduler.pick()
+        if not token:
             # Fallback to any available session
             return list(self.vk_sessions.values())[0] if self.vk_sessions else None
-        return random.choice(read_sessions)
+        return self.vk_sessions[self.read_tokens[token]]
     
     def _get_post_session(self) -> Optional[VkApi]:
         """Get a random post session."""
@@ -223,6 +230,9 @@ class EnhancedVKService:
     async def _fetch_posts_from_group(self, vk_session: VkApi, group_id: str, count: int = 20) -> List[Dict[str, Any]]:
         """Fetch posts from a specific VK group."""
         try:
+            if self.batcher:
+                return await self.batcher.wall_get(vk_session, group_id, count)
+            
             response = vk_session.get_api().wall.get(
                 owner_id=int(group_id),
                 count=min(count, 100),  # VK API limit
@@ -231,11 +241,36 @@ class EnhancedVKService:
             return response.get('items', [])
         except VkApiError as e:
             logger.error(f"VK API error fetching from group {group_id}: {e}")
+            self.token_scheduler.report_error(self._session_token(vk_session), getattr(e, 'code', None))
             return []
         except Exception as e:
             logger.error(f"Error fetching from group {group_id}: {e}")
             return []
     
+    async def _fetch_posts_from_pool(self, group_id: str, count: int = 20) -> List[Dict[str, Any]]:
+        """Fetch posts with the pool token that has the most remaining budget."""
+        token = self.token_scheduler.acquire()
+        if not token:
+            return await self._fetch_posts_from_group(self._get_read_session(), group_id, count)
+        try:
+            return await self._fetch_posts_from_group(self.vk_sessions[self.read_tokens[token]], group_id, count)
+        finally:
+            self.token_scheduler.release(token)
+    
+    async def _execute(self, vk_session: VkApi, code: str) -> Dict[str, Any]:
+        """Run VKScript code via the execute method without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        await self.token_scheduler.limiter.acquire(self._session_token(vk_session))
+        data = await loop.run_in_executor(
+            None, lambda: vk_session.method('execute', {'code': code}, raw=True)
+        )
+        self.token_scheduler.report_response(self._session_token(vk_session), data)
+        return data
+    
+    def _session_token(self, vk_session: VkApi) -> str:
+        """Access token of a vk_api session."""
+        return (getattr(vk_session, 'token', None) or {}).get('access_token', '')
+    
     def _format_post_text(self, post_data: Dict[str, Any]) -> str:
         """Format post text with regional tags and signatures."""
         text = post_data.get('text', '')
@@ -0,0 +1,109 @@
+"""
+Incremental wall sync helpers.
+
+Each group keeps a high-water mark in ``Group.stats['sync']``: the highest
+post id and date already fetched plus an estimate of the group's posting
+rate. Fetching pages only until the mark is reached and sizing ``count``
+by the posting rate avoids downloading posts that are thrown away later.
+"""
+import logging
+import math
+import os
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+VK_SYNC_MIN_COUNT = int(os.getenv("VK_SYNC_MIN_COUNT", "5"))
+VK_SYNC_MAX_POSTS = int(os.getenv("VK_SYNC_MAX_POSTS", "100"))
+# Запас к ожидаемому количеству новых постов
+VK_SYNC_HEADROOM = float(os.getenv("VK_SYNC_HEADROOM", "1.5"))
+# Вес последнего замера в скользящей оценке частоты постинга
+VK_SYNC_RATE_ALPHA = 0.3
+
+
+def get_sync_state(stats: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return a copy of the group's sync state (empty for never-synced groups)."""
+    return dict((stats or {}).get("sync") or {})
+
+
+def plan_page_size(state: Dict[str, Any], default_count: int, now: float = None) -> int:
+    """
+    Choose ``count`` for the first wall.get page.
+
+    Groups without history get ``default_count``. Otherwise the expected
+    number of new posts since the last sync is used, with some headroom.
+    """
+    if not state.get("last_post_id") or state.get("posts_per_hour") is None:
+        return min(default_count, 100)
+
+    now = now or time.time()
+    hours = max(0.0, now - state.get("last_sync_at", now)) / 3600
+    expected = state["posts_per_hour"] * hours * VK_SYNC_HEADROOM
+    return max(VK_SYNC_MIN_COUNT, min(100, int(math.ceil(expected)) + 2))
+
+
+def select_new_posts(items: List[Dict[str, Any]], state: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Keep posts above the high-water mark.
+
+    Returns:
+        (новые посты, достигнута ли отметка) - если отметка достигнута,
+        дальше листать стену не нужно
+    """
+    last_id = state.get("last_post_id") or 0
+    new_posts = []
+    reached = False
+    for item in items:
+        if item.get("id", 0) > last_id:
+            new_posts.append(item)
+        elif not item.get("is_pinned"):
+            # Закрепленный пост может быть старым и стоять первым - не считаем его отметкой
+            reached = True
+    return new_posts, reached and bool(last_id)
+
+
+def update_sync_state(state: Dict[str, Any], new_posts: List[Dict[str, Any]], now: float = None) -> Dict[str, Any]:
+    """Move the high-water mark and refresh the posting-rate estimate."""
+    now = now or time.time()
+    updated = dict(state)
+
+    if new_posts:
+        newest = max(new_posts, key=lambda p: p.get("id", 0))
+        updated["last_post_id"] = max(state.get("last_post_id") or 0, newest.get("id", 0))
+        updated["last_post_date"] = max(state.get("last_post_date") or 0, newest.get("date", 0))
+
+    if state.get("last_sync_at"):
+        hours = max(now - state["last_sync_at"], 60) / 3600
+        observed = len(new_posts) / hours
+        previous = state.get("posts_per_hour")
+        updated["posts_per_hour"] = round(
+            observed if previous is None else VK_SYNC_RATE_ALPHA * observed + (1 - VK_SYNC_RATE_ALPHA) * previous, 4
+        )
+    elif new_posts:
+        # Первая синхронизация: оцениваем частоту по датам полученных постов
+        dates = [p.get("date", 0) for p in new_posts if p.get("date")]
+        span_hours = max((max(dates) - min(dates)) / 3600, 1.0) if dates else 24.0
+        updated["posts_per_hour"] = round(len(new_posts) / span_hours, 4)
+
+    updated["last_sync_at"] = now
+    return updated
+
+
+def apply_sync_states(session, sync_states: Dict[int, Dict[str, Any]]) -> int:
+    """
+    Write groups' new sync states into ``Group.stats['sync']``.
+
+    Коммит делает вызывающий - вместе с сохранением постов, иначе отметка
+    может уйти дальше постов, которые так и не записались.
+    """
+    if not sync_states:
+        return 0
+    # Импорт здесь: остальные функции модуля не зависят от моделей
+    from ..web.models import Group
+
+    groups = session.query(Group).filter(Group.id.in_(list(sync_states.keys()))).all()
+    for group in groups:
+        # JSON колонку переприсваиваем целиком, иначе SQLAlchemy не увидит изменений
+        group.stats = {**(group.stats or {}), 'sync': sync_states[group.id]}
+    return len(groups)
@@ -1,8 +1,19 @@
 """
 Настройка Celery для фоновых задач (упрощенная версия).
 """
+import logging
 import os
 from celery import Celery
+from celery.signals import task_success, task_failure
+
+logger = logging.getLogger(__name__)
+
+try:
+    # Воркер запускается из src (пакет tasks верхнего уровня), поэтому сервисы - через src
+    from src.services.event_bus import publish_event
+except ImportError as e:
+    logger.error(f"Event bus unavailable, task.completed events are disabled: {e}")
+    publish_event = None
 
 # Получаем URL Redis из переменных окружения
 redis_url = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
@@ -14,7 +25,8 @@ celery_app = Celery(
     "postopus",
     broker=broker_url,
     backend=result_backend,
-    include=["tasks.simple_tasks"]  # Убираем префикс src для совместимости с Render
+    # Убираем префикс src для совместимости с Render (воркер запускается из src)
+    include=["tasks.simple_tasks", "tasks.stats_tasks", "tasks.vk_tasks"]
 )
 
 # Настройки Celery (упрощенные)
@@ -31,10 +43,42 @@ celery_app.conf.update(
     worker_max_tasks_per_child=1000,
     # Исправляем предупреждение о broker_connection_retry
     broker_connection_retry_on_startup=True,
-    # Отключаем периодические задачи для упрощения
-    # beat_schedule={},
+    # Периодически пересчитываем сводку postopus_daily_stats за последние дни
+    beat_schedule={
+        "refresh-daily-stats": {
+            "task": "tasks.stats_tasks.refresh_daily_stats",
+            "schedule": float(os.environ.get('DAILY_STATS_REFRESH_INTERVAL', '600')),
+        },
+        # Просмотры и лайки недавних постов одним проходом wall.getById
+        "refresh-post-engagement": {
+            "task": "tasks.vk_tasks.update_post_statistics",
+            "schedule": float(os.environ.get('ENGAGEMENT_REFRESH_INTERVAL', '1800')),
+        },
+        # Фоновая перепроверка здоровья токенов, эндпоинты читают только реестр
+        "revalidate-token-health": {
+            "task": "tasks.vk_tasks.test_vk_connections",
+            "schedule": float(os.environ.get('TOKEN_HEALTH_REFRESH_INTERVAL', '240')),
+        },
+    },
 )
 
+# Параллелизм воркера; бюджет VK токенов общий через Redis (services/rate_limiter.py)
+if os.environ.get('CELERY_WORKER_CONCURRENCY'):
+    celery_app.conf.worker_concurrency = int(os.environ['CELERY_WORKER_CONCURRENCY'])
+
+# Завершение задач транслируется на дашборд (SSE /api/public/events)
+@task_success.connect
+def _publish_task_success(sender=None, **kwargs):
+    if publish_event:
+        publish_event("task.completed", task=sender.name, status="success")
+
+
+@task_failure.connect
+def _publish_task_failure(sender=None, exception=None, **kwargs):
+    if publish_event:
+        publish_event("task.completed", task=sender.name, status="failure", error=str(exception))
+
+
 # Настройки для production
 if os.environ.get('ENVIRONMENT') == 'production':
     celery_app.conf.update(
@@ -0,0 +1,123 @@
+"""
+Per-process asyncio runtime for Celery workers.
+
+Each worker process starts one event loop in a background thread on the
+first task and keeps it, together with a single ``ModernVKService``, for the
+life of the process. Tasks submit coroutines with ``run_async()`` and get the
+warm service from ``get_vk_service()``: the HTTP/2 client, the token pool,
+the rate limiter's Redis connection and the execute batcher survive between
+tasks, so tokens are loaded and checked with users.get once per process
+instead of once per task. The token list is re-read from the database every
+``VK_TOKEN_RELOAD_INTERVAL`` seconds without live checks.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Optional
+
+from celery.signals import worker_process_shutdown, worker_shutdown
+
+# Воркер запускается из src (пакет tasks верхнего уровня), поэтому сервисы - через src
+from src.services.modern_vk_service import ModernVKService
+
+logger = logging.getLogger(__name__)
+
+# Как часто перечитывать список токенов из БД (секунды)
+VK_TOKEN_RELOAD_INTERVAL = float(os.getenv("VK_TOKEN_RELOAD_INTERVAL", "300"))
+
+
+class WorkerRuntime:
+    """Event loop thread and warm VK service of one worker process."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="postopus-worker-loop", daemon=True)
+        self._thread.start()
+        self._service: Optional[ModernVKService] = None
+        self._service_lock: Optional[asyncio.Lock] = None
+        self._initialized = False
+        self._tokens_loaded_at = 0.0
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro: Awaitable[Any]) -> Any:
+        """Выполняет корутину в цикле воркера и ждет результат в потоке задачи."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            # Например SoftTimeLimitExceeded: не оставляем корутину висеть в цикле
+            future.cancel()
+            raise
+
+    async def vk_service(self) -> ModernVKService:
+        """VK сервис процесса; инициализируется при первом обращении."""
+        if self._service_lock is None:
+            self._service_lock = asyncio.Lock()
+        async with self._service_lock:
+            if self._service is None:
+                self._service = ModernVKService()
+            if not self._initialized:
+                # Неудачная инициализация (нет рабочих токенов) повторяется следующей задачей
+                if not await self._service.initialize():
+                    raise Exception("Failed to initialize VK service")
+                self._initialized = True
+                self._tokens_loaded_at = time.monotonic()
+            elif time.monotonic() - self._tokens_loaded_at > VK_TOKEN_RELOAD_INTERVAL:
+                await self._service._load_tokens_from_db()
+                self._tokens_loaded_at = time.monotonic()
+        return self._service
+
+    async def _close(self):
+        if self._service is not None:
+            await self._service.close()
+            await self._service.rate_limiter.close()
+
+    def shutdown(self):
+        """Закрывает HTTP клиент и соединения, останавливает цикл."""
+        if not self.loop.is_running():
+            return
+        try:
+            self.run(self._close())
+        except Exception as e:
+            logger.error(f"Error closing worker runtime: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+_runtime: Optional[WorkerRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> WorkerRuntime:
+    """Возвращает runtime текущего процесса (после fork создается заново)."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None or _runtime.pid != os.getpid():
+            _runtime = WorkerRuntime()
+    return _runtime
+
+
+def run_async(coro: Awaitable[Any]) -> Any:
+    """Выполняет корутину в долгоживущем цикле событий воркера."""
+    return get_runtime().run(coro)
+
+
+async def get_vk_service() -> ModernVKService:
+    """Прогретый VK сервис процесса (вызывать внутри run_async)."""
+    return await get_runtime().vk_service()
+
+
+def _shutdown_runtime(**kwargs):
+    if _runtime is not None and _runtime.pid == os.getpid():
+        _runtime.shutdown()
+
+
+# prefork: завершение дочернего процесса; solo/threads: завершение воркера
+worker_process_shutdown.connect(_shutdown_runtime)
+worker_shutdown.connect(_shutdown_runtime)
@@ -0,0 +1,45 @@
+"""
+Celery tasks maintaining analytics rollups in PostgreSQL
+"""
+import logging
+
+from .celery_app import celery_app
+# Воркер запускается из src (пакет tasks верхнего уровня), поэтому остальные пакеты - через src
+from src.web.database import get_database
+from src.services.daily_stats import refresh_recent, DAILY_STATS_REFRESH_DAYS
+from src.web.response_cache import invalidate_response_cache
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True, name="tasks.stats_tasks.refresh_daily_stats")
+def refresh_daily_stats_task(self, days: int = DAILY_STATS_REFRESH_DAYS):
+    """
+    Задача для пересчета сводки postopus_daily_stats за последние дни.
+
+    Args:
+        days: Сколько последних дней пересчитать (при пустой сводке - полный пересчет)
+    """
+    try:
+        logger.info(f"Starting refresh_daily_stats_task for {days} days")
+
+        db = get_database()
+        with db.get_session() as session:
+            result = refresh_recent(session, days)
+        invalidate_response_cache("stats")
+
+        logger.info(f"Daily stats refreshed ({result['mode']}), {result['rows']} rollup rows")
+
+        return {
+            "status": "success",
+            "message": f"Daily stats refreshed ({result['mode']})",
+            **result
+        }
+
+    except Exception as e:
+        logger.error(f"Error in refresh_daily_stats_task: {e}")
+        self.update_state(
+            state="FAILURE",
+            meta={"error": str(e)}
+        )
+        raise
@@ -4,12 +4,15 @@ Modern Celery tasks for VK API integration in Postopus
 import logging
 from datetime import datetime
 from typing import List, Dict, Any
-import asyncio
 
 from .celery_app import celery_app
-from ..services.modern_vk_service import ModernVKService
-from ..web.database import get_database
-from ..web.models import Post, Group, VKToken
+from .runtime import run_async, get_vk_service
+# Воркер запускается из src (пакет tasks верхнего уровня), поэтому остальные пакеты - через src
+from src.services.event_bus import publish_event
+from src.services.engagement import refresh_engagement, ENGAGEMENT_REFRESH_DAYS
+from src.services.vk_callback import ingest_wall_post
+from src.web.database import get_database
+from src.web.models import Post, Group, VKToken
 
 logger = logging.getLogger(__name__)
 
@@ -26,43 +29,35 @@ def fetch_posts_from_region_task(self, region: str, count: int = 20):
     try:
         logger.info(f"Starting fetch_posts_from_region_task for region: {region}")
         
-        # Создаем VK сервис
-        vk_service = ModernVKService()
+        # VK сервис воркера: цикл событий, HTTP клиент и пул токенов уже прогреты
+        vk_service = run_async(get_vk_service())
         
-        # Инициализируем сервис
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Получаем посты и новые отметки синхронизации прочитанных групп
+        posts, sync_states = run_async(vk_service.fetch_region_posts(region, count))
         
-        try:
-            initialized = loop.run_until_complete(vk_service.initialize())
-            if not initialized:
-                raise Exception("Failed to initialize VK service")
-            
-            # Получаем посты
-            posts = loop.run_until_complete(vk_service.get_posts_by_region(region, count))
-            
-            if not posts:
-                logger.warning(f"No posts found for region: {region}")
-                return {"status": "success", "message": "No posts found", "posts_count": 0}
-            
-            # Сохраняем посты в базу данных
-            saved_count = 0
-            for post_data in posts:
-                post_id = loop.run_until_complete(vk_service.save_post_to_db(post_data))
-                if post_id:
-                    saved_count += 1
-            
-            logger.info(f"Successfully fetched and saved {saved_count} posts for region {region}")
-            
-            return {
-                "status": "success",
-                "message": f"Fetched and saved {saved_count} posts",
-                "posts_count": saved_count,
-                "region": region
-            }
-            
-        finally:
-            loop.close()
+        # Сохраняем всю пачку одним запросом (новые посты вставляются, известные обновляются);
+        # отметки групп записываются в той же транзакции, даже если новых постов нет
+        saved = run_async(vk_service.save_posts_to_db(posts, sync_states))
+        saved_count = saved["inserted"] + saved["updated"]
+        
+        if not posts:
+            logger.warning(f"No posts found for region: {region}")
+            return {"status": "success", "message": "No posts found", "posts_count": 0}
+
+        logger.info(
+            f"Successfully fetched and saved {saved_count} posts for region {region} "
+            f"({saved['inserted']} new, {saved['updated']} updated)"
+        )
+
+        return {
+            "status": "success",
+            "message": f"Fetched and saved {saved_count} posts",
+            "posts_count": saved_count,
+            "inserted": saved["inserted"],
+            "updated": saved["updated"],
+            "region": region,
+            "token_utilisation": vk_service.get_token_utilisation()
+        }
         
     except Exception as e:
         logger.error(f"Error in fetch_posts_from_region_task: {e}")
@@ -93,6 +88,7 @@ def publish_post_to_vk_task(self, post_id: int, target_groups: List[str] = None,
             if not post:
                 raise Exception(f"Post {post_id} not found")
             
+            # id поста входит в guid публикации - повтор задачи не создаст дубль в группе
             post_data = {
                 'id': post.id,
                 'text': post.content,
@@ -101,55 +97,48 @@ def publish_post_to_vk_task(self, post_id: int, target_groups: List[str] = None,
                 'region': post.region
             }
         
-        # Создаем VK сервис
-        vk_service = ModernVKService()
-        
-        # Инициализируем сервис
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # VK сервис воркера: цикл событий, HTTP клиент и пул токенов уже прогреты
+        vk_service = run_async(get_vk_service())
         
-        try:
-            initialized = loop.run_until_complete(vk_service.initialize())
-            if not initialized:
-                raise Exception("Failed to initialize VK service")
+        # Если группы не указаны, получаем группы региона
+        if not target_groups:
+            if not region:
+                region = post.region
             
-            # Если группы не указаны, получаем группы региона
-            if not target_groups:
-                if not region:
-                    region = post.region
-                
-                groups = loop.run_until_complete(vk_service._get_groups_by_region(region))
-                target_groups = [group.group_id for group in groups]
-            
-            if not target_groups:
-                raise Exception("No target groups specified")
-            
-            # Публикуем пост
-            results = loop.run_until_complete(
-                vk_service.publish_to_groups(post_data, target_groups, region)
+            groups = run_async(vk_service._get_groups_by_region(region))
+            target_groups = [group.group_id for group in groups]
+        
+        if not target_groups:
+            raise Exception("No target groups specified")
+        
+        # Публикуем пост
+        results = run_async(
+            vk_service.publish_to_groups(post_data, target_groups, region)
+        )
+        
+        # Обновляем статус поста
+        if results['success']:
+            # Копии на стенах групп нужны для обновления просмотров и лайков
+            published = [
+                {'owner_id': item['group_id'], 'post_id': item['post_id']}
+                for item in results['success']
+            ]
+            run_async(
+                vk_service.update_post_status(post_id, 'published', published=published)
             )
-            
-            # Обновляем статус поста
-            if results['success']:
-                loop.run_until_complete(
-                    vk_service.update_post_status(post_id, 'published')
-                )
-                logger.info(f"Successfully published post {post_id} to {len(results['success'])} groups")
-            else:
-                loop.run_until_complete(
-                    vk_service.update_post_status(post_id, 'error')
-                )
-                logger.error(f"Failed to publish post {post_id} to any groups")
-            
-            return {
-                "status": "success",
-                "message": f"Published to {len(results['success'])}/{len(target_groups)} groups",
-                "results": results,
-                "post_id": post_id
-            }
-            
-        finally:
-            loop.close()
+            logger.info(f"Successfully published post {post_id} to {len(results['success'])} groups")
+        else:
+            run_async(
+                vk_service.update_post_status(post_id, 'error')
+            )
+            logger.error(f"Failed to publish post {post_id} to any groups")
+        
+        return {
+            "status": "success",
+            "message": f"Published to {len(results['success'])}/{len(target_groups)} groups",
+            "results": results,
+            "post_id": post_id
+        }
         
     except Exception as e:
         logger.error(f"Error in publish_post_to_vk_task: {e}")
@@ -168,31 +157,24 @@ def test_vk_connections_task(self):
     try:
         logger.info("Starting test_vk_connections_task")
         
-        # Создаем VK сервис
-        vk_service = ModernVKService()
+        # VK сервис воркера: цикл событий, HTTP клиент и пул токенов уже прогреты
+        vk_service = run_async(get_vk_service())
         
-        # Инициализируем сервис
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Перепроверяем токены с истекшим TTL параллельно, свежие берутся из реестра
+        results = run_async(vk_service.test_connection(revalidate=True))
         
-        try:
-            initialized = loop.run_until_complete(vk_service.initialize())
-            if not initialized:
-                raise Exception("Failed to initialize VK service")
-            
-            # Тестируем подключения
-            results = loop.run_until_complete(vk_service.test_connection())
-            
-            logger.info(f"VK connections test completed: {results['working_tokens']}/{results['total_tokens']} working")
-            
-            return {
-                "status": "success",
-                "message": f"Tested {results['total_tokens']} tokens, {results['working_tokens']} working",
-                "results": results
-            }
-            
-        finally:
-            loop.close()
+        logger.info(f"VK connections test completed: {results['working_tokens']}/{results['total_tokens']} working")
+        publish_event(
+            "tokens.health",
+            working_tokens=results['working_tokens'],
+            total_tokens=results['total_tokens']
+        )
+        
+        return {
+            "status": "success",
+            "message": f"Tested {results['total_tokens']} tokens, {results['working_tokens']} working",
+            "results": results
+        }
         
     except Exception as e:
         logger.error(f"Error in test_vk_connections_task: {e}")
@@ -251,70 +233,39 @@ def process_scheduled_posts_task(self):
 
 
 @celery_app.task(bind=True, name="tasks.vk_tasks.update_post_statistics")
-def update_post_statistics_task(self, post_id: int):
+def update_post_statistics_task(self, post_id: int = None, days: int = ENGAGEMENT_REFRESH_DAYS):
     """
-    Задача для обновления статистики поста из VK.
+    Задача для обновления статистики постов из VK.
+    
+    Все посты со ссылкой на стену VK за последние ``days`` дней читаются
+    через wall.getById пачками по 100 и записываются одним UPDATE.
     
     Args:
-        post_id: ID поста в базе данных
+        post_id: Обновить только этот пост (по умолчанию - все отслеживаемые)
+        days: Окно отслеживания в днях
     """
     try:
-        logger.info(f"Starting update_post_statistics_task for post: {post_id}")
+        logger.info(f"Starting update_post_statistics_task ({f'post {post_id}' if post_id else f'last {days} days'})")
+        
+        # VK сервис воркера: цикл событий, HTTP клиент и пул токенов уже прогреты
+        vk_service = run_async(get_vk_service())
         
-        # Получаем пост из базы данных
         db = get_database()
         with db.get_session() as session:
-            post = session.query(Post).filter(Post.id == post_id).first()
-            if not post:
-                raise Exception(f"Post {post_id} not found")
-            
-            if not post.vk_post_id or not post.vk_group_id:
-                raise Exception(f"Post {post_id} has no VK post ID or group ID")
-        
-        # Создаем VK сервис
-        vk_service = ModernVKService()
+            result = run_async(refresh_engagement(
+                session, vk_service.get_posts_by_id, days,
+                post_ids=[post_id] if post_id else None
+            ))
         
-        # Инициализируем сервис
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        logger.info(f"Updated statistics for {result['updated']} posts")
         
-        try:
-            initialized = loop.run_until_complete(vk_service.initialize())
-            if not initialized:
-                raise Exception("Failed to initialize VK service")
-            
-            # Получаем статистику поста из VK
-            # Здесь должна быть логика получения статистики из VK API
-            # Пока используем заглушку
-            stats = {
-                "views": 0,
-                "likes": 0,
-                "reposts": 0,
-                "comments": 0
-            }
-            
-            # Обновляем статистику в базе данных
-            with db.get_session() as session:
-                post = session.query(Post).filter(Post.id == post_id).first()
-                if post:
-                    post.views = stats["views"]
-                    post.likes = stats["likes"]
-                    post.reposts = stats["reposts"]
-                    post.comments = stats["comments"]
-                    post.stats_updated_at = datetime.utcnow()
-                    session.commit()
-            
-            logger.info(f"Successfully updated statistics for post {post_id}")
-            
-            return {
-                "status": "success",
-                "message": f"Updated statistics for post {post_id}",
-                "stats": stats,
-                "post_id": post_id
-            }
-            
-        finally:
-            loop.close()
+        return {
+            "status": "success",
+            "message": f"Updated statistics for {result['updated']}/{result['tracked']} posts "
+                       f"with {result['api_calls']} API calls",
+            **result,
+            "post_id": post_id
+        }
         
     except Exception as e:
         logger.error(f"Error in update_post_statistics_task: {e}")
@@ -325,6 +276,36 @@ def update_post_statistics_task(self, post_id: int):
         raise
 
 
+@celery_app.task(bind=True, name="tasks.vk_tasks.ingest_callback_post")
+def ingest_callback_post_task(self, post: Dict[str, Any], source: Dict[str, Any]):
+    """
+    Задача для сохранения поста из события VK Callback API wall_post_new.
+    
+    Args:
+        post: Объект события (запись стены)
+        source: Группа-источник: group_id, name, region, theme
+    """
+    try:
+        logger.info(f"Starting ingest_callback_post_task for post {post.get('owner_id')}_{post.get('id')}")
+        
+        saved = run_async(ingest_wall_post(post, source))
+        
+        return {
+            "status": "success",
+            "message": f"Callback post ingested ({saved['inserted']} new, {saved['updated']} updated)",
+            **saved,
+            "region": source["region"]
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in ingest_callback_post_task: {e}")
+        self.update_state(
+            state="FAILURE",
+            meta={"error": str(e), "post_id": post.get("id")}
+        )
+        raise
+
+
 @celery_app.task(bind=True, name="tasks.vk_tasks.sync_all_regions")
 def sync_all_regions_task(self):
     """
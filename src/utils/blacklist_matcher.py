@@ -0,0 +1,156 @@
+"""
+Многошаблонный поиск по черным спискам (автомат Ахо-Корасик).
+
+Автомат строится один раз на версию черного списка и разделяется
+между post_processor, text_utils и legacy_parser.
+"""
+import logging
+import re
+from collections import deque, OrderedDict
+from typing import List, Dict, Iterable, Tuple, Optional, Hashable
+
+logger = logging.getLogger(__name__)
+
+# Сколько автоматов для произвольных списков слов держать в кеше
+MATCHER_CACHE_SIZE = 64
+
+
+class BlacklistMatcher:
+    """Aho-Corasick automaton over lower-cased words."""
+
+    def __init__(self, words: Iterable[str]):
+        self.words: List[str] = sorted({w.lower() for w in words if w and w.strip()})
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]  # state -> lengths of words ending here
+        self._build()
+
+    def _build(self):
+        for word in self.words:
+            state = 0
+            for char in word:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append(len(word))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def __bool__(self) -> bool:
+        return bool(self.words)
+
+    def _scan(self, text: str):
+        """Yield (start, end) of every match in lower-cased ``text``."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length in out[state]:
+                yield index + 1 - length, index + 1
+
+    def search(self, text: str) -> bool:
+        """True если текст содержит хотя бы одно слово из списка."""
+        if not text or not self.words:
+            return False
+        for _ in self._scan(text.lower()):
+            return True
+        return False
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """Все вхождения (start, end, слово), в том числе перекрывающиеся."""
+        if not text or not self.words:
+            return []
+        lowered = text.lower()
+        return [(start, end, lowered[start:end]) for start, end in self._scan(lowered)]
+
+    def replace(self, text: str, replacement: str = '') -> str:
+        """Заменяет самые левые и самые длинные непересекающиеся вхождения."""
+        if not text or not self.words:
+            return text
+
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Редкие символы меняют длину при lower() - позиции не совпадут
+            pattern = '|'.join(re.escape(w) for w in sorted(self.words, key=len, reverse=True))
+            return re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+
+        best: Dict[int, int] = {}  # start -> longest end
+        for start, end in self._scan(lowered):
+            if end > best.get(start, -1):
+                best[start] = end
+
+        parts = []
+        position = 0
+        for start in sorted(best):
+            if start < position:
+                continue
+            parts.append(text[position:start])
+            parts.append(replacement)
+            position = best[start]
+        parts.append(text[position:])
+        return ''.join(parts)
+
+
+# Кеш автоматов: имя списка -> (версия, хеш содержимого списка, автомат)
+_named_matchers: Dict[str, Tuple[int, int, BlacklistMatcher]] = {}
+_adhoc_matchers: "OrderedDict[Hashable, BlacklistMatcher]" = OrderedDict()
+_blacklist_version = 0
+
+
+def get_blacklist_matcher(name: str, words: Optional[List[str]]) -> BlacklistMatcher:
+    """
+    Возвращает автомат для именованного черного списка.
+
+    Автомат пересобирается после invalidate_blacklist_matchers() или если
+    изменилось содержимое списка. Имя должно быть своим у каждого источника
+    слов, иначе разные списки будут вытеснять автоматы друг друга.
+    """
+    words = words or []
+    # id() списка переиспользуется после сборки мусора, поэтому сравниваем содержимое
+    fingerprint = hash(tuple(words))
+    cached = _named_matchers.get(name)
+    if cached and cached[0] == _blacklist_version and cached[1] == fingerprint:
+        return cached[2]
+
+    matcher = BlacklistMatcher(words)
+    _named_matchers[name] = (_blacklist_version, fingerprint, matcher)
+    logger.debug(f"Built blacklist matcher '{name}' with {len(matcher.words)} words")
+    return matcher
+
+
+def get_words_matcher(words: Iterable[str]) -> BlacklistMatcher:
+    """Возвращает автомат для произвольного набора слов (LRU-кеш)."""
+    key = tuple(words)
+    matcher = _adhoc_matchers.get(key)
+    if matcher is None:
+        matcher = BlacklistMatcher(key)
+        _adhoc_matchers[key] = matcher
+        if len(_adhoc_matchers) > MATCHER_CACHE_SIZE:
+            _adhoc_matchers.popitem(last=False)
+    else:
+        _adhoc_matchers.move_to_end(key)
+    return matcher
+
+
+def invalidate_blacklist_matchers() -> None:
+    """Сбрасывает автоматы после изменения черных списков."""
+    global _blacklist_version
+    _blacklist_version += 1
+    _named_matchers.clear()
+    logger.info(f"Blacklist matchers invalidated (version {_blacklist_version})")
@@ -0,0 +1,247 @@
+"""
+Перцептивные хеши изображений (pHash + dHash) с дисковым кешем.
+
+Картинки скачиваются параллельно, декодируются в уменьшенном виде
+(Image.draft) и хешируются в пуле потоков. Хеш URL запоминается в SQLite,
+поэтому повторные проверки одного и того же фото не ходят в сеть.
+Похожие изображения находятся по расстоянию Хэмминга между хешами.
+"""
+import asyncio
+import io
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Iterable, Optional, Tuple
+
+import httpx
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+IMAGE_HASH_CACHE_PATH = os.getenv("IMAGE_HASH_CACHE_PATH", str(Path("cache") / "image_hashes.sqlite3"))
+IMAGE_HASH_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_HASH_CACHE_MAX_ENTRIES", "200000"))
+IMAGE_HASH_CONCURRENCY = int(os.getenv("IMAGE_HASH_CONCURRENCY", "8"))
+IMAGE_HASH_TIMEOUT = float(os.getenv("IMAGE_HASH_TIMEOUT", "10"))
+IMAGE_HASH_MAX_BYTES = 10 * 1024 * 1024
+# Максимальное расстояние Хэмминга (из 64 бит), при котором фото считаются одинаковыми
+IMAGE_HASH_MAX_DISTANCE = int(os.getenv("IMAGE_HASH_MAX_DISTANCE", "10"))
+
+_DCT_SIZE = 32
+_HASH_SIZE = 8
+_DCT_MATRIX = [
+    [math.cos(math.pi * u * (2 * x + 1) / (2 * _DCT_SIZE)) for x in range(_DCT_SIZE)]
+    for u in range(_HASH_SIZE)
+]
+
+
+def _bits_to_int(bits: Iterable[bool]) -> int:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _phash(image: Image.Image) -> int:
+    """pHash: знаки низкочастотных коэффициентов DCT 32x32 относительно медианы."""
+    pixels = list(image.resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS).getdata())
+    rows = [pixels[y * _DCT_SIZE:(y + 1) * _DCT_SIZE] for y in range(_DCT_SIZE)]
+
+    # Разделимое DCT: сначала по строкам, потом по столбцам, только первые 8 частот
+    by_rows = [[sum(c * p for c, p in zip(basis, row)) for basis in _DCT_MATRIX] for row in rows]
+    coefficients = [
+        sum(_DCT_MATRIX[v][y] * by_rows[y][u] for y in range(_DCT_SIZE))
+        for v in range(_HASH_SIZE)
+        for u in range(_HASH_SIZE)
+    ]
+
+    # Постоянная составляющая не участвует в медиане
+    ordered = sorted(coefficients[1:])
+    median = (ordered[len(ordered) // 2 - 1] + ordered[len(ordered) // 2]) / 2
+    return _bits_to_int(c > median for c in coefficients)
+
+
+def _dhash(image: Image.Image) -> int:
+    """dHash: знаки горизонтальных градиентов картинки 9x8."""
+    pixels = list(image.resize((_HASH_SIZE + 1, _HASH_SIZE), Image.LANCZOS).getdata())
+    width = _HASH_SIZE + 1
+    return _bits_to_int(
+        pixels[y * width + x] < pixels[y * width + x + 1]
+        for y in range(_HASH_SIZE)
+        for x in range(_HASH_SIZE)
+    )
+
+
+def compute_image_hash(data: bytes) -> str:
+    """
+    Считает перцептивный хеш изображения.
+
+    Returns:
+        Строка ``phash:dhash`` (по 16 hex-символов)
+    """
+    image = Image.open(io.BytesIO(data))
+    # Для JPEG декодирование сразу в уменьшенном масштабе и в оттенках серого
+    image.draft('L', (_DCT_SIZE * 2, _DCT_SIZE * 2))
+    image = image.convert('L')
+    return f"{_phash(image):016x}:{_dhash(image):016x}"
+
+
+def parse_image_hash(value: str) -> Optional[Tuple[int, int]]:
+    """Разбирает хеш ``phash:dhash``; старые MD5-хеши гистограмм не подходят."""
+    try:
+        phash, dhash = value.split(':')
+        return int(phash, 16), int(dhash, 16)
+    except (AttributeError, ValueError):
+        return None
+
+
+def hamming_distance(left: str, right: str) -> Optional[int]:
+    """Расстояние Хэмминга по pHash и dHash (максимальное из двух)."""
+    a, b = parse_image_hash(left), parse_image_hash(right)
+    if a is None or b is None:
+        return None
+    return max(bin(a[0] ^ b[0]).count('1'), bin(a[1] ^ b[1]).count('1'))
+
+
+def find_similar_hash(image_hash: str, known_hashes: Iterable[str],
+                      max_distance: int = IMAGE_HASH_MAX_DISTANCE) -> Optional[Tuple[str, int]]:
+    """Возвращает ближайший известный хеш в пределах max_distance и расстояние до него."""
+    best = None
+    for known in known_hashes:
+        distance = hamming_distance(image_hash, known)
+        if distance is not None and distance <= max_distance and (best is None or distance < best[1]):
+            best = (known, distance)
+    return best
+
+
+class ImageHashCache:
+    """URL -> hash cache stored in a local SQLite file."""
+
+    def __init__(self, path: str = IMAGE_HASH_CACHE_PATH, max_entries: int = IMAGE_HASH_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS image_hashes "
+                "(url TEXT PRIMARY KEY, hash TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        except Exception as e:
+            logger.warning(f"Image hash cache unavailable at {path}: {e}")
+            self._conn = None
+
+    def get_many(self, urls: List[str]) -> Dict[str, str]:
+        if not self._conn or not urls:
+            return {}
+        result = {}
+        try:
+            with self._lock:
+                # Ограничение SQLite на число параметров запроса
+                for start in range(0, len(urls), 500):
+                    chunk = urls[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    rows = self._conn.execute(
+                        f"SELECT url, hash FROM image_hashes WHERE url IN ({placeholders})", chunk
+                    ).fetchall()
+                    result.update(rows)
+        except Exception as e:
+            logger.warning(f"Error reading image hash cache: {e}")
+        return result
+
+    def set_many(self, hashes: Dict[str, str]):
+        if not self._conn or not hashes:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO image_hashes (url, hash, created_at) VALUES (?, ?, ?)",
+                    [(url, value, now) for url, value in hashes.items()]
+                )
+                self._conn.execute(
+                    "DELETE FROM image_hashes WHERE url IN (SELECT url FROM image_hashes "
+                    "ORDER BY created_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+                )
+                self._conn.commit()
+        except Exception as e:
+            logger.warning(f"Error writing image hash cache: {e}")
+
+
+class ImageHashService:
+    """Concurrent image downloader and hasher backed by ImageHashCache."""
+
+    def __init__(self, cache: ImageHashCache = None, concurrency: int = IMAGE_HASH_CONCURRENCY):
+        self.cache = cache or ImageHashCache()
+        self.concurrency = concurrency
+
+    async def hash_urls(self, urls: Iterable[str]) -> Dict[str, str]:
+        """
+        Хеширует изображения по URL.
+
+        Returns:
+            URL -> хеш; URL, которые не удалось скачать или декодировать, отсутствуют
+        """
+        urls = list(dict.fromkeys(url for url in urls if url))
+        hashes = self.cache.get_many(urls)
+        missing = [url for url in urls if url not in hashes]
+        if not missing:
+            return hashes
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(timeout=IMAGE_HASH_TIMEOUT, limits=limits, follow_redirects=True) as client:
+            results = await asyncio.gather(*(self._hash_url(client, semaphore, url) for url in missing))
+
+        computed = {url: value for url, value in zip(missing, results) if value}
+        self.cache.set_many(computed)
+        hashes.update(computed)
+        logger.debug(f"Hashed {len(computed)}/{len(missing)} images, {len(urls) - len(missing)} from cache")
+        return hashes
+
+    async def _hash_url(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str) -> Optional[str]:
+        try:
+            async with semaphore:
+                response = await client.get(url)
+                response.raise_for_status()
+            if len(response.content) > IMAGE_HASH_MAX_BYTES:
+                logger.warning(f"Image {url} is too large to hash")
+                return None
+            # Декодирование и DCT - CPU, не блокируем event loop
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, compute_image_hash, response.content)
+        except Exception as e:
+            logger.error(f"Error getting image hash from {url}: {e}")
+            return None
+
+    def hash_url(self, url: str) -> Optional[str]:
+        """Синхронный вариант для одного URL (использует тот же кеш)."""
+        cached = self.cache.get_many([url])
+        if url in cached:
+            return cached[url]
+        try:
+            response = httpx.get(url, timeout=IMAGE_HASH_TIMEOUT, follow_redirects=True)
+            response.raise_for_status()
+            value = compute_image_hash(response.content)
+        except Exception as e:
+            logger.error(f"Error getting image hash from {url}: {e}")
+            return None
+        self.cache.set_many({url: value})
+        return value
+
+
+# Глобальный экземпляр сервиса
+_image_hash_service: Optional[ImageHashService] = None
+
+
+def get_image_hash_service() -> ImageHashService:
+    """Возвращает экземпляр сервиса хеширования изображений."""
+    global _image_hash_service
+    if _image_hash_service is None:
+        _image_hash_service = ImageHashService()
+    return _image_hash_service
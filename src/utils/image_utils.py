@@ -1,52 +1,68 @@
 """
 Утилиты для работы с изображениями.
 """
-import hashlib
 import logging
-import io
-from typing import List, Optional
-from PIL import Image
+from typing import List, Dict, Iterable, Optional
 import requests
 from pathlib import Path
 
+from .image_hash import get_image_hash_service, find_similar_hash, IMAGE_HASH_MAX_DISTANCE
+
 logger = logging.getLogger(__name__)
 
 
 class ImageProcessor:
     """Класс для обработки изображений."""
     
-    def __init__(self):
+    def __init__(self, config=None):
+        self.config = config
         self.temp_dir = Path("temp_images")
         self.temp_dir.mkdir(exist_ok=True)
+        self.hash_service = get_image_hash_service()
     
     def get_image_hash(self, image_url: str) -> Optional[str]:
         """
-        Получает хеш изображения для проверки дубликатов.
+        Получает перцептивный хеш изображения для проверки дубликатов.
         
         Args:
             image_url: URL изображения
             
         Returns:
-            MD5 хеш изображения или None при ошибке
+            Хеш ``phash:dhash`` или None при ошибке
         """
-        try:
-            # Скачиваем изображение
-            response = requests.get(image_url, timeout=10)
-            response.raise_for_status()
-            
-            # Открываем изображение
-            image = Image.open(io.BytesIO(response.content))
-            
-            # Получаем гистограмму
-            histogram = image.histogram()
-            
-            # Создаем MD5 хеш
-            hash_object = hashlib.md5(str(histogram).encode())
-            return hash_object.hexdigest()
+        return self.hash_service.hash_url(image_url)
+    
+    async def get_image_hashes(self, image_urls: Iterable[str]) -> Dict[str, str]:
+        """
+        Параллельно получает хеши изображений (с дисковым кешем).
+        
+        Args:
+            image_urls: URL изображений
             
+        Returns:
+            URL -> хеш для успешно обработанных изображений
+        """
+        try:
+            return await self.hash_service.hash_urls(image_urls)
         except Exception as e:
-            logger.error(f"Error getting image hash from {image_url}: {e}")
-            return None
+            logger.error(f"Error getting image hashes: {e}")
+            return {}
+    
+    def find_similar_hash(self, image_hash: str, known_hashes: Iterable[str],
+                          max_distance: int = IMAGE_HASH_MAX_DISTANCE) -> Optional[str]:
+        """
+        Ищет среди известных хешей похожее изображение.
+        
+        Args:
+            image_hash: Хеш проверяемого изображения
+            known_hashes: Ранее сохраненные хеши
+            max_distance: Допустимое расстояние Хэмминга
+            
+        Returns:
+            Найденный похожий хеш или None
+        """
+        match = find_similar_hash(image_hash, known_hashes, max_distance)
+        return match[0] if match else None
     
     def download_image(self, url: str, filename: str) -> bool:
         """
@@ -0,0 +1,158 @@
+"""
+MinHash/LSH индекс для поиска почти одинаковых текстов.
+
+Тексты (в форме text_to_rafinad) режутся на словесные шинглы, для каждого
+считается MinHash-сигнатура, а LSH-корзины по полосам сигнатуры дают
+кандидатов за время, не зависящее от размера истории.
+"""
+import hashlib
+import logging
+import random
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16  # 16 полос по 4 строки: порог срабатывания около 0.5
+SHINGLE_SIZE = 3
+DUPLICATE_THRESHOLD = 0.5
+TEXT_INDEX_MAX_ITEMS = 1000
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Фиксированные коэффициенты, чтобы сигнатуры совпадали между процессами
+_random = random.Random(1941)
+_PERMUTATIONS = [
+    (_random.randint(1, _MERSENNE_PRIME - 1), _random.randint(0, _MERSENNE_PRIME - 1))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+
+def word_shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Множество словесных шинглов текста."""
+    words = text.split()
+    if not words:
+        return set()
+    if len(words) <= size:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(shingles: Set[str]) -> List[int]:
+    """MinHash-сигнатура множества шинглов."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little')
+        for s in shingles
+    ]
+    if not hashes:
+        return [_MAX_HASH] * MINHASH_PERMUTATIONS
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def estimate_similarity(left: List[int], right: List[int]) -> float:
+    """Оценка коэффициента Жаккара по доле совпавших позиций сигнатур."""
+    if not left or len(left) != len(right):
+        return 0.0
+    return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+class MinHashLSHIndex:
+    """Index of text signatures with LSH banding and bounded size."""
+
+    def __init__(self, bands: int = MINHASH_BANDS, threshold: float = DUPLICATE_THRESHOLD,
+                 max_items: int = TEXT_INDEX_MAX_ITEMS):
+        self.bands = bands
+        self.rows = MINHASH_PERMUTATIONS // bands
+        self.threshold = threshold
+        self.max_items = max_items
+        self.signatures: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.signatures
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _band_keys(self, signature: List[int]):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, key: str, text: str) -> None:
+        """Добавляет текст (уже в форме рафинада) под ключом key."""
+        shingles = word_shingles(text)
+        if shingles:
+            self.add_signature(key, minhash_signature(shingles))
+
+    def add_signature(self, key: str, signature: List[int]) -> None:
+        if key in self.signatures:
+            self.remove(key)
+        self.signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+        while len(self.signatures) > self.max_items:
+            self.remove(next(iter(self.signatures)))
+
+    def remove(self, key: str) -> None:
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def query(self, text: str) -> List[Tuple[str, float]]:
+        """
+        Ищет похожие тексты.
+
+        Returns:
+            Список (ключ, оценка сходства) по убыванию сходства,
+            только для кандидатов с оценкой не ниже порога
+        """
+        shingles = word_shingles(text)
+        if not shingles:
+            return []
+        signature = minhash_signature(shingles)
+
+        candidates: Set[str] = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self._buckets.get(band_key, ()))
+
+        scored = [(key, estimate_similarity(signature, self.signatures[key])) for key in candidates]
+        scored = [item for item in scored if item[1] >= self.threshold]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored
+
+    def best_match(self, text: str) -> Optional[Tuple[str, float]]:
+        matches = self.query(text)
+        return matches[0] if matches else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Сериализация для сохранения в данных сессии."""
+        return {
+            'bands': self.bands,
+            'threshold': self.threshold,
+            'signatures': [[key, signature] for key, signature in self.signatures.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], max_items: int = TEXT_INDEX_MAX_ITEMS) -> 'MinHashLSHIndex':
+        data = data or {}
+        index = cls(
+            bands=data.get('bands', MINHASH_BANDS),
+            threshold=data.get('threshold', DUPLICATE_THRESHOLD),
+            max_items=max_items
+        )
+        for key, signature in data.get('signatures', []):
+            if len(signature) == MINHASH_PERMUTATIONS:
+                index.add_signature(key, signature)
+        return index
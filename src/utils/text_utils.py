@@ -5,18 +5,34 @@ import re
 import logging
 from typing import List, Optional
 
+from .blacklist_matcher import get_blacklist_matcher, get_words_matcher
+
 logger = logging.getLogger(__name__)
 
 
 class TextProcessor:
     """Класс для обработки текста."""
     
-    def __init__(self):
-        # TODO: Загружать blacklist из базы данных
-        self.blacklist = [
+    def __init__(self, config=None):
+        self.config = config
+        self.default_blacklist = [
             "реклама", "спам", "продам", "куплю", "обменяю",
             "заработок", "деньги", "кредит", "займ"
         ]
+        self.blacklist = self.default_blacklist
+        # Черный список из конфигурации (загружается DatabaseService)
+        filters = getattr(config, 'filters', None)
+        if filters is not None and filters.delete_msg_blacklist:
+            self.blacklist = filters.delete_msg_blacklist
+    
+    def _get_clear_text_blacklist(self, blacklist_type: str) -> List[str]:
+        """Возвращает список слов для очистки текста по типу."""
+        filters = getattr(self.config, 'filters', None)
+        if filters is not None and filters.clear_text_blacklist:
+            words = filters.clear_text_blacklist.get(blacklist_type)
+            if isinstance(words, list):
+                return words
+        return self.blacklist
     
     def contains_blacklisted_words(self, text: str) -> bool:
         """
@@ -32,9 +48,8 @@ class TextProcessor:
             return False
         
         try:
-            # Создаем регулярное выражение из списка запрещенных слов
-            pattern = '|'.join(re.escape(word) for word in self.blacklist)
-            return bool(re.search(pattern, text, re.IGNORECASE | re.MULTILINE))
+            # Автомат строится один раз на версию черного списка
+            return get_blacklist_matcher('text_processor:blacklist', self.blacklist).search(text)
         except Exception as e:
             logger.error(f"Error checking blacklisted words: {e}")
             return False
@@ -54,8 +69,9 @@ class TextProcessor:
             return False
         
         try:
-            pattern = '|'.join(re.escape(word) for word in search_words)
-            return bool(re.search(pattern, text, re.IGNORECASE | re.MULTILINE))
+            if len(search_words) == 1:
+                return bool(search_words[0]) and search_words[0].lower() in text.lower()
+            return get_words_matcher(search_words).search(text)
         except Exception as e:
             logger.error(f"Error searching text: {e}")
             return False
@@ -75,14 +91,13 @@ class TextProcessor:
             return text
         
         try:
-            # TODO: Загружать blacklist из базы данных по типу
-            blacklist = self.blacklist
+            blacklist = self._get_clear_text_blacklist(blacklist_type)
             if not blacklist:
                 return text
             
             # Удаляем нежелательные слова
-            pattern = '|'.join(re.escape(word) for word in blacklist)
-            cleaned_text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.MULTILINE)
+            matcher = get_blacklist_matcher(f'clear_text_blacklist:{blacklist_type}', blacklist)
+            cleaned_text = matcher.replace(text, '')
             
             # Убираем лишние пробелы
             cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
@@ -0,0 +1,121 @@
+"""
+Простые in-process кеши с временем жизни записей.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Thread-safe key/value cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return default
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                self._evict()
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """Удаляет запись по ключу или весь кеш, если ключ не указан."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [k for k, (expires_at, _) in self._data.items() if expires_at <= now]
+        for k in expired:
+            del self._data[k]
+        if len(self._data) >= self.max_entries:
+            # Удаляем запись, которая истекает раньше всех
+            del self._data[min(self._data, key=lambda k: self._data[k][0])]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class StaleWhileRevalidateCache:
+    """
+    Cache of loader results served stale while a background refresh runs.
+
+    A value younger than ``ttl`` is returned as is. Within the following
+    ``stale_ttl`` seconds the old value is still returned immediately and one
+    background thread per key reloads it. Older or missing values are loaded
+    synchronously. A failing loader never replaces a cached value.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, max_entries: int = 128):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}  # key -> (loaded_at, value)
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                self._refresh_in_background(key, loader)
+                return entry[1]
+        return self._load(key, loader)
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """Удаляет запись по ключу или весь кеш, если ключ не указан."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value = loader()
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                del self._data[min(self._data, key=lambda k: self._data[k][0])]
+            self._data[key] = (time.monotonic(), value)
+        return value
+
+    def _refresh_in_background(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        try:
+            self._load(key, loader)
+        except Exception as e:
+            logger.warning(f"Background refresh of {key!r} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -8,8 +8,10 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .database import get_db
+from .database import get_async_db
 from .models import User
 
 # Настройки JWT
@@ -82,9 +84,9 @@ class AuthService:
         return db_user
 
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """Получает текущего пользователя из JWT токена."""
     credentials_exception = HTTPException(
@@ -105,7 +107,7 @@ def get_current_user(
     except Exception:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
+    user = await db.scalar(select(User).where(User.username == username))
     if user is None:
         raise credentials_exception
     
@@ -5,6 +5,7 @@ import os
 import logging
 from typing import Optional
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
@@ -23,8 +24,40 @@ DATABASE_URL = os.getenv('DATABASE_URL')
 if not DATABASE_URL:
     DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
+# Настройки пула соединений (общие для веб-процессов и воркеров Celery)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+
+def _async_url(url: str) -> str:
+    """URL для драйвера asyncpg (Render.com отдает postgres://)."""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+
+def _pool_options(url: str) -> dict:
+    # Пул SQLite (локальная отладка) не принимает параметры размера
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
 # Создание движка SQLAlchemy
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(DATABASE_URL, echo=False, **_pool_options(DATABASE_URL))
 
 # Создание сессии
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -35,6 +68,53 @@ Session = SessionLocal
 # Базовый класс для моделей
 Base = declarative_base()
 
+# Асинхронный движок (asyncpg) создается лениво в каждом процессе: соединения
+# пула нельзя переносить через fork, поэтому воркеры gunicorn открывают свой
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Возвращает асинхронный движок текущего процесса."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, **_pool_options(ASYNC_DATABASE_URL))
+        _async_sessionmaker = async_sessionmaker(_async_engine, expire_on_commit=False, autoflush=False)
+    return _async_engine
+
+
+def async_session() -> AsyncSession:
+    """Открывает асинхронную сессию: ``async with async_session() as session``."""
+    get_async_engine()
+    return _async_sessionmaker()
+
+
+async def get_async_db():
+    """Асинхронная сессия базы данных для FastAPI dependency injection."""
+    async with async_session() as session:
+        yield session
+
+
+async def init_async_engine() -> bool:
+    """Создает движок и проверяет соединение (вызывается из lifespan)."""
+    try:
+        async with get_async_engine().connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        logger.info("Async database engine ready")
+        return True
+    except Exception as e:
+        logger.error(f"Async database engine failed: {e}")
+        return False
+
+
+async def dispose_async_engine() -> None:
+    """Закрывает соединения пула (вызывается из lifespan при остановке)."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
+
 class WebDatabase:
     """Класс для работы с базой данных PostgreSQL в веб-интерфейсе."""
     
@@ -46,9 +126,9 @@ class WebDatabase:
     async def connect(self) -> bool:
         """Подключается к базе данных."""
         try:
-            # Тестируем соединение
-            with self.engine.connect() as connection:
-                result = connection.execute(text("SELECT 1"))
+            # Тестируем соединение, не блокируя цикл событий
+            async with get_async_engine().connect() as connection:
+                await connection.execute(text("SELECT 1"))
                 self._connected = True
                 logger.info("Connected to PostgreSQL")
                 return True
@@ -65,6 +145,7 @@ class WebDatabase:
     async def close(self) -> None:
         """Закрывает соединение с базой данных."""
         try:
+            await dispose_async_engine()
             self.engine.dispose()
             self._connected = False
             logger.info("Database connection closed")
@@ -82,7 +163,9 @@ class WebDatabase:
     def init_db(self):
         """Инициализация базы данных - создание всех таблиц."""
         try:
+            from .migrations import run_migrations
             Base.metadata.create_all(bind=self.engine)
+            run_migrations(self.engine)
             logger.info("Database tables created successfully")
             return True
         except SQLAlchemyError as e:
@@ -133,8 +216,10 @@ def test_connection():
 def init_db():
     """Инициализация базы данных"""
     try:
-        # Создание всех таблиц
+        from .migrations import run_migrations
+        # Создание всех таблиц и миграции существующих
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
         logger.info("✅ База данных инициализирована успешно!")
         return True
     except SQLAlchemyError as e:
@@ -0,0 +1,142 @@
+"""
+Server-sent events for the dashboard.
+
+One ``EventBroadcaster`` per web process holds a single Redis pub/sub
+subscription to ``postopus:events`` and copies each event into the bounded
+queue of every connected client, so N open dashboards cost one subscription.
+The subscription is opened with the first client and closed with the last.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Optional, Set
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    # Graceful degradation if redis is not available
+    aioredis = None
+
+from ..services.event_bus import EVENTS_CHANNEL, EVENTS_REDIS_URL, add_local_listener, remove_local_listener
+
+logger = logging.getLogger(__name__)
+
+# Интервал комментариев-пингов, чтобы прокси не закрывали простаивающее соединение
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+SSE_CLIENT_QUEUE_SIZE = int(os.getenv("SSE_CLIENT_QUEUE_SIZE", "100"))
+SSE_RETRY_MS = 5000
+
+
+class EventBroadcaster:
+    """Fan-out of bus events to per-client asyncio queues."""
+
+    def __init__(self, redis_url: str = EVENTS_REDIS_URL):
+        self.redis_url = redis_url if aioredis else None
+        self._clients: Set[asyncio.Queue] = set()
+        self._reader: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._next_id = 0
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SSE_CLIENT_QUEUE_SIZE)
+        self._clients.add(queue)
+        if len(self._clients) == 1:
+            self._start()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._clients.discard(queue)
+        if not self._clients:
+            self._stop()
+
+    def _start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if self.redis_url:
+            self._reader = asyncio.create_task(self._read_redis())
+        else:
+            add_local_listener(self._dispatch_threadsafe)
+
+    def _stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        remove_local_listener(self._dispatch_threadsafe)
+
+    async def close(self) -> None:
+        """Отключает всех клиентов и подписку (вызывается из lifespan)."""
+        self._clients.clear()
+        self._stop()
+
+    async def _read_redis(self) -> None:
+        backoff = 1.0
+        while True:
+            client = aioredis.Redis.from_url(self.redis_url)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(EVENTS_CHANNEL)
+                backoff = 1.0
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self._dispatch(json.loads(message["data"]))
+                    except ValueError:
+                        logger.warning("Skipping malformed event from bus")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event bus subscription lost, reconnecting in {backoff:.0f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    await pubsub.close()
+                    await client.close()
+                except Exception:
+                    pass
+
+    def _dispatch_threadsafe(self, event: Dict[str, Any]) -> None:
+        # Локальные события публикуются из потоков пула
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        self._next_id += 1
+        event = dict(event, id=self._next_id)
+        for queue in list(self._clients):
+            if queue.full():
+                # Медленный клиент теряет самые старые события, а не тормозит остальных
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def stream(self, request):
+        """Генератор тела ответа text/event-stream для одного клиента."""
+        queue = self.subscribe()
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                data = json.dumps({"data": event["data"], "ts": event.get("ts")}, default=str)
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+
+_broadcaster: Optional[EventBroadcaster] = None
+
+
+def get_event_broadcaster() -> EventBroadcaster:
+    """Возвращает broadcaster текущего процесса."""
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = EventBroadcaster()
+    return _broadcaster
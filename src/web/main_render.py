@@ -4,16 +4,21 @@
 import os
 import logging
 from datetime import datetime
+from typing import Optional
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
+from starlette.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 
 from .routers import auth, dashboard, posts, settings, scheduler, analytics, public, vk
-from .database import get_database, init_db, test_connection
+from .database import get_database, init_db, test_connection, init_async_engine, dispose_async_engine
 from .routers.auth import get_current_user
 from .data_manager import data_manager
+from .pagination import InvalidCursor
+from .response_cache import ResponseCacheMiddleware
+from .events import get_event_broadcaster
 
 # Настраиваем логирование
 logging.basicConfig(level=logging.INFO)
@@ -42,10 +47,15 @@ async def lifespan(app: FastAPI):
     else:
         logger.error("❌ Failed to connect to PostgreSQL")
     
+    # Пул асинхронных соединений этого процесса для роутеров
+    await init_async_engine()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Postopus Web Interface...")
+    await get_event_broadcaster().close()
+    await dispose_async_engine()
 
 # Создаем приложение FastAPI
 app = FastAPI(
@@ -55,6 +65,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Кеш ответов публичных endpoints с ETag/304 (сбрасывается по тегам при записи постов и групп).
+# Добавлен до CORS, чтобы заголовки CORS вычислялись для каждого запроса, а не брались из кеша
+app.add_middleware(ResponseCacheMiddleware)
+
 # Настраиваем CORS для Render.com
 app.add_middleware(
     CORSMiddleware,
@@ -88,8 +102,8 @@ else:
 async def get_public_dashboard_stats():
     """Public dashboard stats for the web interface."""
     try:
-        # Используем реальные данные из базы
-        return data_manager.get_real_dashboard_stats()
+        # Используем реальные данные из базы (кеш stale-while-revalidate, запрос в пуле потоков)
+        return await run_in_threadpool(data_manager.get_real_dashboard_stats)
     except Exception as e:
         logger.error(f"Error getting public dashboard stats: {e}")
         return {
@@ -106,19 +120,24 @@ async def get_public_dashboard_stats():
         }
 
 @app.get("/api/public/posts-simple")
-async def get_public_posts():
+async def get_public_posts(cursor: Optional[str] = None):
     """Public posts endpoint for the web interface."""
     try:
-        # Используем реальные данные из базы
-        posts = data_manager.get_recent_posts(limit=10)
+        # Используем реальные данные из базы, страницы по курсору (created_at, id)
+        page = await run_in_threadpool(data_manager.get_recent_posts_page, limit=10, cursor=cursor)
+        posts = page["posts"]
         return {
             "posts": posts,
             "total": len(posts),
             "limit": 10,
             "offset": 0,
-            "has_more": len(posts) >= 10
+            "has_more": page["next_cursor"] is not None,
+            "next_cursor": page["next_cursor"],
+            "prev_cursor": page["prev_cursor"]
         }
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting public posts: {e}")
         return {
@@ -133,7 +152,7 @@ async def get_public_posts():
 async def get_posts_by_status(status: str):
     """Получить посты по статусу."""
     try:
-        posts = data_manager.get_posts_by_status(status, limit=20)
+        posts = await run_in_threadpool(data_manager.get_posts_by_status, status, limit=20)
         return {
             "posts": posts,
             "status": status,
@@ -154,7 +173,7 @@ async def get_posts_by_status(status: str):
 async def get_groups_status():
     """Получить статус групп."""
     try:
-        groups = data_manager.get_groups_status()
+        groups = await run_in_threadpool(data_manager.get_groups_status)
         return {
             "groups": groups,
             "total": len(groups),
@@ -863,7 +882,7 @@ async def read_root():
         document.addEventListener('DOMContentLoaded', function() {
             initializeNavigation();
             loadDashboardData();
-            setInterval(loadDashboardData, 30000); // Refresh every 30 seconds
+            subscribeToEvents();
             
             // Add keyboard event listener for ESC key
             document.addEventListener('keydown', function(e) {
@@ -916,6 +935,44 @@ async def read_root():
             }
         }
 
+        // Live updates: the server pushes events, polling is only a fallback
+        let refreshTimer = null;
+        let fallbackPoll = null;
+
+        function scheduleRefresh() {
+            // Bursts of events (bulk ingest) collapse into one refresh
+            clearTimeout(refreshTimer);
+            refreshTimer = setTimeout(() => {
+                if (currentSection === 'dashboard') loadDashboardData();
+                if (currentSection === 'posts') loadPosts();
+                if (currentSection === 'analytics') loadAnalytics();
+            }, 1000);
+        }
+
+        function startFallbackPoll() {
+            if (!fallbackPoll) fallbackPoll = setInterval(loadDashboardData, 120000);
+        }
+
+        function subscribeToEvents() {
+            if (!window.EventSource) {
+                startFallbackPoll();
+                return;
+            }
+            const source = new EventSource('/api/public/events');
+            source.onopen = () => {
+                clearInterval(fallbackPoll);
+                fallbackPoll = null;
+            };
+            // EventSource reconnects by itself; poll slowly while it is down
+            source.onerror = startFallbackPoll;
+            ['posts.created', 'post.status', 'task.completed'].forEach(type => {
+                source.addEventListener(type, scheduleRefresh);
+            });
+            source.addEventListener('tokens.health', () => {
+                if (currentSection === 'dashboard') loadSystemStatus();
+            });
+        }
+
         // Dashboard functions
         async function loadDashboardData() {
             try {
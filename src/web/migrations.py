@@ -0,0 +1,263 @@
+"""
+Миграции схемы PostgreSQL, учитываемые в postopus_migrations.
+
+create_all создает только отсутствующие таблицы, поэтому изменения
+существующих таблиц (колонки, индексы) описываются здесь упорядоченным
+списком. Успешно примененная версия записывается в модель Migration и
+больше не выполняется. Индексы на postopus_posts создаются CONCURRENTLY,
+чтобы не блокировать запись в рабочей базе; недостроенные (INVALID) индексы
+прерванной попытки удаляются перед повтором. Несколько процессов (web и
+воркеры) стартуют одновременно, поэтому миграции выполняются под
+advisory-блокировкой, которую остальные процессы ждут опросом.
+"""
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Dict, Any
+
+from sqlalchemy import text
+
+from .database import SessionLocal
+from .models import Migration
+from .search import SEARCH_SCHEMA_SQL, TRIGRAM_SCHEMA_SQL
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_lock, под которым выполняются миграции
+MIGRATIONS_LOCK_KEY = 7_015_001
+# Сколько ждать миграций другого процесса (секунды) и как часто проверять блокировку
+MIGRATIONS_LOCK_TIMEOUT = float(os.getenv("MIGRATIONS_LOCK_TIMEOUT", "600"))
+MIGRATIONS_LOCK_POLL_INTERVAL = 1.0
+_CONCURRENT_INDEX_RE = re.compile(r"CREATE (?:UNIQUE )?INDEX CONCURRENTLY IF NOT EXISTS (\w+)", re.IGNORECASE)
+
+
+@dataclass
+class SchemaMigration:
+    """Одна версия схемы."""
+    version: str
+    name: str
+    statements: List[str]
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    autocommit: bool = False
+    # Сбой необязательной миграции не останавливает следующие (например, нет прав на расширение)
+    optional: bool = False
+    details: Dict[str, Any] = field(default_factory=dict)
+
+
+MIGRATIONS: List[SchemaMigration] = [
+    SchemaMigration(
+        version="0001",
+        name="posts full-text search vector",
+        statements=SEARCH_SCHEMA_SQL,
+        autocommit=True
+    ),
+    SchemaMigration(
+        version="0002",
+        name="posts pg_trgm indexes",
+        statements=TRIGRAM_SCHEMA_SQL,
+        autocommit=True,
+        optional=True
+    ),
+    SchemaMigration(
+        version="0003",
+        name="posts composite and partial indexes",
+        statements=[
+            # Keyset-пагинация (created_at, id)
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_postopus_posts_created_at_id "
+            "ON postopus_posts (created_at, id)",
+            # Лента и статистика региона: WHERE region = ? ORDER BY created_at DESC
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_postopus_posts_region_created_at "
+            "ON postopus_posts (region, created_at DESC)",
+            # get_posts_by_status и фильтры по статусу с сортировкой по дате
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_postopus_posts_status_created_at "
+            "ON postopus_posts (status, created_at DESC)",
+            # process_scheduled_posts_task: status = 'scheduled' AND scheduled_at <= now()
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_postopus_posts_scheduled_due "
+            "ON postopus_posts (scheduled_at) WHERE status = 'scheduled'",
+            # Поиск поста по id во ВКонтакте (post_metadata - JSON, не JSONB, поэтому индекс по выражению)
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_postopus_posts_metadata_vk_post_id "
+            "ON postopus_posts ((post_metadata->>'vk_post_id'))",
+            "ANALYZE postopus_posts",
+        ],
+        autocommit=True
+    ),
+    SchemaMigration(
+        version="0004",
+        name="posts vk_post_id column",
+        statements=[
+            "ALTER TABLE postopus_posts ADD COLUMN IF NOT EXISTS vk_post_id VARCHAR(100)",
+            # Переносим id исходного поста из метаданных: у обработанных постов там
+            # "<owner_id>_<post_id>", у полученных из wall.get - сам id
+            "UPDATE postopus_posts SET vk_post_id = "
+            "regexp_replace(post_metadata->>'vk_post_id', '^-?[0-9]+_', '') "
+            "WHERE vk_post_id IS NULL AND post_metadata->>'vk_post_id' IS NOT NULL",
+        ]
+    ),
+    SchemaMigration(
+        version="0005",
+        name="posts unique (vk_group_id, vk_post_id)",
+        statements=[
+            # Повторно сохраненные копии одного поста VK: оставляем самую продвинутую по
+            # статусу строку, среди равных - последнюю измененную. Удаленные id логируются
+            "DELETE FROM postopus_posts WHERE id IN ("
+            "SELECT id FROM (SELECT id, row_number() OVER ("
+            "PARTITION BY vk_group_id, vk_post_id ORDER BY "
+            "CASE status WHEN 'published' THEN 0 WHEN 'archived' THEN 1 WHEN 'scheduled' THEN 2 "
+            "WHEN 'approved' THEN 3 ELSE 4 END, updated_at DESC NULLS LAST, id DESC"
+            ") AS rank FROM postopus_posts WHERE vk_post_id IS NOT NULL) ranked WHERE rank > 1"
+            ") RETURNING id",
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_postopus_posts_vk_post "
+            "ON postopus_posts (vk_group_id, vk_post_id)",
+            # На новой базе ограничение уже создано create_all
+            "DO $$ BEGIN "
+            "IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_postopus_posts_vk_post') THEN "
+            "ALTER TABLE postopus_posts ADD CONSTRAINT uq_postopus_posts_vk_post "
+            "UNIQUE USING INDEX uq_postopus_posts_vk_post; "
+            "END IF; END $$",
+        ],
+        autocommit=True
+    ),
+]
+
+
+def get_applied_versions() -> set:
+    with SessionLocal() as session:
+        rows = session.query(Migration.version).filter(Migration.success == True).all()
+    return {version for (version,) in rows}
+
+
+def _record(migration: SchemaMigration, started: float, success: bool, error: str = None,
+            returned_ids: List[Any] = None):
+    details = dict(migration.details, statements=len(migration.statements))
+    if error:
+        details["error"] = error
+    if returned_ids:
+        details["returned_ids"] = returned_ids
+    with SessionLocal() as session:
+        session.add(Migration(
+            version=migration.version,
+            name=migration.name,
+            executed_at=datetime.utcnow(),
+            execution_time_ms=int((time.monotonic() - started) * 1000),
+            success=success,
+            migration_details=details
+        ))
+        session.commit()
+
+
+def _drop_invalid_indexes(connection, migration: SchemaMigration):
+    """
+    Удаляет INVALID индексы, оставшиеся от прерванного CREATE INDEX CONCURRENTLY.
+
+    Иначе IF NOT EXISTS при повторе пропустит недостроенный индекс.
+    """
+    names = [m.group(1) for m in map(_CONCURRENT_INDEX_RE.search, migration.statements) if m]
+    if not names:
+        return
+    invalid = connection.execute(text(
+        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE NOT i.indisvalid AND c.relname = ANY(:names)"
+    ), {"names": names}).scalars().all()
+    for name in invalid:
+        logger.warning(f"Dropping invalid index {name} before migration {migration.version}")
+        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+
+def _apply(engine, migration: SchemaMigration) -> List[Any]:
+    """
+    Выполняет команды миграции.
+
+    Returns:
+        id строк, возвращенных командами с RETURNING (например, удаленных дублей)
+    """
+    returned_ids = []
+    if migration.autocommit:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            _drop_invalid_indexes(connection, migration)
+            for statement in migration.statements:
+                returned_ids += _execute(connection, migration, statement)
+    else:
+        with engine.begin() as connection:
+            for statement in migration.statements:
+                returned_ids += _execute(connection, migration, statement)
+    return returned_ids
+
+
+def _execute(connection, migration: SchemaMigration, statement: str) -> List[Any]:
+    result = connection.execute(text(statement))
+    if not result.returns_rows:
+        return []
+    ids = list(result.scalars().all())
+    if ids:
+        logger.warning(f"Migration {migration.version}: statement returned ids {ids}")
+    return ids
+
+
+def run_migrations(engine) -> Dict[str, Any]:
+    """
+    Применяет еще не выполненные миграции по порядку.
+
+    Returns:
+        Словарь со списками примененных, пропущенных и неудачных версий
+    """
+    result = {"applied": [], "skipped": [], "failed": []}
+    if engine.dialect.name != 'postgresql':
+        logger.info(f"Schema migrations skipped for {engine.dialect.name}")
+        return result
+
+    # Блокировка уровня сессии на отдельном соединении без открытой транзакции.
+    # Ждущий процесс опрашивает pg_try_advisory_lock, а не висит в pg_advisory_lock:
+    # CREATE INDEX CONCURRENTLY владельца блокировки ждет завершения запросов со
+    # снимками, а такую взаимную блокировку через клиента PostgreSQL не обнаружит
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_connection:
+        if not _try_lock(lock_connection):
+            logger.warning(f"Schema migrations skipped: lock is held by another process "
+                           f"for more than {MIGRATIONS_LOCK_TIMEOUT:.0f}s")
+            return result
+        try:
+            _run_pending(engine, result)
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+    return result
+
+
+def _try_lock(connection) -> bool:
+    """Ждет блокировку миграций не дольше MIGRATIONS_LOCK_TIMEOUT."""
+    deadline = time.monotonic() + MIGRATIONS_LOCK_TIMEOUT
+    waiting = False
+    while True:
+        if connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY}).scalar():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        if not waiting:
+            logger.info("Waiting for schema migrations of another process")
+            waiting = True
+        time.sleep(MIGRATIONS_LOCK_POLL_INTERVAL)
+
+
+def _run_pending(engine, result: Dict[str, Any]):
+    # Список примененных версий читается под блокировкой: другой процесс мог их только что выполнить
+    applied = get_applied_versions()
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            result["skipped"].append(migration.version)
+            continue
+
+        started = time.monotonic()
+        try:
+            returned_ids = _apply(engine, migration)
+        except Exception as e:
+            logger.error(f"Migration {migration.version} ({migration.name}) failed: {e}")
+            _record(migration, started, success=False, error=str(e))
+            result["failed"].append(migration.version)
+            if migration.optional:
+                continue
+            break
+
+        _record(migration, started, success=True, returned_ids=returned_ids)
+        result["applied"].append(migration.version)
+        logger.info(f"Migration {migration.version} ({migration.name}) applied")
@@ -3,8 +3,10 @@ Enhanced SQLAlchemy models for PostgreSQL with regional support.
 """
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ARRAY, Index
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Boolean, JSON, ARRAY, Index, UniqueConstraint, Computed, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import deferred
 from .database import Base
 
 class Post(Base):
@@ -19,7 +21,8 @@ class Post(Base):
     status = Column(String(50), default="draft")  # draft, published, scheduled, archived
     region = Column(String(100), nullable=True, index=True)  # Regional support
     theme = Column(String(50), nullable=False, index=True, default="novost")  # novost, sosed, kino, music, prikol, reklama
-    vk_group_id = Column(String(100), nullable=True)
+    vk_group_id = Column(String(100), nullable=True)  # owner_id of the source wall, e.g. "-123"
+    vk_post_id = Column(String(100), nullable=True)  # id of the source post on that wall, e.g. "456"
     telegram_chat_id = Column(String(100), nullable=True)
     priority = Column(Integer, default=0)  # -1=low, 0=normal, 1=high
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -30,6 +33,24 @@ class Post(Base):
     tags = Column(ARRAY(String), nullable=True, default=lambda: [])  # Tags support
     view_count = Column(Integer, default=0)
     like_count = Column(Integer, default=0)
+    # Full-text search vector maintained by PostgreSQL, see web/search.py
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('russian', coalesce(content, '')), 'B')",
+        persisted=True
+    )))
+    
+    __table_args__ = (
+        # Keyset pagination over (created_at, id), see web/pagination.py
+        Index('ix_postopus_posts_created_at_id', 'created_at', 'id'),
+        Index('ix_postopus_posts_search_vector', 'search_vector', postgresql_using='gin'),
+        # Hot filters, existing databases get them from web/migrations.py
+        Index('ix_postopus_posts_region_created_at', 'region', text('created_at DESC')),
+        Index('ix_postopus_posts_status_created_at', 'status', text('created_at DESC')),
+        Index('ix_postopus_posts_scheduled_due', 'scheduled_at', postgresql_where=text("status = 'scheduled'")),
+        # Bulk upsert of fetched posts, see services/post_ingest.py
+        UniqueConstraint('vk_group_id', 'vk_post_id', name='uq_postopus_posts_vk_post'),
+    )
 
 class Group(Base):
     """Enhanced group model with platform and regional support."""
@@ -118,3 +139,21 @@ class Migration(Base):
     execution_time_ms = Column(Integer, nullable=True)
     success = Column(Boolean, default=True)
     migration_details = Column(JSON, nullable=True, default=lambda: {})
+
+class DailyStats(Base):
+    """Daily rollup of posts, views and likes by region, theme and status."""
+    __tablename__ = "postopus_daily_stats"
+    __table_args__ = (
+        UniqueConstraint('day', 'region', 'theme', 'status', name='uq_daily_stats_bucket'),
+        Index('ix_daily_stats_region_day', 'region', 'day'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False, index=True)
+    region = Column(String(100), nullable=False, default='')  # '' for posts without region
+    theme = Column(String(50), nullable=False, default='')
+    status = Column(String(50), nullable=False, default='')
+    posts_count = Column(Integer, nullable=False, default=0)
+    views_count = Column(Integer, nullable=False, default=0)
+    likes_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,78 @@
+"""
+Keyset (cursor) pagination over (created_at, id).
+
+Курсор - непрозрачный base64-токен с ключом граничной строки и
+направлением. Страница выбирается условием ``(created_at, id) < ключ``
+по составному индексу, поэтому стоимость не зависит от глубины страницы.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+
+NEXT = "n"
+PREV = "p"
+
+
+class InvalidCursor(ValueError):
+    """Курсор поврежден или создан не этим API."""
+
+
+def encode_cursor(created_at: datetime, row_id: int, direction: str = NEXT) -> str:
+    payload = json.dumps({"t": created_at.isoformat(), "i": row_id, "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload.get("d", NEXT)
+        if direction not in (NEXT, PREV):
+            raise ValueError(direction)
+        return datetime.fromisoformat(payload["t"]), int(payload["i"]), direction
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def apply_keyset(query, model, cursor: Optional[str], limit: int):
+    """
+    Apply keyset condition, ordering and limit to a Query or select().
+
+    Rows are requested newest first; a ``prev`` cursor walks back towards
+    newer rows in ascending order (``paginate`` restores the order).
+    One extra row is fetched to know whether another page exists.
+    """
+    key = tuple_(model.created_at, model.id)
+    if cursor:
+        created_at, row_id, direction = decode_cursor(cursor)
+        if direction == PREV:
+            return query.where(key > tuple_(created_at, row_id)).order_by(
+                model.created_at.asc(), model.id.asc()
+            ).limit(limit + 1)
+        query = query.where(key < tuple_(created_at, row_id))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+def paginate(rows: List[Any], cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str], Optional[str]]:
+    """
+    Trim rows fetched by ``apply_keyset`` and build neighbour cursors.
+
+    Returns:
+        (строки новейшие сначала, курсор следующей страницы, курсор предыдущей)
+    """
+    direction = decode_cursor(cursor)[2] if cursor else None
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+
+    if direction == PREV:
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = direction == NEXT, has_more
+
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id, NEXT) if rows and has_older else None
+    prev_cursor = encode_cursor(rows[0].created_at, rows[0].id, PREV) if rows and has_newer else None
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,261 @@
+"""
+HTTP response cache for public read endpoints.
+
+``ResponseCacheMiddleware`` stores successful GET responses of the routes
+listed in ``RESPONSE_CACHE_RULES`` for a per-route TTL and serves them with
+an ``ETag``; a matching ``If-None-Match`` gets ``304 Not Modified``.
+
+Every route is tagged (``posts``, ``groups``, ``stats``). Cache keys include
+the current version of their tags, so ``invalidate_response_cache("posts")``
+after a write bumps the version and all dependent entries miss at once.
+The backend is an in-process LRU or Redis (``RESPONSE_CACHE_BACKEND``).
+Only Redis shares entries and invalidations between web processes and
+Celery workers; with the in-memory backend, writes made by workers show up
+once the TTL expires.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:
+    # Graceful degradation if redis is not available
+    redis = None
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", os.getenv("REDIS_URL", ""))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_KEY_PREFIX = "postopus:httpcache:"
+
+# Путь (или префикс с "*") -> (TTL в секундах, теги)
+RESPONSE_CACHE_RULES: List[Tuple[str, float, Tuple[str, ...]]] = [
+    ("/api/public/stats", 30, ("stats",)),
+    ("/api/public/dashboard-stats", 15, ("posts", "groups")),
+    ("/api/public/dashboard", 30, ("posts", "groups", "stats")),
+    ("/api/public/posts/statistics", 60, ("posts", "stats")),
+    ("/api/public/groups/statistics", 60, ("groups", "posts")),
+    ("/api/public/regions", 60, ("posts", "groups")),
+    ("/api/public/groups", 60, ("groups",)),
+    ("/api/public/groups-status", 30, ("groups",)),
+    ("/api/public/analytics", 60, ("posts", "groups")),
+    ("/api/public/settings", 300, ()),
+    ("/api/public/posts", 15, ("posts",)),
+    ("/api/public/posts-simple", 15, ("posts",)),
+    ("/api/public/posts-by-status/*", 15, ("posts",)),
+    ("/api/public/search", 30, ("posts",)),
+]
+
+
+class MemoryResponseCache:
+    """In-process LRU of responses with per-entry expiry."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def tag_versions(self, tags: Iterable[str]) -> List[int]:
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class RedisResponseCache:
+    """Responses in Redis with native expiry, shared by all processes."""
+
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self._sync = redis.Redis.from_url(redis_url)
+        # asyncio-клиент Redis привязан к циклу событий: свой клиент на каждый живой цикл
+        self._async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async.get(loop)
+        if client is None:
+            client = self._async[loop] = aioredis.Redis.from_url(self.redis_url)
+        return client
+
+    async def tag_versions(self, tags: Iterable[str]) -> List[int]:
+        tags = list(tags)
+        if not tags:
+            return []
+        values = await self._client().mget([f"{RESPONSE_CACHE_KEY_PREFIX}tag:{tag}" for tag in tags])
+        return [int(value or 0) for value in values]
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self._client().get(RESPONSE_CACHE_KEY_PREFIX + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        entry["body"] = base64.b64decode(entry["body"])
+        return entry
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl: float) -> None:
+        payload = dict(entry, body=base64.b64encode(entry["body"]).decode())
+        await self._client().set(RESPONSE_CACHE_KEY_PREFIX + key, json.dumps(payload), ex=max(1, int(ttl)))
+
+    def bump(self, tags: Iterable[str]) -> None:
+        pipe = self._sync.pipeline()
+        for tag in tags:
+            pipe.incr(f"{RESPONSE_CACHE_KEY_PREFIX}tag:{tag}")
+        pipe.execute()
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """Возвращает бэкенд кеша ответов процесса."""
+    global _response_cache
+    if _response_cache is None:
+        if RESPONSE_CACHE_BACKEND == "redis" and RESPONSE_CACHE_REDIS_URL and redis:
+            try:
+                _response_cache = RedisResponseCache(RESPONSE_CACHE_REDIS_URL)
+                _response_cache._sync.ping()
+            except Exception as e:
+                logger.warning(f"Redis response cache unavailable, using in-memory cache: {e}")
+                _response_cache = MemoryResponseCache()
+        else:
+            _response_cache = MemoryResponseCache()
+    return _response_cache
+
+
+def invalidate_response_cache(*tags: str) -> None:
+    """Сбрасывает закешированные ответы с указанными тегами (ошибки не пробрасываются)."""
+    try:
+        get_response_cache().bump(tags)
+    except Exception as e:
+        logger.warning(f"Response cache invalidation failed for {tags}: {e}")
+
+
+def _match_rule(path: str, rules) -> Optional[Tuple[float, Tuple[str, ...]]]:
+    for pattern, ttl, tags in rules:
+        if (pattern.endswith("*") and path.startswith(pattern[:-1])) or path == pattern:
+            return ttl, tags
+    return None
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware caching GET responses of configured public routes."""
+
+    def __init__(self, app, rules=None, cache=None):
+        self.app = app
+        self.rules = RESPONSE_CACHE_RULES if rules is None else rules
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if not RESPONSE_CACHE_ENABLED or scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        rule = _match_rule(scope["path"], self.rules)
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        ttl, tags = rule
+        cache = self.cache or get_response_cache()
+        request_headers = dict(scope["headers"])
+        if_none_match = request_headers.get(b"if-none-match", b"").decode("latin-1") or None
+
+        try:
+            versions = await cache.tag_versions(tags)
+            query = "&".join(sorted(scope["query_string"].decode("latin-1").split("&")))
+            key = f"{scope['path']}?{query}|" + ",".join(map(str, versions))
+            entry = await cache.get(key)
+        except Exception as e:
+            logger.warning(f"Response cache lookup failed: {e}")
+            return await self.app(scope, receive, send)
+
+        if entry is not None:
+            return await self._send_entry(send, entry, if_none_match, b"HIT")
+
+        start = {}
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        body = b"".join(chunks)
+
+        if start.get("status") != 200:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        entry = {
+            "status": 200,
+            "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in start.get("headers", [])],
+            "body": body,
+            "etag": _etag(body),
+        }
+        try:
+            await cache.set(key, entry, ttl)
+        except Exception as e:
+            logger.warning(f"Response cache store failed: {e}")
+        await self._send_entry(send, entry, if_none_match, b"MISS")
+
+    async def _send_entry(self, send, entry: Dict[str, Any], if_none_match: Optional[str], state: bytes):
+        etag = entry["etag"]
+        extra = [(b"etag", etag.encode()), (b"cache-control", b"no-cache"), (b"x-cache", state)]
+        if _etag_matches(if_none_match, etag):
+            await send({"type": "http.response.start", "status": 304, "headers": extra})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        headers = [
+            (k.encode("latin-1"), v.encode("latin-1")) for k, v in entry["headers"]
+            if k.lower() not in ("etag", "cache-control")
+        ]
+        await send({"type": "http.response.start", "status": entry["status"], "headers": headers + extra})
+        await send({"type": "http.response.body", "body": entry["body"]})
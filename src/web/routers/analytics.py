@@ -5,12 +5,14 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_
+from sqlalchemy import func, desc, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .auth import get_current_user
-from ..database import get_db
+from ..database import get_async_db
 from ..models import Post, Group, User, Schedule
+from ...services.daily_stats import get_summary as get_daily_summary
+from ..search import search_posts as search_text_posts
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -18,39 +20,34 @@ router = APIRouter()
 @router.get("/dashboard")
 async def get_dashboard_analytics(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получение аналитики для дашборда."""
     try:
         # Общая статистика
-        total_posts = db.query(Post).count()
-        total_groups = db.query(Group).count()
-        total_users = db.query(User).count()
-        total_schedules = db.query(Schedule).count()
+        summary = await db.run_sync(get_daily_summary)
+        total_posts = summary["total_posts"]
+        total_groups = await db.scalar(select(func.count(Group.id)))
+        total_users = await db.scalar(select(func.count(User.id)))
+        total_schedules = await db.scalar(select(func.count(Schedule.id)))
         
         # Статистика по статусам постов
-        post_statuses = db.query(
-            Post.status, 
-            func.count(Post.id).label('count')
-        ).group_by(Post.status).all()
+        post_statuses = [(status, item["posts"]) for status, item in summary["by_status"].items()]
         
         # Статистика по платформам
-        platform_stats = db.query(
+        platform_stats = (await db.execute(select(
             Group.platform,
             func.count(Group.id).label('count')
-        ).group_by(Group.platform).all()
+        ).group_by(Group.platform))).all()
         
         # Статистика по регионам
-        region_stats = db.query(
-            Post.region,
-            func.count(Post.id).label('count')
-        ).filter(Post.region.isnot(None)).group_by(Post.region).all()
+        region_stats = [(region, item["posts"]) for region, item in summary["by_region"].items() if region]
         
         # Последние посты
-        recent_posts = db.query(Post).order_by(desc(Post.created_at)).limit(10).all()
+        recent_posts = (await db.scalars(select(Post).order_by(desc(Post.created_at)).limit(10))).all()
         
         # Активные группы
-        active_groups = db.query(Group).filter(Group.is_active == True).all()
+        active_groups = (await db.scalars(select(Group).where(Group.is_active == True))).all()
         
         return {
             "overview": {
@@ -89,36 +86,18 @@ async def get_dashboard_analytics(
 async def get_posts_statistics(
     days: int = Query(30, description="Количество дней для анализа"),
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получение статистики постов за период."""
     try:
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Посты за период
-        posts_in_period = db.query(Post).filter(Post.created_at >= start_date).count()
-        
-        # Посты по дням
-        daily_posts = db.query(
-            func.date(Post.created_at).label('date'),
-            func.count(Post.id).label('count')
-        ).filter(Post.created_at >= start_date).group_by(
-            func.date(Post.created_at)
-        ).order_by('date').all()
-        
-        # Посты по регионам за период
-        regional_posts = db.query(
-            Post.region,
-            func.count(Post.id).label('count')
-        ).filter(
-            and_(Post.created_at >= start_date, Post.region.isnot(None))
-        ).group_by(Post.region).all()
-        
-        # Посты по статусам за период
-        status_posts = db.query(
-            Post.status,
-            func.count(Post.id).label('count')
-        ).filter(Post.created_at >= start_date).group_by(Post.status).all()
+        # Сводка за период из postopus_daily_stats вместо сканирования постов
+        summary = await db.run_sync(get_daily_summary, since=start_date.date())
+        posts_in_period = summary["total_posts"]
+        daily_posts = [(day, item["posts"]) for day, item in summary["by_day"].items()]
+        regional_posts = [(region, item["posts"]) for region, item in summary["by_region"].items() if region]
+        status_posts = [(status, item["posts"]) for status, item in summary["by_status"].items()]
         
         return {
             "period": {
@@ -139,28 +118,28 @@ async def get_posts_statistics(
 @router.get("/groups/statistics")
 async def get_groups_statistics(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получение статистики групп."""
     try:
         # Общая статистика групп
-        total_groups = db.query(Group).count()
-        active_groups = db.query(Group).filter(Group.is_active == True).count()
+        total_groups = await db.scalar(select(func.count(Group.id)))
+        active_groups = await db.scalar(select(func.count(Group.id)).where(Group.is_active == True))
         
         # Группы по платформам
-        platform_groups = db.query(
+        platform_groups = (await db.execute(select(
             Group.platform,
             func.count(Group.id).label('count')
-        ).group_by(Group.platform).all()
+        ).group_by(Group.platform))).all()
         
         # Группы по регионам
-        regional_groups = db.query(
+        regional_groups = (await db.execute(select(
             Group.region,
             func.count(Group.id).label('count')
-        ).filter(Group.region.isnot(None)).group_by(Group.region).all()
+        ).where(Group.region.isnot(None)).group_by(Group.region))).all()
         
         # Группы с постами
-        groups_with_posts = db.query(
+        groups_with_posts = (await db.execute(select(
             Group.id,
             Group.name,
             Group.platform,
@@ -168,7 +147,7 @@ async def get_groups_statistics(
             func.count(Post.id).label('post_count')
         ).outerjoin(Post, Group.id == Post.vk_group_id).group_by(
             Group.id, Group.name, Group.platform, Group.region
-        ).all()
+        ))).all()
         
         return {
             "overview": {
@@ -196,21 +175,21 @@ async def get_groups_statistics(
 @router.get("/regions")
 async def get_regions(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получение списка регионов с статистикой."""
     try:
         # Регионы из постов
-        post_regions = db.query(
+        post_regions = (await db.execute(select(
             Post.region,
             func.count(Post.id).label('post_count')
-        ).filter(Post.region.isnot(None)).group_by(Post.region).all()
+        ).where(Post.region.isnot(None)).group_by(Post.region))).all()
         
         # Регионы из групп
-        group_regions = db.query(
+        group_regions = (await db.execute(select(
             Group.region,
             func.count(Group.id).label('group_count')
-        ).filter(Group.region.isnot(None)).group_by(Group.region).all()
+        ).where(Group.region.isnot(None)).group_by(Group.region))).all()
         
         # Объединяем данные
         regions = {}
@@ -245,46 +224,23 @@ async def search_posts(
     status: str = Query(None, description="Фильтр по статусу"),
     limit: int = Query(50, description="Максимальное количество результатов"),
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Поиск постов по содержимому."""
     try:
-        query = db.query(Post)
-        
-        # Поиск по содержимому
-        if q:
-            query = query.filter(
-                Post.title.contains(q) | Post.content.contains(q)
-            )
-        
-        # Фильтр по региону
-        if region:
-            query = query.filter(Post.region == region)
-        
-        # Фильтр по статусу
-        if status:
-            query = query.filter(Post.status == status)
-        
-        # Ограничение результатов
-        results = query.limit(limit).all()
+        # Полнотекстовый поиск по GIN-индексу с ранжированием, pg_trgm как запасной вариант
+        found = await db.run_sync(search_text_posts, q, region=region, status=status, limit=limit)
+        results = found["results"]
         
         return {
             "query": q,
+            "mode": found["mode"],
             "filters": {
                 "region": region,
                 "status": status
             },
             "total": len(results),
-            "results": [
-                {
-                    "id": post.id,
-                    "title": post.title,
-                    "content": post.content[:200] + "..." if len(post.content) > 200 else post.content,
-                    "region": post.region,
-                    "status": post.status,
-                    "created_at": post.created_at
-                } for post in results
-            ]
+            "results": results
         }
         
     except Exception as e:
@@ -2,6 +2,7 @@
 Enhanced dashboard router with regional analytics and VK integration.
 """
 import logging
+import os
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, HTTPException, Depends
@@ -9,21 +10,27 @@ from pydantic import BaseModel
 
 try:
     from sqlalchemy.orm import Session
-    from sqlalchemy import func
+    from sqlalchemy import func, select
 except ImportError:
     Session = None
     func = None
 
-from ..database import get_database
+from ..database import get_database, async_session
 from ..models import Post, Group, Schedule
-from ...services.vk_service import EnhancedVKService
+from ...services.daily_stats import get_summary as get_daily_summary
+from ...services.token_health import get_token_health
 from ...services.post_processor import EnhancedPostProcessor
 from ...models.config import AppConfig
 from ..auth import get_current_user
+from ...utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Региональная статистика меняется медленно - отдаем ее из короткого кеша
+REGIONAL_STATS_CACHE_TTL = float(os.getenv("REGIONAL_STATS_CACHE_TTL", "30"))
+_regional_stats_cache = TTLCache(ttl=REGIONAL_STATS_CACHE_TTL)
+
 # Enhanced Pydantic models
 class DashboardStats(BaseModel):
     """Enhanced statistics for dashboard."""
@@ -101,31 +108,31 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
         
         if Session and db:
             try:
-                with db.get_session() as session:
+                async with async_session() as session:
                     # Total posts
-                    total_posts = session.query(Post).count()
+                    total_posts = await session.scalar(select(func.count(Post.id)))
                     
                     # Posts published today
-                    published_today = session.query(Post).filter(
+                    published_today = await session.scalar(select(func.count(Post.id)).where(
                         Post.created_at >= today_start,
                         Post.status == 'published'
-                    ).count()
+                    ))
                     
                     # Posts published this week
-                    published_this_week = session.query(Post).filter(
+                    published_this_week = await session.scalar(select(func.count(Post.id)).where(
                         Post.created_at >= week_start,
                         Post.status == 'published'
-                    ).count()
+                    ))
                     
                     # Active regions (regions with posts in last 7 days)
-                    active_regions = session.query(func.count(func.distinct(Post.region))).filter(
+                    active_regions = await session.scalar(select(func.count(func.distinct(Post.region))).where(
                         Post.created_at >= week_start
-                    ).scalar() or 0
+                    )) or 0
                     
                     # Scheduled tasks
-                    scheduled_tasks = session.query(Schedule).filter(
+                    scheduled_tasks = await session.scalar(select(func.count(Schedule.id)).where(
                         Schedule.is_active == True
-                    ).count()
+                    ))
                     
             except Exception as e:
                 logger.warning(f"Database query failed, using fallback data: {e}")
@@ -143,12 +150,9 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
             active_regions = 15
             scheduled_tasks = 8
         
-        # Try to get VK session count
+        # Working VK tokens from the health registry (no VK calls here)
         try:
-            config = AppConfig.from_env()
-            vk_service = EnhancedVKService(config)
-            await vk_service.initialize()
-            active_vk_sessions = len(vk_service.vk_sessions)
+            active_vk_sessions = (await _vk_token_health())['working_tokens']
         except Exception:
             active_vk_sessions = len(AppConfig.from_env().vk.tokens) if AppConfig.from_env().vk.tokens else 0
         
@@ -184,15 +188,15 @@ async def get_recent_posts(
         
         if Session and db:
             try:
-                with db.get_session() as session:
-                    query = session.query(Post).filter(
+                async with async_session() as session:
+                    query = select(Post).where(
                         Post.status == 'published'
                     )
                     
                     if region:
-                        query = query.filter(Post.region == region)
+                        query = query.where(Post.region == region)
                     
-                    db_posts = query.order_by(Post.created_at.desc()).limit(limit).all()
+                    db_posts = (await session.scalars(query.order_by(Post.created_at.desc()).limit(limit))).all()
                     
                     for post in db_posts:
                         # Extract metadata
@@ -270,63 +274,16 @@ async def get_regional_stats(current_user: dict = Depends(get_current_user)):
             'bal': 'Baltasi'
         }
         
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        cached = _regional_stats_cache.get('regional_stats')
+        if cached is not None:
+            return cached
         
         if Session and db:
             try:
-                with db.get_session() as session:
-                    for region_code, region_name in regions.items():
-                        # Posts count for this region
-                        posts_count = session.query(Post).filter(
-                            Post.region == region_code
-                        ).count()
-                        
-                        # Posts today
-                        posts_today = session.query(Post).filter(
-                            Post.region == region_code,
-                            Post.created_at >= today_start
-                        ).count()
-                        
-                        # Active groups count
-                        active_groups = session.query(Group).filter(
-                            Group.region == region_code,
-                            Group.is_active == True
-                        ).count()
-                        
-                        # Last post time
-                        last_post = session.query(Post).filter(
-                            Post.region == region_code
-                        ).order_by(Post.created_at.desc()).first()
-                        
-                        last_post_time = last_post.created_at if last_post else None
-                        
-                        # Calculate engagement rate (simplified)
-                        views_total = 0
-                        if posts_count > 0:
-                            # Try to extract views from metadata
-                            posts_with_views = session.query(Post).filter(
-                                Post.region == region_code,
-                                Post.post_metadata.isnot(None)
-                            ).all()
-                            
-                            for post in posts_with_views:
-                                if post.post_metadata and 'views' in post.post_metadata:
-                                    views_total += post.post_metadata['views'].get('count', 0)
-                        
-                        engagement_rate = (views_total / posts_count) if posts_count > 0 else 0.0
-                        
-                        if posts_count > 0:  # Only include regions with posts
-                            regional_data.append(RegionalStats(
-                                region=region_code,
-                                region_name=region_name,
-                                posts_count=posts_count,
-                                posts_today=posts_today,
-                                views_total=views_total,
-                                engagement_rate=round(engagement_rate, 2),
-                                active_groups=active_groups,
-                                last_post_time=last_post_time
-                            ))
-                    
+                regional_data = await _query_regional_stats(regions)
+                if regional_data:
+                    regional_data.sort(key=lambda x: x.posts_count, reverse=True)
+                    _regional_stats_cache.set('regional_stats', regional_data)
             except Exception as e:
                 logger.warning(f"Database query failed, using demo data: {e}")
                 regional_data = []  # Will fall through to demo data
@@ -367,24 +324,74 @@ async def get_regional_stats(current_user: dict = Depends(get_current_user)):
         logger.error(f"Error getting regional stats: {e}")
         raise HTTPException(status_code=500, detail="Error getting regional stats")
 
+async def _query_regional_stats(regions: Dict[str, str]) -> List[RegionalStats]:
+    """Aggregates per-region post and group statistics in a single query."""
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    post_stats = select(
+        Post.region.label('region'),
+        func.count(Post.id).label('posts_count'),
+        func.count(Post.id).filter(Post.created_at >= today_start).label('posts_today'),
+        func.coalesce(func.sum(Post.post_metadata[('views', 'count')].as_integer()), 0).label('views_total'),
+        func.max(Post.created_at).label('last_post_time')
+    ).where(
+        Post.region.in_(list(regions))
+    ).group_by(Post.region).subquery()
+    
+    group_stats = select(
+        Group.region.label('region'),
+        func.count(Group.id).label('active_groups')
+    ).where(
+        Group.is_active == True
+    ).group_by(Group.region).subquery()
+    
+    async with async_session() as session:
+        rows = (await session.execute(select(
+            post_stats,
+            func.coalesce(group_stats.c.active_groups, 0)
+        ).outerjoin(
+            group_stats, group_stats.c.region == post_stats.c.region
+        ))).all()
+    
+    regional_data = []
+    for region_code, posts_count, posts_today, views_total, last_post_time, active_groups in rows:
+        views_total = int(views_total or 0)
+        regional_data.append(RegionalStats(
+            region=region_code,
+            region_name=regions[region_code],
+            posts_count=posts_count,
+            posts_today=posts_today,
+            views_total=views_total,
+            engagement_rate=round(views_total / posts_count, 2) if posts_count else 0.0,
+            active_groups=active_groups,
+            last_post_time=last_post_time
+        ))
+    return regional_data
+
+async def _vk_token_health() -> Dict[str, Any]:
+    """Health of configured VK tokens from the registry; stale ones are re-probed in the background."""
+    tokens = {f"token_{i}": token for i, token in enumerate(AppConfig.from_env().vk.tokens, 1)}
+    health = get_token_health()
+    health.schedule_revalidation(tokens.values())
+    return await health.summary_async(tokens)
+
 @router.get("/vk-status", response_model=VKConnectionStatus)
 async def get_vk_status(current_user: dict = Depends(get_current_user)):
     """Gets VK API connection status."""
     try:
         config = AppConfig.from_env()
         
-        # Test VK connections
+        # Last known token health; expired entries are re-probed in the background
         try:
-            vk_service = EnhancedVKService(config)
-            await vk_service.initialize()
-            connection_results = await vk_service.test_connection()
+            health = await _vk_token_health()
+            failed = sum(1 for detail in health['details'] if detail['status'] == 'error')
             
             return VKConnectionStatus(
-                total_tokens=connection_results['total_tokens'],
-                working_sessions=connection_results['working_sessions'],
-                failed_sessions=connection_results['total_tokens'] - connection_results['working_sessions'],
+                total_tokens=health['total_tokens'],
+                working_sessions=health['working_tokens'],
+                failed_sessions=failed,
                 last_check=datetime.utcnow(),
-                details=connection_results['details']
+                details=health['details']
             )
             
         except Exception as e:
@@ -445,24 +452,21 @@ async def get_system_status(current_user: dict = Depends(get_current_user)):
         # Test database connection
         db_status = "connected"
         try:
-            db = get_database()
-            if Session and db:
-                with db.get_session() as session:
-                    session.execute("SELECT 1")
+            if not await get_database().connect():
+                db_status = "disconnected"
         except Exception:
             db_status = "disconnected"
         
         # Test VK API
         vk_status = "operational"
         try:
-            config = AppConfig.from_env()
-            if not config.vk.tokens:
+            health = await _vk_token_health()
+            if not health['total_tokens']:
                 vk_status = "not_configured"
-            else:
-                vk_service = EnhancedVKService(config)
-                await vk_service.initialize()
-                if len(vk_service.vk_sessions) == 0:
-                    vk_status = "failed"
+            elif health['unknown_tokens'] == health['total_tokens']:
+                vk_status = "unknown"  # первая проверка еще идет
+            elif health['working_tokens'] == 0:
+                vk_status = "failed"
         except Exception:
             vk_status = "error"
         
@@ -507,34 +511,18 @@ async def get_chart_data(
         
         if Session and db:
             try:
-                with db.get_session() as session:
-                    for i, label in enumerate(labels):
-                        date_start = datetime.strptime(label, "%Y-%m-%d")
-                        date_end = date_start + timedelta(days=1)
-                        
-                        # Query posts for this day
-                        query = session.query(Post).filter(
-                            Post.created_at >= date_start,
-                            Post.created_at < date_end
-                        )
-                        
-                        if region:
-                            query = query.filter(Post.region == region)
-                        
-                        day_posts = query.count()
-                        posts_data.append(day_posts)
-                        
-                        # Calculate views (from metadata)
-                        day_views = 0
-                        posts_with_views = query.filter(
-                            Post.post_metadata.isnot(None)
-                        ).all()
-                        
-                        for post in posts_with_views:
-                            if post.post_metadata and 'views' in post.post_metadata:
-                                day_views += post.post_metadata['views'].get('count', 0)
-                        
-                        views_data.append(day_views)
+                async with async_session() as session:
+                    # One rollup row per day instead of scanning posts
+                    summary = await session.run_sync(
+                        get_daily_summary,
+                        since=datetime.strptime(labels[0], "%Y-%m-%d").date(),
+                        region=region
+                    )
+                
+                for label in labels:
+                    day = summary["by_day"].get(datetime.strptime(label, "%Y-%m-%d").date(), {})
+                    posts_data.append(day.get("posts", 0))
+                    views_data.append(day.get("views", 0))
                         
             except Exception as e:
                 logger.warning(f"Database query failed, using demo data: {e}")
@@ -4,13 +4,14 @@ Enhanced posts router with PostgreSQL integration and regional support.
 import logging
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile, Response
 from pydantic import BaseModel
 
 try:
     from sqlalchemy.orm import Session
     from sqlalchemy import select, and_, or_, func
-    from ...database.postgres import async_session, Post
+    from ..database import async_session
+    from ..models import Post
 except ImportError:
     Session = None
     async_session = None
@@ -20,10 +21,19 @@ from ...services.vk_service import EnhancedVKService
 from ...services.post_processor import EnhancedPostProcessor
 from ...models.config import AppConfig
 from .auth import get_current_user
+from ..pagination import apply_keyset, paginate, InvalidCursor
+from ..response_cache import invalidate_response_cache
+from ...services.event_bus import publish_event
+from ...services.daily_stats import touch_days as touch_daily_stats
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+
+async def _touch_daily_stats(session, *values):
+    """Refresh rollup days of the written posts (touch_days works on a sync session)."""
+    await session.run_sync(touch_daily_stats, *values)
+
 # Enhanced Pydantic models
 class PostCreate(BaseModel):
     """Enhanced model for creating posts."""
@@ -94,14 +104,22 @@ class PublishRequest(BaseModel):
 
 @router.get("/", response_model=List[PostResponse])
 async def get_posts(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     region: Optional[str] = Query(None),
     theme: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor / X-Prev-Cursor"),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get list of posts with advanced filtering."""
+    """
+    Get list of posts with advanced filtering.
+    
+    With ``cursor`` the page is selected by keyset over (created_at, id) and
+    ``skip`` is ignored; cursors of neighbour pages are returned in the
+    X-Next-Cursor and X-Prev-Cursor headers.
+    """
     try:
         if not async_session or not Post:
             # Fallback to demo data
@@ -153,12 +171,22 @@ async def get_posts(
             query = query.where(Post.status == status)
             
         # Apply pagination and ordering
-        query = query.offset(skip).limit(limit).order_by(Post.created_at.desc())
+        if cursor is not None or not skip:
+            query = apply_keyset(query, Post, cursor, limit)
+        else:
+            query = query.order_by(Post.created_at.desc(), Post.id.desc()).offset(skip).limit(limit)
         
         async with async_session() as session:
             result = await session.execute(query)
             posts = result.scalars().all()
             
+            if cursor is not None or not skip:
+                posts, next_cursor, prev_cursor = paginate(posts, cursor, limit)
+                if next_cursor:
+                    response.headers["X-Next-Cursor"] = next_cursor
+                if prev_cursor:
+                    response.headers["X-Prev-Cursor"] = prev_cursor
+            
             # Convert to response format
             return [
                 PostResponse(
@@ -179,6 +207,8 @@ async def get_posts(
                     updated_at=post.updated_at
                 ) for post in posts
             ]
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching posts: {e}")
         # Return demo data on error
@@ -275,6 +305,8 @@ async def create_post(
         async with async_session() as session:
             session.add(new_post)
             await session.commit()
+            await _touch_daily_stats(session, new_post.created_at)
+            invalidate_response_cache("posts")
             await session.refresh(new_post)
             
             # Return enhanced response
@@ -371,6 +403,8 @@ async def update_post(
                 setattr(existing_post, field, value)
             
             await session.commit()
+            await _touch_daily_stats(session, existing_post.created_at)
+            invalidate_response_cache("posts")
             await session.refresh(existing_post)
             
             return PostResponse(
@@ -419,6 +453,8 @@ async def delete_post(
             # Delete the post
             await session.delete(existing_post)
             await session.commit()
+            await _touch_daily_stats(session, existing_post.created_at)
+            invalidate_response_cache("posts")
             
             return {"message": "Post deleted successfully"}
             
@@ -461,6 +497,9 @@ async def publish_post(
                     existing_post.status = "scheduled"
             
             await session.commit()
+            await _touch_daily_stats(session, existing_post.created_at)
+            invalidate_response_cache("posts")
+            publish_event("post.status", id=post_id, status=existing_post.status, region=existing_post.region)
             
             # TODO: Add Celery task for actual publishing
             # publish_post_task.delay(post_id, publish_request.dict() if publish_request else {})
@@ -595,6 +634,8 @@ async def bulk_publish_posts(
                     published_count += 1
             
             await session.commit()
+            await _touch_daily_stats(session, *{post.created_at for post in posts})
+            invalidate_response_cache("posts")
             
             # TODO: Add Celery tasks for actual publishing
             # for post_id in post_ids:
@@ -637,6 +678,8 @@ async def bulk_delete_posts(
                 await session.delete(post)
             
             await session.commit()
+            await _touch_daily_stats(session, *{post.created_at for post in posts})
+            invalidate_response_cache("posts")
             
             return {
                 "message": f"Successfully deleted {len(posts)} posts",
@@ -3,13 +3,18 @@
 """
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_
+from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, desc, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..database import get_async_db, async_session
 from ..models import Post, Group, User, Schedule
+from ...services.daily_stats import get_summary as get_daily_summary
+from ..pagination import apply_keyset, paginate, InvalidCursor
+from ..search import search_posts as search_text_posts
+from ..events import get_event_broadcaster
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -18,10 +23,10 @@ router = APIRouter()
 async def get_public_stats():
     """Получение основной статистики (без аутентификации)."""
     try:
-        from ..database import test_connection
+        from ..database import get_database
         
         # Проверяем подключение к базе данных
-        db_connected = test_connection()
+        db_connected = await get_database().connect()
         
         return {
             "status": "operational",
@@ -71,42 +76,39 @@ async def get_dashboard_analytics():
     """Получение аналитики для дашборда (без аутентификации)."""
     try:
         # Пробуем получить данные из базы данных
-        from ..database import get_database, Session, test_connection
+        from ..database import get_database
         
-        if test_connection() and Session:
+        if await get_database().connect():
             db = get_database()
             if db:
                 try:
-                    with db.get_session() as session:
+                    async with async_session() as session:
                         # Общая статистика
-                        total_posts = session.query(Post).count()
-                        total_groups = session.query(Group).count()
-                        total_users = session.query(User).count()
-                        total_schedules = session.query(Schedule).count()
+                        summary = await session.run_sync(get_daily_summary)
+                        total_posts = summary["total_posts"]
+                        total_groups = await session.scalar(select(func.count(Group.id)))
+                        total_users = await session.scalar(select(func.count(User.id)))
+                        total_schedules = await session.scalar(select(func.count(Schedule.id)))
                         
                         # Статистика по статусам постов
-                        post_statuses = session.query(
-                            Post.status, 
-                            func.count(Post.id).label('count')
-                        ).group_by(Post.status).all()
+                        post_statuses = [(status, item["posts"]) for status, item in summary["by_status"].items()]
                         
                         # Статистика по платформам
-                        platform_stats = session.query(
+                        platform_stats = (await session.execute(select(
                             Group.platform,
                             func.count(Group.id).label('count')
-                        ).group_by(Group.platform).all()
+                        ).group_by(Group.platform))).all()
                         
                         # Статистика по регионам
-                        region_stats = session.query(
-                            Post.region,
-                            func.count(Post.id).label('count')
-                        ).filter(Post.region.isnot(None)).group_by(Post.region).all()
+                        region_stats = [(region, item["posts"]) for region, item in summary["by_region"].items() if region]
                         
                         # Последние посты
-                        recent_posts = session.query(Post).order_by(desc(Post.created_at)).limit(10).all()
+                        recent_posts = (await session.scalars(
+                            select(Post).order_by(desc(Post.created_at)).limit(10)
+                        )).all()
                         
                         # Активные группы
-                        active_groups = session.query(Group).filter(Group.is_active == True).all()
+                        active_groups = (await session.scalars(select(Group).where(Group.is_active == True))).all()
                         
                         return {
                             "status": "success",
@@ -238,36 +240,18 @@ async def get_dashboard_analytics():
 @router.get("/posts/statistics")
 async def get_posts_statistics(
     days: int = Query(30, description="Количество дней для анализа"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получение статистики постов за период (без аутентификации)."""
     try:
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Посты за период
-        posts_in_period = db.query(Post).filter(Post.created_at >= start_date).count()
-        
-        # Посты по дням
-        daily_posts = db.query(
-            func.date(Post.created_at).label('date'),
-            func.count(Post.id).label('count')
-        ).filter(Post.created_at >= start_date).group_by(
-            func.date(Post.created_at)
-        ).order_by('date').all()
-        
-        # Посты по регионам за период
-        regional_posts = db.query(
-            Post.region,
-            func.count(Post.id).label('count')
-        ).filter(
-            and_(Post.created_at >= start_date, Post.region.isnot(None))
-        ).group_by(Post.region).all()
-        
-        # Посты по статусам за период
-        status_posts = db.query(
-            Post.status,
-            func.count(Post.id).label('count')
-        ).filter(Post.created_at >= start_date).group_by(Post.status).all()
+        # Сводка за период из postopus_daily_stats вместо сканирования постов
+        summary = await db.run_sync(get_daily_summary, since=start_date.date())
+        posts_in_period = summary["total_posts"]
+        daily_posts = [(day, item["posts"]) for day, item in summary["by_day"].items()]
+        regional_posts = [(region, item["posts"]) for region, item in summary["by_region"].items() if region]
+        status_posts = [(status, item["posts"]) for status, item in summary["by_status"].items()]
         
         return {
             "period": {
@@ -292,27 +276,27 @@ async def get_posts_statistics(
         }
 
 @router.get("/groups/statistics")
-async def get_groups_statistics(db: Session = Depends(get_db)):
+async def get_groups_statistics(db: AsyncSession = Depends(get_async_db)):
     """Получение статистики групп (без аутентификации)."""
     try:
         # Общая статистика групп
-        total_groups = db.query(Group).count()
-        active_groups = db.query(Group).filter(Group.is_active == True).count()
+        total_groups = await db.scalar(select(func.count(Group.id)))
+        active_groups = await db.scalar(select(func.count(Group.id)).where(Group.is_active == True))
         
         # Группы по платформам
-        platform_groups = db.query(
+        platform_groups = (await db.execute(select(
             Group.platform,
             func.count(Group.id).label('count')
-        ).group_by(Group.platform).all()
+        ).group_by(Group.platform))).all()
         
         # Группы по регионам
-        regional_groups = db.query(
+        regional_groups = (await db.execute(select(
             Group.region,
             func.count(Group.id).label('count')
-        ).filter(Group.region.isnot(None)).group_by(Group.region).all()
+        ).where(Group.region.isnot(None)).group_by(Group.region))).all()
         
         # Группы с постами
-        groups_with_posts = db.query(
+        groups_with_posts = (await db.execute(select(
             Group.id,
             Group.name,
             Group.platform,
@@ -320,7 +304,7 @@ async def get_groups_statistics(db: Session = Depends(get_db)):
             func.count(Post.id).label('post_count')
         ).outerjoin(Post, Group.id == Post.vk_group_id).group_by(
             Group.id, Group.name, Group.platform, Group.region
-        ).all()
+        ))).all()
         
         return {
             "overview": {
@@ -351,20 +335,20 @@ async def get_groups_statistics(db: Session = Depends(get_db)):
         }
 
 @router.get("/regions")
-async def get_regions(db: Session = Depends(get_db)):
+async def get_regions(db: AsyncSession = Depends(get_async_db)):
     """Получение списка регионов с статистикой (без аутентификации)."""
     try:
         # Регионы из постов
-        post_regions = db.query(
+        post_regions = (await db.execute(select(
             Post.region,
             func.count(Post.id).label('post_count')
-        ).filter(Post.region.isnot(None)).group_by(Post.region).all()
+        ).where(Post.region.isnot(None)).group_by(Post.region))).all()
         
         # Регионы из групп
-        group_regions = db.query(
+        group_regions = (await db.execute(select(
             Group.region,
             func.count(Group.id).label('group_count')
-        ).filter(Group.region.isnot(None)).group_by(Group.region).all()
+        ).where(Group.region.isnot(None)).group_by(Group.region))).all()
         
         # Объединяем данные
         regions = {}
@@ -399,20 +383,40 @@ async def get_public_posts(
     status: str = Query(None, description="Фильтр по статусу"),
     platform: str = Query(None, description="Фильтр по платформе"),
     region: str = Query(None, description="Фильтр по региону"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Курсор next_cursor/prev_cursor из предыдущего ответа"),
+    with_total: bool = Query(True, description="Считать общее количество постов (отдельный COUNT); "
+                                               "false - пропустить COUNT при листании по курсору"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Получение списка постов (без аутентификации)."""
+    """
+    Получение списка постов (без аутентификации).
+    
+    С курсором страница выбирается по ключу (created_at, id) и skip
+    игнорируется; в ответе возвращаются курсоры соседних страниц.
+    total по умолчанию считается, как и раньше; клиенты, листающие по курсору,
+    могут передать with_total=false и не платить за COUNT (тогда total = null).
+    """
     try:
-        query = db.query(Post)
+        query = select(Post)
         
         if status:
-            query = query.filter(Post.status == status)
-        if platform:
-            query = query.filter(Post.platform == platform)
+            query = query.where(Post.status == status)
+        if platform == "vk":
+            query = query.where(Post.vk_group_id.isnot(None))
+        elif platform == "telegram":
+            query = query.where(Post.telegram_chat_id.isnot(None))
         if region:
-            query = query.filter(Post.region == region)
-        
-        posts = query.order_by(desc(Post.created_at)).offset(skip).limit(limit).all()
+            query = query.where(Post.region == region)
+        
+        next_cursor = prev_cursor = None
+        if cursor is not None or not skip:
+            posts = (await db.scalars(apply_keyset(query, Post, cursor, limit))).all()
+            posts, next_cursor, prev_cursor = paginate(posts, cursor, limit)
+        else:
+            posts = (await db.scalars(
+                query.order_by(desc(Post.created_at), desc(Post.id)).offset(skip).limit(limit)
+            )).all()
+        total = await db.scalar(query.with_only_columns(func.count(Post.id))) if with_total else None
         
         return {
             "posts": [
@@ -421,20 +425,26 @@ async def get_public_posts(
                     "title": post.title,
                     "content": post.content,
                     "status": post.status,
-                    "platform": post.platform,
+                    "platform": "vk" if post.vk_group_id else ("telegram" if post.telegram_chat_id else None),
                     "region": post.region,
                     "created_at": post.created_at.isoformat() if post.created_at else None,
                     "published_at": post.published_at.isoformat() if post.published_at else None,
-                    "views": post.views,
-                    "likes": post.likes,
-                    "reposts": post.reposts
+                    "views": post.view_count,
+                    "likes": post.like_count,
+                    # Репосты хранятся в метаданных (services/engagement.py)
+                    "reposts": ((post.post_metadata if isinstance(post.post_metadata, dict) else {})
+                                .get("engagement") or {}).get("reposts", 0)
                 }
                 for post in posts
             ],
-            "total": query.count(),
+            "total": total,
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor
         }
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting public posts: {e}")
         return {"posts": [], "total": 0, "skip": skip, "limit": limit}
@@ -444,20 +454,20 @@ async def get_public_groups(
     platform: str = Query(None, description="Фильтр по платформе"),
     region: str = Query(None, description="Фильтр по региону"),
     active_only: bool = Query(True, description="Только активные группы"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получение списка групп (без аутентификации)."""
     try:
-        query = db.query(Group)
+        query = select(Group)
         
         if platform:
-            query = query.filter(Group.platform == platform)
+            query = query.where(Group.platform == platform)
         if region:
-            query = query.filter(Group.region == region)
+            query = query.where(Group.region == region)
         if active_only:
-            query = query.filter(Group.is_active == True)
+            query = query.where(Group.is_active == True)
         
-        groups = query.order_by(Group.name).all()
+        groups = (await db.scalars(query.order_by(Group.name))).all()
         
         return {
             "groups": [
@@ -481,35 +491,35 @@ async def get_public_groups(
 @router.get("/analytics")
 async def get_public_analytics(
     days: int = Query(30, description="Количество дней для анализа"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получение аналитики (без аутентификации)."""
     try:
         start_date = datetime.utcnow() - timedelta(days=days)
         
         # Общая статистика
-        total_posts = db.query(Post).count()
-        posts_in_period = db.query(Post).filter(Post.created_at >= start_date).count()
-        total_groups = db.query(Group).count()
-        active_groups = db.query(Group).filter(Group.is_active == True).count()
+        total_posts = await db.scalar(select(func.count(Post.id)))
+        posts_in_period = await db.scalar(select(func.count(Post.id)).where(Post.created_at >= start_date))
+        total_groups = await db.scalar(select(func.count(Group.id)))
+        active_groups = await db.scalar(select(func.count(Group.id)).where(Group.is_active == True))
         
         # Статистика по платформам
-        platform_stats = db.query(
+        platform_stats = (await db.execute(select(
             Group.platform,
             func.count(Group.id).label('count')
-        ).group_by(Group.platform).all()
+        ).group_by(Group.platform))).all()
         
         # Статистика по регионам
-        region_stats = db.query(
+        region_stats = (await db.execute(select(
             Post.region,
             func.count(Post.id).label('count')
-        ).filter(Post.region.isnot(None)).group_by(Post.region).all()
+        ).where(Post.region.isnot(None)).group_by(Post.region))).all()
         
         # Статистика по статусам
-        status_stats = db.query(
+        status_stats = (await db.execute(select(
             Post.status,
             func.count(Post.id).label('count')
-        ).group_by(Post.status).all()
+        ).group_by(Post.status))).all()
         
         return {
             "period": {
@@ -566,46 +576,23 @@ async def search_posts(
     region: str = Query(None, description="Фильтр по региону"),
     status: str = Query(None, description="Фильтр по статусу"),
     limit: int = Query(50, description="Максимальное количество результатов"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Поиск постов по содержимому (без аутентификации)."""
     try:
-        query = db.query(Post)
-        
-        # Поиск по содержимому
-        if q:
-            query = query.filter(
-                Post.title.contains(q) | Post.content.contains(q)
-            )
-        
-        # Фильтр по региону
-        if region:
-            query = query.filter(Post.region == region)
-        
-        # Фильтр по статусу
-        if status:
-            query = query.filter(Post.status == status)
-        
-        # Ограничение результатов
-        results = query.limit(limit).all()
+        # Полнотекстовый поиск по GIN-индексу с ранжированием, pg_trgm как запасной вариант
+        found = await db.run_sync(search_text_posts, q, region=region, status=status, limit=limit)
+        results = found["results"]
         
         return {
             "query": q,
+            "mode": found["mode"],
             "filters": {
                 "region": region,
                 "status": status
             },
             "total": len(results),
-            "results": [
-                {
-                    "id": post.id,
-                    "title": post.title,
-                    "content": post.content[:200] + "..." if len(post.content) > 200 else post.content,
-                    "region": post.region,
-                    "status": post.status,
-                    "created_at": post.created_at.isoformat() if post.created_at else None
-                } for post in results
-            ]
+            "results": results
         }
         
     except Exception as e:
@@ -616,3 +603,20 @@ async def search_posts(
             "total": 0,
             "results": []
         }
+
+
+@router.get("/events")
+async def stream_events(request: Request):
+    """
+    Поток server-sent events для дашборда: posts.created, post.status,
+    task.completed, tokens.health. Заменяет периодический опрос.
+    """
+    return StreamingResponse(
+        get_event_broadcaster().stream(request),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx/Render не должны буферизовать поток
+            "X-Accel-Buffering": "no",
+        }
+    )
@@ -9,7 +9,8 @@ from pydantic import BaseModel, EmailStr
 
 try:
     from sqlalchemy import select, and_, or_, func
-    from ...database.postgres import async_session, User, Setting, VKToken
+    from ..database import async_session
+    from ..models import User, Setting, VKToken
 except ImportError:
     async_session = None
     User = None
@@ -17,6 +18,7 @@ except ImportError:
     VKToken = None
 
 from ...services.vk_service import EnhancedVKService
+from ...services.token_health import get_token_health
 from ...models.config import AppConfig
 from .auth import get_current_user, get_password_hash, verify_password
 
@@ -854,20 +856,23 @@ async def test_vk_token(
             if not token.is_active:
                 raise HTTPException(status_code=400, detail="Token is not active")
             
-            # Test the token using VK service
+            # Fresh cached health is returned as is; otherwise only this token is probed
             try:
-                vk_service = EnhancedVKService()
-                test_result = await vk_service.test_token(token.token, token.group_id)
+                entry = (await get_token_health().revalidate([token.token]))[token.token]
                 
                 # Update last_used timestamp
                 token.last_used = datetime.now()
                 await session.commit()
                 
+                if entry is None:
+                    raise Exception("Token check is already in progress")
+                
                 return {
-                    "success": test_result.get("success", False),
-                    "message": test_result.get("message", "Token test completed"),
-                    "group_info": test_result.get("group_info", {}),
-                    "tested_at": datetime.now().isoformat()
+                    "success": entry["healthy"],
+                    "message": "Token is working" if entry["healthy"] else f"Token test failed: {entry['error']}",
+                    "latency_ms": entry["latency_ms"],
+                    "error_code": entry["error_code"],
+                    "tested_at": datetime.utcfromtimestamp(entry["checked_at"]).isoformat()
                 }
                 
             except Exception as vk_error:
@@ -6,24 +6,35 @@ VK API Router для Postopus
 """
 import logging
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
-from ..database import SessionLocal
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_async_db
 from ..models import Post, Group, VKToken
 from ...services.modern_vk_service import ModernVKService
+from ...services.token_health import get_token_health
+from ...services.vk_callback import callback_settings, verify_secret, should_ingest
+from ...utils.ttl_cache import TTLCache
 from ...tasks.vk_tasks import (
     fetch_posts_from_region_task,
     publish_post_to_vk_task,
     test_vk_connections_task,
     process_scheduled_posts_task,
     update_post_statistics_task,
-    sync_all_regions_task
+    sync_all_regions_task,
+    ingest_callback_post_task
 )
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Группы Callback API: VK присылает событие на каждый новый пост
+_callback_groups = TTLCache(ttl=60)
+
 # Pydantic models
 class VKTokenCreate(BaseModel):
     region: str
@@ -48,11 +59,10 @@ class VKRegionSyncRequest(BaseModel):
 
 # VK Token Management
 @router.get("/tokens")
-async def get_vk_tokens():
+async def get_vk_tokens(db: AsyncSession = Depends(get_async_db)):
     """Получить список VK токенов."""
-    session = SessionLocal()
     try:
-        tokens = session.query(VKToken).all()
+        tokens = (await db.scalars(select(VKToken))).all()
         return {
             "tokens": [
                 {
@@ -71,16 +81,13 @@ async def get_vk_tokens():
     except Exception as e:
         logger.error(f"Error getting VK tokens: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        session.close()
 
 @router.post("/tokens")
-async def create_vk_token(token_data: VKTokenCreate):
+async def create_vk_token(token_data: VKTokenCreate, db: AsyncSession = Depends(get_async_db)):
     """Создать новый VK токен."""
-    session = SessionLocal()
     try:
         # Проверяем, существует ли уже токен для этого региона
-        existing_token = session.query(VKToken).filter(VKToken.region == token_data.region).first()
+        existing_token = await db.scalar(select(VKToken).where(VKToken.region == token_data.region))
         if existing_token:
             raise HTTPException(status_code=400, detail=f"Token for region {token_data.region} already exists")
         
@@ -93,9 +100,9 @@ async def create_vk_token(token_data: VKTokenCreate):
             is_active=True
         )
         
-        session.add(new_token)
-        session.commit()
-        session.refresh(new_token)
+        db.add(new_token)
+        await db.commit()
+        await db.refresh(new_token)
         
         return {
             "id": new_token.id,
@@ -109,17 +116,14 @@ async def create_vk_token(token_data: VKTokenCreate):
         raise
     except Exception as e:
         logger.error(f"Error creating VK token: {e}")
-        session.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        session.close()
 
 @router.put("/tokens/{token_id}")
-async def update_vk_token(token_id: int, token_data: VKTokenUpdate):
+async def update_vk_token(token_id: int, token_data: VKTokenUpdate, db: AsyncSession = Depends(get_async_db)):
     """Обновить VK токен."""
-    session = SessionLocal()
     try:
-        token = session.query(VKToken).filter(VKToken.id == token_id).first()
+        token = await db.get(VKToken, token_id)
         
         if not token:
             raise HTTPException(status_code=404, detail="Token not found")
@@ -134,8 +138,8 @@ async def update_vk_token(token_id: int, token_data: VKTokenUpdate):
         if token_data.is_active is not None:
             token.is_active = token_data.is_active
         
-        session.commit()
-        session.refresh(token)
+        await db.commit()
+        await db.refresh(token)
         
         return {
             "id": token.id,
@@ -149,54 +153,47 @@ async def update_vk_token(token_id: int, token_data: VKTokenUpdate):
         raise
     except Exception as e:
         logger.error(f"Error updating VK token: {e}")
-        session.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        session.close()
 
 @router.delete("/tokens/{token_id}")
-async def delete_vk_token(token_id: int):
+async def delete_vk_token(token_id: int, db: AsyncSession = Depends(get_async_db)):
     """Удалить VK токен."""
-    session = SessionLocal()
     try:
-        token = session.query(VKToken).filter(VKToken.id == token_id).first()
+        token = await db.get(VKToken, token_id)
         
         if not token:
             raise HTTPException(status_code=404, detail="Token not found")
         
-        session.delete(token)
-        session.commit()
+        await db.delete(token)
+        await db.commit()
         
         return {"message": "Token deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error deleting VK token: {e}")
-        session.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        session.close()
 
 # VK API Operations
 @router.get("/test-connections")
-async def test_vk_connections():
-    """Тестировать подключения к VK API."""
+async def test_vk_connections(db: AsyncSession = Depends(get_async_db)):
+    """Состояние VK токенов из реестра здоровья (устаревшие перепроверяются в фоне)."""
     try:
-        vk_service = ModernVKService()
-        success = await vk_service.initialize()
+        tokens = (await db.scalars(select(VKToken).where(VKToken.is_active == True))).all()
+        by_region = {token.region: token.token for token in tokens}
         
-        if success:
-            return {
-                "status": "success",
-                "message": f"VK service initialized with {len(vk_service.tokens)} tokens",
-                "tokens": list(vk_service.tokens.keys())
-            }
-        else:
-            return {
-                "status": "failed",
-                "message": "Failed to initialize VK service",
-                "tokens": []
-            }
+        health = get_token_health()
+        health.schedule_revalidation(by_region.values())
+        summary = await health.summary_async(by_region)
+        
+        return {
+            "status": "success" if summary["working_tokens"] else "failed",
+            "message": f"{summary['working_tokens']}/{summary['total_tokens']} tokens working",
+            "tokens": [detail["name"] for detail in summary["details"] if detail["status"] == "working"],
+            **summary
+        }
     except Exception as e:
         logger.error(f"Error testing VK connections: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -269,11 +266,10 @@ async def process_scheduled_posts(background_tasks: BackgroundTasks):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/groups")
-async def get_vk_groups():
+async def get_vk_groups(db: AsyncSession = Depends(get_async_db)):
     """Получить список VK групп."""
-    session = SessionLocal()
     try:
-        groups = session.query(Group).all()
+        groups = (await db.scalars(select(Group))).all()
         
         return {
             "groups": [
@@ -292,18 +288,16 @@ async def get_vk_groups():
     except Exception as e:
         logger.error(f"Error getting VK groups: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        session.close()
 
 @router.get("/groups/{group_id}/info")
 async def get_vk_group_info(group_id: str):
     """Получить информацию о VK группе."""
     try:
-        vk_service = ModernVKService()
-        await vk_service.initialize()
-        
-        # Получаем информацию о группе через VK API
-        group_info = await vk_service.get_group_info(group_id)
+        async with ModernVKService() as vk_service:
+            await vk_service.initialize()
+            
+            # Получаем информацию о группе через VK API
+            group_info = await vk_service.get_group_info(group_id)
         
         return {
             "group_id": group_id,
@@ -314,21 +308,20 @@ async def get_vk_group_info(group_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/statistics")
-async def get_vk_statistics():
+async def get_vk_statistics(db: AsyncSession = Depends(get_async_db)):
     """Получить статистику VK интеграции."""
-    session = SessionLocal()
     try:
         # Статистика токенов
-        total_tokens = session.query(VKToken).count()
-        active_tokens = session.query(VKToken).filter(VKToken.is_active == True).count()
+        total_tokens = await db.scalar(select(func.count(VKToken.id)))
+        active_tokens = await db.scalar(select(func.count(VKToken.id)).where(VKToken.is_active == True))
         
         # Статистика групп
-        total_groups = session.query(Group).count()
-        active_groups = session.query(Group).filter(Group.is_active == True).count()
+        total_groups = await db.scalar(select(func.count(Group.id)))
+        active_groups = await db.scalar(select(func.count(Group.id)).where(Group.is_active == True))
         
         # Статистика постов
-        total_posts = session.query(Post).count()
-        published_posts = session.query(Post).filter(Post.status == "published").count()
+        total_posts = await db.scalar(select(func.count(Post.id)))
+        published_posts = await db.scalar(select(func.count(Post.id)).where(Post.status == "published"))
         
         return {
             "tokens": {
@@ -347,8 +340,6 @@ async def get_vk_statistics():
     except Exception as e:
         logger.error(f"Error getting VK statistics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        session.close()
 
 @router.get("/tasks/{task_id}/status")
 async def get_task_status(task_id: str):
@@ -363,3 +354,68 @@ async def get_task_status(task_id: str):
     except Exception as e:
         logger.error(f"Error getting task status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _get_callback_group(db: AsyncSession, vk_group_id) -> Optional[dict]:
+    """VK group of a callback event (group_id is positive, groups may be stored as -id)."""
+    cached = _callback_groups.get(vk_group_id)
+    if cached is not None:
+        return cached or None
+    
+    group = None
+    if isinstance(vk_group_id, int):
+        group = (await db.scalars(
+            select(Group).where(
+                Group.platform == 'vk',
+                Group.group_id.in_([str(vk_group_id), str(-vk_group_id)])
+            )
+        )).first()
+    data = {
+        "group_id": group.group_id,
+        "name": group.name,
+        "region": group.region or "",
+        "theme": (group.settings or {}).get("theme") or "novost",
+        "settings": group.settings or {},
+        "is_active": group.is_active
+    } if group else {}
+    _callback_groups.set(vk_group_id, data)
+    return data or None
+
+@router.post("/callback", response_class=PlainTextResponse)
+async def vk_callback(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Приемник VK Callback API: подтверждение сервера и события wall_post_new.
+    
+    Посты ставятся в очередь Celery, ответ "ok" отправляется сразу,
+    иначе VK повторяет доставку.
+    """
+    try:
+        event = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    if not isinstance(event, dict):
+        raise HTTPException(status_code=400, detail="Invalid event")
+    
+    event_type = event.get("type")
+    group = await _get_callback_group(db, event.get("group_id"))
+    confirmation, secret = callback_settings(group["settings"] if group else None)
+    
+    if event_type == "confirmation":
+        if not group or not confirmation:
+            raise HTTPException(status_code=404, detail="Callback is not configured for this group")
+        return PlainTextResponse(confirmation)
+    
+    if not verify_secret(secret, event.get("secret")):
+        logger.warning(f"Rejected VK callback {event_type} for group {event.get('group_id')}: bad secret")
+        raise HTTPException(status_code=403, detail="Invalid secret")
+    
+    if event_type == "wall_post_new":
+        post = event.get("object") or {}
+        if not group or not group["is_active"]:
+            logger.warning(f"VK callback for unknown or inactive group {event.get('group_id')}")
+        elif should_ingest(post):
+            source = {key: group[key] for key in ("group_id", "name", "region", "theme")}
+            ingest_callback_post_task.delay(post, source)
+            logger.info(f"Queued callback post {post.get('owner_id')}_{post.get('id')} for region {source['region']}")
+    
+    return PlainTextResponse("ok")
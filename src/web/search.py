@@ -0,0 +1,130 @@
+"""
+Полнотекстовый поиск постов в PostgreSQL.
+
+``postopus_posts.search_vector`` - генерируемая колонка tsvector (русская
+конфигурация, заголовок весом A, текст весом B), PostgreSQL сам
+поддерживает ее при INSERT/UPDATE, по ней строится GIN-индекс. Результаты
+ранжируются ts_rank и получают подсвеченный фрагмент из ts_headline
+(HTML: текст экранирован, совпадения обернуты в <mark>). Если
+по словам ничего не нашлось (опечатки, неполные слова), используется
+нечеткий поиск по триграммам pg_trgm.
+"""
+import html
+import logging
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy import func, literal, or_
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = 'russian'
+# ts_headline не экранирует текст поста, поэтому совпадения отмечаются управляющими
+# символами, а <mark> подставляется после html.escape (см. _snippet_html)
+_HL_START, _HL_STOP = '\x02', '\x03'
+SEARCH_HEADLINE_OPTIONS = (
+    f'MaxWords=35, MinWords=15, MaxFragments=2, StartSel="{_HL_START}", StopSel="{_HL_STOP}"'
+)
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(content, '')), 'B')"
+)
+
+# DDL для уже существующих баз, применяется миграциями (web/migrations.py) вне транзакции:
+# GIN-индекс строится CONCURRENTLY, команды идемпотентны и безопасны при повторе
+SEARCH_SCHEMA_SQL = [
+    f"ALTER TABLE postopus_posts ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_postopus_posts_search_vector "
+    "ON postopus_posts USING gin (search_vector)",
+]
+# Индексы строятся CONCURRENTLY (вне транзакции), чтобы не блокировать запись постов
+TRIGRAM_SCHEMA_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_postopus_posts_title_trgm "
+    "ON postopus_posts USING gin (title gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_postopus_posts_content_trgm "
+    "ON postopus_posts USING gin (content gin_trgm_ops)",
+]
+
+
+def _filters(region: Optional[str], status: Optional[str]) -> list:
+    filters = []
+    if region:
+        filters.append(Post.region == region)
+    if status:
+        filters.append(Post.status == status)
+    return filters
+
+
+def _fulltext(session, q: str, filters: list, limit: int) -> List[Dict[str, Any]]:
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank(Post.search_vector, tsquery)
+
+    # Сначала отбираем и ранжируем id, ts_headline считаем только для страницы
+    top = session.query(Post.id.label('id'), rank.label('rank')).filter(
+        Post.search_vector.op('@@')(tsquery), *filters
+    ).order_by(rank.desc(), Post.created_at.desc()).limit(limit).subquery()
+
+    rows = session.query(
+        Post,
+        top.c.rank,
+        func.ts_headline(SEARCH_CONFIG, Post.content, tsquery, SEARCH_HEADLINE_OPTIONS)
+    ).join(top, top.c.id == Post.id).order_by(top.c.rank.desc(), Post.created_at.desc()).all()
+
+    return [_result(post, rank_value, snippet) for post, rank_value, snippet in rows]
+
+
+def _fuzzy(session, q: str, filters: list, limit: int) -> List[Dict[str, Any]]:
+    score = func.greatest(func.similarity(Post.title, q), func.word_similarity(q, Post.content))
+    rows = session.query(Post, score).filter(
+        or_(Post.title.op('%')(q), literal(q).op('<%')(Post.content)), *filters
+    ).order_by(score.desc(), Post.created_at.desc()).limit(limit).all()
+
+    return [_result(post, score_value, None) for post, score_value in rows]
+
+
+def _snippet_html(text: str) -> str:
+    """Экранирует фрагмент и превращает отметки ts_headline в <mark>."""
+    escaped = html.escape(text)
+    return escaped.replace(_HL_START, '<mark>').replace(_HL_STOP, '</mark>')
+
+
+def _result(post: Post, rank: float, snippet: Optional[str]) -> Dict[str, Any]:
+    content = post.content or ''
+    preview = content[:200] + "..." if len(content) > 200 else content
+    return {
+        "id": post.id,
+        "title": post.title,
+        "content": preview,
+        "snippet": _snippet_html(snippet or preview),
+        "rank": round(float(rank or 0), 4),
+        "region": post.region,
+        "status": post.status,
+        "created_at": post.created_at
+    }
+
+
+def search_posts(session, q: str, region: Optional[str] = None, status: Optional[str] = None,
+                 limit: int = 50) -> Dict[str, Any]:
+    """
+    Ищет посты: полнотекстовый поиск с ранжированием, при пустом результате - по триграммам.
+
+    Returns:
+        {"mode": "fulltext" | "fuzzy", "results": [...]}
+    """
+    filters = _filters(region, status)
+    results = _fulltext(session, q, filters, limit)
+    if results:
+        return {"mode": "fulltext", "results": results}
+
+    try:
+        # Отдельная точка сохранения: без pg_trgm ошибка не должна ломать транзакцию сессии
+        with session.begin_nested():
+            results = _fuzzy(session, q, filters, limit)
+    except Exception as e:
+        logger.warning(f"Fuzzy search failed: {e}")
+        results = []
+    return {"mode": "fuzzy", "results": results}
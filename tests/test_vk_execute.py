@@ -0,0 +1,177 @@
+"""
+Tests for VK ``execute`` batching.
+
+A local ``httpx.MockTransport`` stands in for api.vk.com: it unpacks the
+generated VKScript, answers every ``API.wall.get`` call and records how many
+HTTP requests were made.
+"""
+import asyncio
+import json
+import re
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from src.services.vk_execute import (
+    VKExecuteBatcher,
+    VKExecuteError,
+    build_wall_get_script,
+    split_execute_response,
+)
+
+WALL_GET_CALL = re.compile(r"API\.wall\.get\((\{.*?\})\)")
+
+
+class FakeVK:
+    """Stub of the execute method: wall.get answers per owner_id."""
+
+    def __init__(self, failing_owners=(), batch_error=None):
+        self.failing_owners = set(failing_owners)
+        self.batch_error = batch_error
+        self.requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/method/execute"
+        form = parse_qs(request.content.decode())
+        code = form["code"][0]
+        calls = [json.loads(params) for params in WALL_GET_CALL.findall(code)]
+        self.requests.append(calls)
+
+        if self.batch_error:
+            return httpx.Response(200, json={"error": self.batch_error})
+
+        response, errors = [], []
+        for params in calls:
+            if params["owner_id"] in self.failing_owners:
+                response.append(False)
+                errors.append({"method": "wall.get", "error_code": 15, "error_msg": "Access denied"})
+            else:
+                response.append({
+                    "count": 1,
+                    "items": [{"id": params["offset"] + 1, "owner_id": params["owner_id"], "text": "post"}],
+                })
+        body = {"response": response}
+        if errors:
+            body["execute_errors"] = errors
+        return httpx.Response(200, json=body)
+
+
+def make_batcher(vk: FakeVK, **kwargs) -> VKExecuteBatcher:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(vk.handler), base_url="https://api.vk.com/method")
+
+    async def send(token, code):
+        response = await client.post("/execute", data={"access_token": token, "code": code, "v": "5.131"})
+        return response.json()
+
+    return VKExecuteBatcher(send, **kwargs)
+
+
+def test_build_wall_get_script_keeps_call_order():
+    script = build_wall_get_script([
+        {"owner_id": -1, "count": 10, "offset": 0},
+        {"owner_id": -2, "count": 5, "offset": 20},
+    ])
+
+    calls = [json.loads(params) for params in WALL_GET_CALL.findall(script)]
+    assert calls == [
+        {"owner_id": -1, "count": 10, "offset": 0},
+        {"owner_id": -2, "count": 5, "offset": 20},
+    ]
+    assert script.startswith("var r = [];")
+    assert script.endswith("return r;")
+
+
+def test_split_execute_response_maps_false_to_errors():
+    results = split_execute_response({"response": [{"items": []}, False, None]}, 3)
+
+    assert results[0] == {"items": []}
+    assert isinstance(results[1], VKExecuteError)
+    assert isinstance(results[2], VKExecuteError)
+
+
+def test_split_execute_response_rejects_wrong_length():
+    with pytest.raises(VKExecuteError):
+        split_execute_response({"response": [{"items": []}]}, 2)
+
+
+def test_concurrent_wall_gets_are_packed_into_one_request():
+    vk = FakeVK()
+    batcher = make_batcher(vk, window=0.01)
+
+    async def run():
+        return await asyncio.gather(*[batcher.wall_get("token", f"-{i}", 10, 0) for i in range(1, 6)])
+
+    results = asyncio.run(run())
+
+    assert len(vk.requests) == 1
+    assert [call["owner_id"] for call in vk.requests[0]] == [-1, -2, -3, -4, -5]
+    # Каждый вызывающий получает только посты своей группы
+    assert [items[0]["owner_id"] for items in results] == [-1, -2, -3, -4, -5]
+    assert batcher.requests_sent == 1
+    assert batcher.calls_sent == 5
+
+
+def test_batches_are_split_at_25_calls():
+    vk = FakeVK()
+    batcher = make_batcher(vk, window=0.01)
+
+    async def run():
+        return await asyncio.gather(*[batcher.wall_get("token", -i, 10, 0) for i in range(1, 31)])
+
+    results = asyncio.run(run())
+
+    assert [len(calls) for calls in vk.requests] == [25, 5]
+    assert [items[0]["owner_id"] for items in results] == list(range(-1, -31, -1))
+
+
+def test_calls_of_different_tokens_are_not_mixed():
+    vk = FakeVK()
+    batcher = make_batcher(vk, window=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.wall_get("token-a", -1),
+            batcher.wall_get("token-b", -2),
+            batcher.wall_get("token-a", -3),
+        )
+
+    asyncio.run(run())
+
+    assert sorted(len(calls) for calls in vk.requests) == [1, 2]
+
+
+def test_failed_call_inside_execute_fails_only_its_caller():
+    vk = FakeVK(failing_owners={-2})
+    batcher = make_batcher(vk, window=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.wall_get("token", -1),
+            batcher.wall_get("token", -2),
+            batcher.wall_get("token", -3),
+            return_exceptions=True,
+        )
+
+    first, failed, third = asyncio.run(run())
+
+    assert len(vk.requests) == 1
+    assert first[0]["owner_id"] == -1
+    assert isinstance(failed, VKExecuteError)
+    assert third[0]["owner_id"] == -3
+
+
+def test_execute_error_fails_every_call_of_the_batch():
+    vk = FakeVK(batch_error={"error_code": 6, "error_msg": "Too many requests per second"})
+    batcher = make_batcher(vk, window=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.wall_get("token", -1),
+            batcher.wall_get("token", -2),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, VKExecuteError) for result in results)